@@ -0,0 +1,270 @@
+"""
+Local archive of computed results.
+
+Every contest a run processes is appended to an SQLite file: the contest
+meta (name and problem list), the -1/0/1 result of every roster handle on
+every problem, and the slimmed submissions of the roster handles
+(cfscript.slim_submission). The roster of every group is kept as well.
+
+Results are stored per (contest, problem, handle), not per worksheet cell,
+so a handle that studies in several groups is stored once and the rows of a
+roster can be reordered freely. Tables are indexed for the usual questions:
+a student's history (by handle) and a problem's solve rate across groups
+(by contest and problem, joined with the rosters).
+
+ArchivedContests serves archived contests in place of CodeforcesServer, so
+worksheets and local exports can be regenerated with no Codeforces API calls
+(generate.py --from-archive). Extra metrics are recomputed from the archived
+submissions, so a metric that was not collected originally works as well.
+
+    python cli.py archive contests
+    python cli.py archive history HANDLE
+    python cli.py archive problems [CONTEST_ID ...]
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Collection, Dict, Hashable, List, Optional, Tuple
+
+import config
+from cfscript import ContestFold, ContestInfo, build_handle_index
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contests (
+    contest_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    contest_id INTEGER NOT NULL,
+    problem TEXT NOT NULL,
+    handle TEXT NOT NULL,
+    result INTEGER NOT NULL,
+    PRIMARY KEY (contest_id, problem, handle)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_handle ON results (handle, contest_id);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    contest_id INTEGER,
+    problem TEXT NOT NULL,
+    handle TEXT,
+    verdict TEXT,
+    time INTEGER,
+    relative INTEGER,
+    type TEXT,
+    lang TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_contest ON submissions (contest_id, problem);
+CREATE INDEX IF NOT EXISTS submissions_handle ON submissions (handle, contest_id);
+CREATE TABLE IF NOT EXISTS rosters (
+    group_key TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    surname TEXT NOT NULL,
+    name TEXT NOT NULL,
+    handle TEXT NOT NULL,
+    PRIMARY KEY (group_key, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rosters_handle ON rosters (handle);
+"""
+
+# Columns of the submissions table and the slimmed submission fields stored in them.
+_SUBMISSION_COLUMNS = ("id", "contest_id", "problem", "handle", "verdict", "time", "relative", "type", "lang")
+_SUBMISSION_FIELDS = ("id", "contest", "problem", "handle", "verdict", "time", "relative", "type", "lang")
+
+
+class ResultsArchive:
+    def __init__(self, path: str):
+        self.path = path
+        # Contests are appended from the worker threads of fetch_group_contests.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def record_roster(self, group: Hashable, children: List[List[str]]):
+        """Replaces the archived roster of the group."""
+        rows = [(str(group), row, *(child + ["", "", ""])[:3]) for row, child in enumerate(children)]
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM rosters WHERE group_key = ?", (str(group),))
+            self._connection.executemany(
+                "INSERT INTO rosters (group_key, row, surname, name, handle) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def record_submissions(self, contest_id: int, rows: List[Dict[str, Any]]):
+        """Appends slimmed submissions; a submission archived before is replaced (its verdict may have changed)."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO submissions ({', '.join(_SUBMISSION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_SUBMISSION_COLUMNS))})",
+                [tuple(row[field] for field in _SUBMISSION_FIELDS) for row in rows])
+
+    def record_contest(self, contest_id: int, meta: Dict[str, Any], infos: Dict[Hashable, ContestInfo],
+                       groups: Dict[Hashable, Dict[str, int]]):
+        """
+        Appends (or replaces) the results of a contest.
+
+        :param infos: group -> results, as returned by CodeforcesServer.fetch_group_contests.
+        :param groups: group -> {handle: row} the results were built for.
+        """
+        cells = {}
+        for group, info in infos.items():
+            for handle, row in groups[group].items():
+                if not handle:
+                    continue
+                for task, value in zip(info.Tasks, info.Result[row]):
+                    cells[(task, handle)] = value
+        handles = {handle for _, handle in cells}
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO contests (contest_id, name, meta, updated_at) VALUES (?, ?, ?, ?)",
+                (contest_id, meta["contest"]["name"], json.dumps(meta, ensure_ascii=False), time.time()))
+            # The results are rebuilt from all submissions on every run: a rejudge may lower them.
+            self._connection.executemany("DELETE FROM results WHERE contest_id = ? AND handle = ?",
+                                         [(contest_id, handle) for handle in handles])
+            # -1 (no attempts) is not stored.
+            self._connection.executemany(
+                "INSERT INTO results (contest_id, problem, handle, result) VALUES (?, ?, ?, ?)",
+                [(contest_id, task, handle, value) for (task, handle), value in cells.items() if value != -1])
+
+    def meta(self, contest_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT meta FROM contests WHERE contest_id = ?", (contest_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def roster_groups(self) -> List[str]:
+        """Keys of the archived rosters (see generate.publish)."""
+        return [group for group, in self._query("SELECT DISTINCT group_key FROM rosters ORDER BY group_key")]
+
+    def roster(self, group: Hashable) -> Optional[List[List[str]]]:
+        rows = self._query("SELECT surname, name, handle FROM rosters WHERE group_key = ? ORDER BY row",
+                           (str(group),))
+        return [list(row) for row in rows] or None
+
+    def submissions(self, contest_id: int, handles: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        """Archived submissions of the contest (slimmed, newest first), optionally of the given handles only."""
+        rows = self._query(
+            f"SELECT {', '.join(_SUBMISSION_COLUMNS)} FROM submissions "
+            f"WHERE contest_id = ? ORDER BY id DESC", (contest_id,))
+        submissions = [dict(zip(_SUBMISSION_FIELDS, row)) for row in rows]
+        if handles is not None:
+            submissions = [row for row in submissions if row["handle"] in handles]
+        return submissions
+
+    def contests(self) -> List[Tuple[int, str, int, float]]:
+        """(contest id, name, number of problems, last update) of every archived contest."""
+        return [(contest_id, name, len(json.loads(meta)["problems"]), updated_at)
+                for contest_id, name, meta, updated_at in
+                self._query("SELECT contest_id, name, meta, updated_at FROM contests ORDER BY contest_id")]
+
+    def history(self, handle: str) -> List[Tuple[int, str, str, int]]:
+        """(contest id, contest name, problem, result) of every attempted problem of the handle."""
+        return self._query(
+            "SELECT r.contest_id, c.name, r.problem, r.result FROM results r "
+            "JOIN contests c ON c.contest_id = r.contest_id WHERE r.handle = ? ORDER BY r.contest_id, r.problem",
+            (handle,))
+
+    def problem_stats(self, contest_ids: Collection[int] = ()) -> List[Tuple[str, int, str, int, int, int]]:
+        """
+        Solve rates of the problems by group.
+
+        :param contest_ids: Only these contests (default: all archived).
+        :return: (group, contest id, problem, solved, attempted, students in the group).
+        """
+        where = ""
+        if contest_ids:
+            where = f"WHERE r.contest_id IN ({', '.join('?' * len(contest_ids))})"
+        return self._query(
+            "SELECT g.group_key, r.contest_id, r.problem, SUM(r.result = 1), COUNT(*), "
+            "(SELECT COUNT(*) FROM rosters s WHERE s.group_key = g.group_key) "
+            f"FROM results r JOIN rosters g ON g.handle = r.handle {where} "
+            "GROUP BY g.group_key, r.contest_id, r.problem ORDER BY g.group_key, r.contest_id, r.problem",
+            tuple(contest_ids))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ArchivedContests:
+    """
+    Serves archived contests in place of CodeforcesServer (the part used by
+    generate.publish), without Codeforces API calls.
+    """
+
+    def __init__(self, archive: ResultsArchive):
+        self.archive = archive
+
+    def contest_meta(self, contest_id: int) -> Dict[str, Any]:
+        meta = self.archive.meta(contest_id)
+        if meta is None:
+            raise RuntimeError(f"Contest {contest_id} is not in the archive {self.archive.path}, "
+                               f"run without --from-archive first.")
+        return meta
+
+    def contest_metas(self, contest_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        return {contest_id: self.contest_meta(contest_id) for contest_id in contest_ids}
+
+    def fetch_group_contests(self, contest_ids: List[int], groups: Dict[Hashable, Dict[str, int]],
+                             metas: Optional[Dict[int, Dict[str, Any]]] = None,
+                             on_contest: Optional[Callable[[int, Dict[Hashable, ContestInfo]], None]] = None,
+                             metrics: Collection[str] = (),
+                             on_submissions: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None
+                             ) -> Dict[Hashable, List[ContestInfo]]:
+        """Same as CodeforcesServer.fetch_group_contests, folding the archived submissions."""
+        index = build_handle_index(groups)
+        metas = metas or {}
+        per_contest = []
+        for contest_id in contest_ids:
+            contest = ContestFold(metas.get(contest_id) or self.contest_meta(contest_id), groups, index, metrics)
+            rows = self.archive.submissions(contest_id, index)
+            contest.add(rows)
+            if on_submissions is not None:
+                on_submissions(contest_id, rows)
+            infos = contest.infos()
+            if on_contest is not None:
+                on_contest(contest_id, infos)
+            per_contest.append(infos)
+        return {group: [infos[group] for infos in per_contest] for group in groups}
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Query the local results archive.")
+    parser.add_argument("--archive", help="archive file (default: ARCHIVE_PATH)")
+    queries = parser.add_subparsers(dest="query", required=True)
+    queries.add_parser("contests", help="archived contests")
+    history = queries.add_parser("history", help="attempted problems of a student")
+    history.add_argument("handle")
+    problems = queries.add_parser("problems", help="solve rate of every problem by group")
+    problems.add_argument("contest_ids", type=int, nargs="*")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    args = build_parser(prog).parse_args(argv)
+    path = args.archive or config.ARCHIVE_PATH
+    if not path:
+        raise RuntimeError("ARCHIVE_PATH is not set in local_config.py, pass --archive.")
+    archive = ResultsArchive(path)
+    try:
+        if args.query == "contests":
+            for contest_id, name, tasks, updated_at in archive.contests():
+                print(f"{contest_id:>7}  {name[:50]:<50} {tasks:>3} tasks  "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(updated_at))}")
+        elif args.query == "history":
+            for contest_id, name, problem, result in archive.history(args.handle):
+                print(f"{contest_id:>7}  {name[:50]:<50} {problem:<3} {'solved' if result == 1 else 'attempted'}")
+        else:
+            for group, contest_id, problem, solved, attempted, students in archive.problem_stats(args.contest_ids):
+                print(f"{group[:40]:<40} {contest_id:>7} {problem:<3} solved {solved:>4} / {students:<4} "
+                      f"({solved / students:.0%}), attempted {attempted}")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
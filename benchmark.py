@@ -0,0 +1,181 @@
+"""
+Offline benchmark of generate.run on synthetic rosters and contests.
+
+    python benchmark.py                       # default scenarios
+    python benchmark.py --students 1000 --contests 40 --cf-latency 0.2
+    python benchmark.py --recording recorded/ --students 200
+
+Reports wall time, calls per API, payload sizes, peak memory and the memory
+blocks still alive after the run (tracemalloc snapshot difference).
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import tracing
+from cfscript import CF_CALLS_PER_SECOND, CodeforcesServer
+from fakes import CallStats, FakeClient, FakeCodeforcesClient, synthetic_contests
+from generate import run
+from ratelimit import TokenBucket
+from worksheets import SUM_MODES
+
+DEFAULT_SCENARIOS: List[Tuple[int, int]] = [(10, 1), (200, 20), (1000, 40), (10000, 100)]
+
+
+@dataclass
+class BenchmarkResult:
+    students: int
+    contests: int
+    sum_mode: str
+    wall_seconds: float
+    peak_memory_bytes: int
+    # Blocks and bytes allocated during the run and still alive after it (not every allocation).
+    retained_blocks: int
+    retained_bytes: int
+    calls: Dict[str, int] = field(default_factory=dict)
+    payload_bytes: Dict[str, int] = field(default_factory=dict)
+
+
+class VirtualTime:
+    """Clock for a limiter that keeps its rate but does not wait: sleeping only moves the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        # A wait too small to change the clock would make the limiter wait forever.
+        self.now = max(self.now + seconds, math.nextafter(self.now, math.inf))
+
+
+def roster(num_students: int) -> List[Dict[str, str]]:
+    return [{"surname": f"Surname{i}", "name": f"Name{i}", "cf_login": f"student_{i}"} for i in range(num_students)]
+
+
+def run_scenario(num_students: int, num_contests: int, sum_mode: str, cf_latency: float = 0.0,
+                 sheets_latency: float = 0.0, cf_rate: float = CF_CALLS_PER_SECOND, cf_throttle: bool = False,
+                 other_participants: int = 0, recording: Optional[str] = None, incremental: bool = False,
+                 tracer: Optional[tracing.Tracer] = None) -> BenchmarkResult:
+    """
+    Runs generate.run end to end against the fakes.
+
+    :param cf_rate: Codeforces calls per second of the limiter; the fetch strategy is
+                    chosen for it, as in production.
+    :param cf_throttle: Really wait for the limiter; by default calls are not delayed.
+    :param incremental: Run twice and measure the second, incremental, run.
+    :param tracer: Traces the measured run (see tracing.py).
+    """
+    handles = roster(num_students)
+    stats = CallStats()
+    if recording:
+        cf_client = FakeCodeforcesClient.from_recording(recording, latency=cf_latency, stats=stats)
+    else:
+        cf_client = FakeCodeforcesClient(
+            synthetic_contests([row["cf_login"] for row in handles], num_contests,
+                               other_participants=other_participants),
+            latency=cf_latency, stats=stats)
+    contest_ids = sorted(cf_client.contests)[:num_contests]
+    sheets = FakeClient(handles, latency=sheets_latency, stats=stats)
+    if cf_throttle:
+        limiter = TokenBucket(rate=cf_rate, capacity=1)
+    else:
+        virtual_time = VirtualTime()
+        limiter = TokenBucket(rate=cf_rate, capacity=1, clock=virtual_time, sleep=virtual_time.sleep)
+
+    def once(tracer: Optional[tracing.Tracer] = None):
+        client, sheets_client = cf_client, sheets
+        if tracer is not None:
+            tracing.start(tracer)
+            client = tracing.TracedCodeforcesClient(cf_client, tracer)
+            sheets_client = tracing.TracedClient(sheets, tracer)
+        server = CodeforcesServer(limiter=limiter, client=client)
+        if tracer is not None:
+            server.on_retry = tracer.record_retry
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(cur_table=sheets_client.open_by_key("benchmark"), cfserver=server, contests_ids=contest_ids,
+                worksheet_name="results", sum_mode=sum_mode, incremental=incremental)
+
+    if incremental:
+        once()
+        stats.counts.clear()
+        stats.payload_bytes.clear()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    once(tracer)
+    wall = time.perf_counter() - started
+    gc.collect()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    own_frames = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    retained = after.filter_traces(own_frames).compare_to(before.filter_traces(own_frames), "filename")
+
+    return BenchmarkResult(students=num_students, contests=len(contest_ids), sum_mode=sum_mode,
+                           wall_seconds=round(wall, 3), peak_memory_bytes=peak,
+                           retained_blocks=sum(stat.count_diff for stat in retained),
+                           retained_bytes=sum(stat.size_diff for stat in retained),
+                           calls=dict(sorted(stats.counts.items())),
+                           payload_bytes=dict(sorted(stats.payload_bytes.items())))
+
+
+def format_result(result: BenchmarkResult) -> str:
+    calls = ", ".join(f"{name}={count}" for name, count in result.calls.items())
+    return (f"{result.students:>6} students {result.contests:>4} contests [{result.sum_mode}]: "
+            f"{result.wall_seconds:>8.3f}s, peak {result.peak_memory_bytes / 2 ** 20:.1f} MiB, "
+            f"retained {result.retained_blocks:+d} blocks / {result.retained_bytes / 2 ** 10:+.0f} KiB\n    {calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark with fake Codeforces and Google Sheets.")
+    parser.add_argument("--students", type=int, help="roster size (default: built-in scenarios)")
+    parser.add_argument("--contests", type=int, default=10, help="number of contests")
+    parser.add_argument("--sum-mode", choices=SUM_MODES, default="range")
+    parser.add_argument("--cf-latency", type=float, default=0.0, help="seconds per Codeforces call")
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="seconds per Sheets call")
+    parser.add_argument("--cf-rate", type=float, default=CF_CALLS_PER_SECOND,
+                        help="Codeforces calls per second the fetch strategy is chosen for")
+    parser.add_argument("--cf-throttle", action="store_true",
+                        help="wait for --cf-rate between Codeforces calls (default: no waiting)")
+    parser.add_argument("--other-participants", type=int, default=0,
+                        help="non-roster participants per contest, makes contest.status bigger")
+    parser.add_argument("--recording", help="directory with recorded contests (see fakes.record_contest)")
+    parser.add_argument("--incremental", action="store_true", help="measure a second, incremental run")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--trace-report", help="write the call trace of the last scenario to this file")
+    args = parser.parse_args()
+
+    scenarios = [(args.students, args.contests)] if args.students else DEFAULT_SCENARIOS
+    results = []
+    tracer = None
+    for students, contests in scenarios:
+        # The fakes have no quotas, so the guards are disabled.
+        tracer = tracing.Tracer(guards={}) if args.trace_report else None
+        result = run_scenario(students, contests, args.sum_mode, cf_latency=args.cf_latency,
+                              sheets_latency=args.sheets_latency, cf_rate=args.cf_rate,
+                              cf_throttle=args.cf_throttle,
+                              other_participants=args.other_participants, recording=args.recording,
+                              incremental=args.incremental, tracer=tracer)
+        print(format_result(result))
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+    if tracer is not None:
+        tracer.write_json(args.trace_report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Persistent on-disk cache of Codeforces API responses.
+
+Entries are stored in SQLite as zlib-compressed JSON, keyed by contest id and
+API method. Entries fetched after a contest finished never expire; entries of
+running contests expire after a short TTL.
+
+contest.status is too large to be kept as one value: its submissions are
+stored one row each (see put_submissions) while the response is parsed and
+read back in batches, and the responses entry only marks them as complete.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Iterator, List, Optional
+
+RUNNING_CONTEST_TTL = 60  # seconds
+# Submissions read back from the cache at a time.
+SUBMISSIONS_BATCH = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    contest_id INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    finished INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (contest_id, method)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    contest_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    verdict TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (contest_id, id)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class CacheEntry:
+    payload: Any
+    fetched_at: float
+    finished: bool
+
+    def is_fresh(self, ttl: float, now: Optional[float] = None) -> bool:
+        if self.finished:
+            return True
+        return (now if now is not None else time.time()) - self.fetched_at < ttl
+
+
+class ResponseCache:
+    def __init__(self, path: str, running_ttl: float = RUNNING_CONTEST_TTL):
+        self.path = path
+        self.running_ttl = running_ttl
+        # Contests are fetched from a thread pool, so the connection is shared under a lock.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def get(self, contest_id: int, method: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload, fetched_at, finished FROM responses WHERE contest_id = ? AND method = ?",
+                (contest_id, method),
+            ).fetchone()
+        if row is None:
+            return None
+        payload, fetched_at, finished = row
+        return CacheEntry(payload=json.loads(zlib.decompress(payload)), fetched_at=fetched_at,
+                          finished=bool(finished))
+
+    def get_fresh(self, contest_id: int, method: str) -> Optional[CacheEntry]:
+        """Returns the entry only if it can be used without asking the API."""
+        entry = self.get(contest_id, method)
+        if entry is not None and entry.is_fresh(self.running_ttl):
+            return entry
+        return None
+
+    def put(self, contest_id: int, method: str, payload: Any, finished: bool):
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (contest_id, method, fetched_at, finished, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (contest_id, method, time.time(), int(finished), blob),
+            )
+
+    def put_submissions(self, contest_id: int, rows: List[Dict[str, Any]]):
+        """Stores slimmed submissions; a stored submission is replaced (its verdict may have changed)."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO submissions (contest_id, id, verdict, payload) VALUES (?, ?, ?, ?)",
+                [(contest_id, row["id"], row["verdict"], json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+                 for row in rows])
+
+    def clear_submissions(self, contest_id: int):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM submissions WHERE contest_id = ?", (contest_id,))
+
+    def iter_submissions(self, contest_id: int, batch_size: int = SUBMISSIONS_BATCH) -> Iterator[List[Dict[str, Any]]]:
+        """Stored submissions of the contest, newest first, batch_size at a time."""
+        below = None
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT id, payload FROM submissions WHERE contest_id = ? AND (? IS NULL OR id < ?) "
+                    "ORDER BY id DESC LIMIT ?", (contest_id, below, below, batch_size)).fetchall()
+            if not rows:
+                return
+            yield [json.loads(payload) for _, payload in rows]
+            below = rows[-1][0]
+
+    def first_submission(self, contest_id: int, verdicts: Collection[Optional[str]]) -> Optional[int]:
+        """Smallest stored submission id with one of the verdicts (None matches a missing verdict)."""
+        names = [verdict for verdict in verdicts if verdict is not None]
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT MIN(id) FROM submissions WHERE contest_id = ? AND "
+                f"(verdict IN ({', '.join('?' * len(names))}){' OR verdict IS NULL' if None in verdicts else ''})",
+                (contest_id, *names)).fetchone()
+        return row[0]
+
+    def last_submission(self, contest_id: int) -> Optional[int]:
+        with self._lock:
+            return self._connection.execute("SELECT MAX(id) FROM submissions WHERE contest_id = ?",
+                                            (contest_id,)).fetchone()[0]
+
+    def close(self):
+        self._connection.close()
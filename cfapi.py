@@ -0,0 +1,157 @@
+"""
+Minimal Codeforces API client that returns the raw JSON "result" field.
+Raw JSON (unlike CodeforcesApiPy objects) can be cached and parsed lazily.
+"""
+import codecs
+import hashlib
+import json
+import random
+import string
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+API_URL = "https://codeforces.com/api/"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class CodeforcesApiError(Exception):
+    def __init__(self, comment: str, status_code: Optional[int] = None):
+        super().__init__(comment)
+        self.comment = comment
+        self.status_code = status_code
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Call limit, 5xx responses, broken JSON from an error page and network errors are worth a retry."""
+    if "Call limit exceeded" in str(error):
+        return True
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status_code, int):
+        return status_code >= 500
+    if isinstance(error, CodeforcesApiError):
+        return False
+    # Other ValueErrors are bugs, not broken responses.
+    return isinstance(error, (ConnectionError, TimeoutError, json.JSONDecodeError, OSError))
+
+
+def _format_param(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return ";".join(str(item) for item in value)
+    return str(value)
+
+
+class CodeforcesClient:
+    def __init__(self, api_key: Optional[str] = None, secret: Optional[str] = None, timeout: float = 120):
+        self.api_key = api_key
+        self.secret = secret
+        self.timeout = timeout
+        # Optional wrapper for every HTTP response (used by tracing to count bytes).
+        self.response_hook: Optional[Callable[[Any], Any]] = None
+
+    def url(self, method: str, **params) -> str:
+        """Builds the request URL, signed with apiSig when a key is configured."""
+        query = {name: _format_param(value) for name, value in params.items() if value is not None}
+        if self.api_key and self.secret:
+            query["apiKey"] = self.api_key
+            query["time"] = str(int(time.time()))
+            rand = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+            signed = "&".join(f"{name}={value}" for name, value in sorted(query.items()))
+            digest = hashlib.sha512(f"{rand}/{method}?{signed}#{self.secret}".encode()).hexdigest()
+            query["apiSig"] = rand + digest
+        return f"{API_URL}{method}?{urlencode(query)}"
+
+    def open(self, method: str, **params):
+        """Opens the response stream; used by callers that parse the body incrementally."""
+        try:
+            response = urlopen(self.url(method, **params), timeout=self.timeout)
+        except HTTPError as error:
+            raise _api_error(error) from error
+        return self.response_hook(response) if self.response_hook is not None else response
+
+    def call(self, method: str, **params) -> Any:
+        """Calls an API method and returns its "result" field."""
+        with self.open(method, **params) as response:
+            body: Dict[str, Any] = json.load(response)
+        if body.get("status") != "OK":
+            raise CodeforcesApiError(body.get("comment", "Unknown error"))
+        return body["result"]
+
+    def stream(self, method: str, **params) -> Iterator[Any]:
+        """
+        Yields the items of the "result" array one by one while the response is
+        being downloaded, so the whole array is never held in memory.
+        """
+        with self.open(method, **params) as response:
+            yield from iter_result(response)
+
+
+def _api_error(error: HTTPError) -> CodeforcesApiError:
+    try:
+        comment = json.load(error).get("comment", error.reason)
+    except (ValueError, AttributeError):
+        comment = str(error.reason)
+    return CodeforcesApiError(comment, status_code=error.code)
+
+
+def iter_result(stream, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Incrementally parses a {"status": ..., "result": [...]} response from a
+    binary stream and yields the elements of the result array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += text_decoder.decode(chunk or b"", final=eof)
+        return not eof or bool(buffer)
+
+    # Skip everything up to the opening bracket of the result array.
+    while True:
+        key = buffer.find('"result"')
+        if key != -1:
+            bracket = buffer.find("[", key)
+            if bracket != -1:
+                buffer = buffer[bracket + 1:]
+                break
+        if not read_more() and eof:
+            try:
+                body = json.loads(buffer)
+            except ValueError:
+                raise json.JSONDecodeError("Unexpected Codeforces response: no result array", buffer, 0)
+            raise CodeforcesApiError(body.get("comment", "Unknown error"))
+
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            buffer, position = "", 0
+            if not read_more():
+                raise json.JSONDecodeError("Truncated Codeforces response", buffer, position)
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, position = buffer[position:], 0
+            read_more()
+            continue
+        yield item
+        position = end
+        if position > chunk_size:
+            buffer, position = buffer[position:], 0
@@ -1,52 +1,528 @@
-import codeforces_api
-from typing import List, Dict
-from dataclasses import dataclass
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Collection, Hashable, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 
 import config
+from cf_cache import CacheEntry, ResponseCache
+from cfapi import CodeforcesApiError, CodeforcesClient, is_retryable_error
+from fetch_planner import STRATEGY_USER_STATUS, plan_fetch
+from metrics import Metric, create_metrics
+from ratelimit import TokenBucket, call_with_retries
+
+# Codeforces allows one API call per two seconds.
+CF_CALLS_PER_SECOND = 0.5
+CF_MAX_WORKERS = 4
+# Page size used to pull only the submissions newer than the cached ones.
+STATUS_REFRESH_PAGE = 1000
+# Parsed contest.status rows are written to the cache this many at a time.
+STATUS_STORE_BATCH = 1000
+# contest.status of finished contests is downloaded in pages of this size,
+# several pages at a time.
+STATUS_PAGE_SIZE = 10000
+STATUS_PAGES_IN_FLIGHT = 3
+
+METHOD_STANDINGS = "contest.standings"
+METHOD_STATUS = "contest.status"
+METHOD_USER_STATUS = "user.status"
+# Payload of the contest.status entry: the submissions themselves are in the cache's submissions table.
+STATUS_STORED = {"submissions": "stored"}
+
+# Verdicts that may still change: such submissions are re-fetched on refresh.
+PENDING_VERDICTS = {None, "TESTING"}
+# Until the contest is FINISHED an accepted submission has passed pretests only:
+# a hack or system testing may still reject it.
+PROVISIONAL_VERDICTS = {"OK"}
 
 @dataclass
 class ContestInfo:
     name: str
     Tasks: List[str]
     Result: List[List[int]]
+    # Extra metric name -> students × problems matrix, see metrics.py.
+    Metrics: Dict[str, List[List[Any]]] = field(default_factory=dict)
+
+
+def _author_handle(row: Dict[str, Any]) -> Optional[str]:
+    members = row["author"].get("members") or [{}]
+    return members[0].get("handle")
+
+
+def slim_submission(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Keeps only the submission fields used to build results."""
+    return {
+        "id": row["id"],
+        "contest": row.get("contestId"),
+        "handle": _author_handle(row),
+        "problem": row["problem"]["index"],
+        "verdict": row.get("verdict"),
+        "time": row.get("creationTimeSeconds"),
+        "relative": row.get("relativeTimeSeconds"),
+        "type": row["author"].get("participantType"),
+        "lang": row.get("programmingLanguage"),
+    }
+
 
 class CodeforcesServer:
-    def __init__(self): 
-        self.cf = codeforces_api.CodeforcesApi(api_key=config.CF_API_KEY, secret=config.CF_API_SECRET)
+    def __init__(self, limiter: Optional[TokenBucket] = None, max_workers: int = CF_MAX_WORKERS,
+                 cache: Optional[ResponseCache] = None, strategy: Optional[str] = None,
+                 client: Optional[CodeforcesClient] = None):
+        self.client = client or CodeforcesClient(api_key=config.CF_API_KEY, secret=config.CF_API_SECRET)
+        # The limiter is shared by all threads: the API limit is per key, not per connection.
+        self.limiter = limiter or TokenBucket(rate=CF_CALLS_PER_SECOND, capacity=1)
+        self.max_workers = max_workers
+        self.cache = cache
+        # Called before every retried API call, see tracing.Tracer.record_retry.
+        self.on_retry: Optional[Callable[[Exception, int], None]] = None
+        # None lets fetch_planner choose per contest.
+        self.strategy = strategy
+        # user.status histories downloaded (or being downloaded) in this run, shared by all contests.
+        self._user_submissions: Dict[str, Future] = {}
+        self._user_lock = threading.Lock()
+
+    def _call(self, method: str, **params) -> Any:
+        return call_with_retries(lambda: self.client.call(method, **params), is_retryable=is_retryable_error,
+                                 limiter=self.limiter, on_retry=self.on_retry)
+
+    def _stream_submissions(self, contest_id: int, keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                            start: Optional[int] = None, count: Optional[int] = None,
+                            store: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+                            ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Streams contest.status (or one page of it), slimming every row and
+        dropping the ones keep() rejects.
+
+        :param store: Called with every STATUS_STORE_BATCH rows (kept or not) while they are parsed.
+        :return: Kept rows and the number of rows the API returned.
+        """
+        return self._stream_submissions_of(METHOD_STATUS, {"contestId": contest_id, "from": start, "count": count},
+                                           keep, store)
+
+    def _stream_submissions_of(self, method: str, params: Dict[str, Any],
+                               keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                               store: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+                               ) -> Tuple[List[Dict[str, Any]], int]:
+        def fetch():
+            received = 0
+            kept = []
+            batch = []
+            for row in self.client.stream(method, **params):
+                received += 1
+                slim = None
+                if store is not None:
+                    slim = slim_submission(row)
+                    batch.append(slim)
+                    if len(batch) >= STATUS_STORE_BATCH:
+                        store(batch)
+                        batch = []
+                if keep is None or keep(row):
+                    kept.append(slim or slim_submission(row))
+            if batch:
+                store(batch)
+            return kept, received
+        return call_with_retries(fetch, is_retryable=is_retryable_error, limiter=self.limiter,
+                                 on_retry=self.on_retry)
+
+    def _paged_submissions(self, contest_id: int, keep: Optional[Callable[[Dict[str, Any]], bool]],
+                           on_page: Callable[[List[Dict[str, Any]]], None],
+                           store: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Downloads contest.status in pages of STATUS_PAGE_SIZE, up to
+        STATUS_PAGES_IN_FLIGHT at a time. Every page is retried on its own and
+        handed to on_page as soon as it arrives.
+
+        Offsets are only stable once the contest is finished: in a running
+        contest new submissions shift them and pages could miss rows.
+        """
+        def fetch_page(page: int):
+            return self._stream_submissions(contest_id, keep, start=page * STATUS_PAGE_SIZE + 1,
+                                            count=STATUS_PAGE_SIZE, store=store)
+
+        rows, received = fetch_page(0)
+        on_page(rows)
+        submissions = {row["id"]: row for row in rows}
+        next_page = 1
+        last_page_reached = received < STATUS_PAGE_SIZE
+        with ThreadPoolExecutor(max_workers=STATUS_PAGES_IN_FLIGHT) as pool:
+            while not last_page_reached:
+                pages = range(next_page, next_page + STATUS_PAGES_IN_FLIGHT)
+                next_page += STATUS_PAGES_IN_FLIGHT
+                for future in as_completed([pool.submit(fetch_page, page) for page in pages]):
+                    rows, received = future.result()
+                    on_page(rows)
+                    submissions.update((row["id"], row) for row in rows)
+                    last_page_reached = last_page_reached or received < STATUS_PAGE_SIZE
+        return [submissions[submission_id] for submission_id in sorted(submissions, reverse=True)]
+
+    def contest_meta(self, contest_id: int) -> Dict[str, Any]:
+        """Contest description and problem list (contest.standings without rows)."""
+        if self.cache is not None:
+            entry = self.cache.get_fresh(contest_id, METHOD_STANDINGS)
+            if entry is not None:
+                return entry.payload
+        standings = self._call(METHOD_STANDINGS, contestId=contest_id, **{"from": 1}, count=1)
+        meta = {"contest": standings["contest"], "problems": standings["problems"]}
+        if self.cache is not None:
+            self.cache.put(contest_id, METHOD_STANDINGS, meta, finished=is_finished(meta))
+        return meta
+
+    def contest_metas(self, contest_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """contest_meta of several contests, fetched concurrently."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(contest_ids, pool.map(self.contest_meta, contest_ids)))
+
+    def contest_submissions(self, contest_id: int, finished: bool,
+                            handles: Optional[Collection[str]] = None,
+                            on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Submissions of the contest (slimmed, newest first).
+        A stale cache entry of a running contest is refreshed by pulling only the
+        submissions whose verdict may still change and the newer ones; once the
+        contest is FINISHED, an entry saved before that is downloaded again in full.
+
+        :param handles: Only submissions of these handles are kept in memory and
+                        returned, so memory does not grow with the contest size.
+                        The cache still gets every submission: they are written
+                        to it in batches while the response is parsed.
+        :param on_page: Called with every chunk of submissions as soon as it is
+                        available (each page of a paged download, each batch read
+                        from the cache, or the whole list).
+        """
+        if on_page is None:
+            on_page = lambda rows: None
+        keep = (lambda row: _author_handle(row) in handles) if handles is not None else None
+        if self.cache is None:
+            if finished:
+                return self._paged_submissions(contest_id, keep, on_page)
+            submissions, _ = self._stream_submissions(contest_id, keep)
+            on_page(submissions)
+            return submissions
+
+        entry = status_entry(self.cache, contest_id)
+        # System tests and hacks may have changed any cached verdict of a contest that has just finished.
+        if entry is not None and finished and not entry.finished:
+            entry = None
+        if entry is not None and entry.is_fresh(self.cache.running_ttl):
+            return self._cached_submissions(contest_id, handles, on_page)
+
+        store = lambda rows: self.cache.put_submissions(contest_id, rows)
+        if entry is None:
+            self.cache.clear_submissions(contest_id)
+            if finished:
+                submissions = self._paged_submissions(contest_id, keep, on_page, store)
+            else:
+                submissions, _ = self._stream_submissions(contest_id, keep, store=store)
+                on_page(submissions)
+        else:
+            self._refresh_submissions(contest_id, store)
+            submissions = self._cached_submissions(contest_id, handles, on_page)
+        self.cache.put(contest_id, METHOD_STATUS, STATUS_STORED, finished=finished)
+        return submissions
+
+    def _cached_submissions(self, contest_id: int, handles: Optional[Collection[str]],
+                            on_page: Callable[[List[Dict[str, Any]]], None]) -> List[Dict[str, Any]]:
+        submissions = []
+        for batch in self.cache.iter_submissions(contest_id):
+            rows = batch if handles is None else [row for row in batch if row["handle"] in handles]
+            on_page(rows)
+            submissions.extend(rows)
+        return submissions
+
+    def _refresh_submissions(self, contest_id: int, store: Callable[[List[Dict[str, Any]]], None]):
+        """Stores the submissions of a running contest that are new or whose verdict may have changed."""
+        boundary = self.cache.first_submission(contest_id, PENDING_VERDICTS | PROVISIONAL_VERDICTS)
+        if boundary is None:
+            last = self.cache.last_submission(contest_id)
+            boundary = last + 1 if last is not None else 0
+        self.submissions_since(contest_id, boundary, keep=lambda row: False, store=store)
+
+    def submissions_since(self, contest_id: int, boundary: int,
+                          keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                          store: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Submissions with id >= boundary (slimmed, newest first), paging from the newest one.
+
+        :param keep: Only the rows it accepts are returned.
+        :param store: Called with every page of rows with id >= boundary.
+        """
+        fresh = []
+        start = 1
+        while True:
+            page = self._call(METHOD_STATUS, contestId=contest_id, **{"from": start}, count=STATUS_REFRESH_PAGE)
+            rows = [row for row in page if row["id"] >= boundary]
+            if store is not None:
+                store([slim_submission(row) for row in rows])
+            fresh.extend(slim_submission(row) for row in rows if keep is None or keep(row))
+            if len(page) < STATUS_REFRESH_PAGE or page[-1]["id"] < boundary:
+                break
+            start += STATUS_REFRESH_PAGE
+        return fresh
+
+    def user_submissions(self, handle: str) -> List[Dict[str, Any]]:
+        """
+        All submissions authored by the handle (as members[0], like contest.status is read).
+        Every handle is downloaded once per run, even when contests ask for it at the same time;
+        an unknown handle has no submissions, as with contest.status.
+        """
+        with self._user_lock:
+            future = self._user_submissions.get(handle)
+            owner = future is None
+            if owner:
+                future = self._user_submissions[handle] = Future()
+        if not owner:
+            return future.result()
+        try:
+            rows, _ = self._stream_submissions_of(METHOD_USER_STATUS, {"handle": handle},
+                                                  keep=lambda row: _author_handle(row) == handle)
+        except CodeforcesApiError as error:
+            if "not found" not in error.comment:
+                self._fail_user_submissions(handle, future, error)
+                raise
+            print(f"user.status: {error.comment}")
+            rows = []
+        except BaseException as error:
+            # Any failure must reach the threads waiting on the future, or they wait forever.
+            self._fail_user_submissions(handle, future, error)
+            raise
+        future.set_result(rows)
+        return rows
+
+    def _fail_user_submissions(self, handle: str, future: Future, error: BaseException):
+        # A later call downloads the handle again.
+        with self._user_lock:
+            del self._user_submissions[handle]
+        future.set_exception(error)
+
+    def contest_user_submissions(self, contest_id: int, finished: bool,
+                                 handles: Collection[str]) -> List[Dict[str, Any]]:
+        """
+        Submissions of the handles in the contest, from user.status. The result is
+        cached per contest together with the handles it covers, so a rerun only
+        downloads the histories of handles added to the roster since.
+        """
+        entry = self.cache.get(contest_id, METHOD_USER_STATUS) if self.cache is not None else None
+        if entry is not None and (finished and not entry.finished or not entry.is_fresh(self.cache.running_ttl)):
+            entry = None
+        covered = set(entry.payload["handles"]) if entry is not None else set()
+        missing = [handle for handle in handles if handle not in covered]
+        if entry is not None and missing and not entry.finished:
+            # Saving the merged entry would make the old histories of a running contest look fresh.
+            entry, covered, missing = None, set(), list(handles)
+        rows = list(entry.payload["submissions"]) if entry is not None else []
+        for handle in missing:
+            rows.extend(row for row in self.user_submissions(handle) if row["contest"] == contest_id)
+        if self.cache is not None and missing:
+            self.cache.put(contest_id, METHOD_USER_STATUS,
+                           {"handles": sorted(covered.union(missing)), "submissions": rows}, finished=finished)
+        return [row for row in rows if row["handle"] in handles]
+
+    def _cached_user_handles(self, contest_id: int, meta: Dict[str, Any]) -> set:
+        entry = self.cache.get(contest_id, METHOD_USER_STATUS) if self.cache is not None else None
+        if entry is None or (is_finished(meta) and not entry.finished) or not entry.is_fresh(self.cache.running_ttl):
+            return set()
+        return set(entry.payload["handles"])
+
+    def choose_strategy(self, contest_id: int, meta: Dict[str, Any], handles: Collection[str]) -> str:
+        if self.strategy is not None:
+            return self.strategy
+        status_rows = None
+        entry = status_entry(self.cache, contest_id) if self.cache is not None else None
+        # An entry saved before the contest finished is downloaded again in full.
+        if entry is not None and (entry.finished or not is_finished(meta)):
+            status_rows = 0
+        cached = self._cached_user_handles(contest_id, meta)
+        with self._user_lock:
+            known_users = sum(1 for handle in handles if handle in self._user_submissions or handle in cached)
+        plan = plan_fetch(contest_id, meta, roster_size=len(handles), calls_per_second=self.limiter.rate,
+                          page_size=STATUS_PAGE_SIZE, status_rows=status_rows, known_users=known_users)
+        return plan.strategy
+
+    def fetch_contests(self, contest_ids: List[int], niknames: Dict[str, int]) -> List[ContestInfo]:
+        """
+        Fetches several contests concurrently. Pace is set by the shared limiter,
+        results keep the order of contest_ids.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda contest_id: self.generate_contest_info(contest_id, niknames), contest_ids))
+
+    def fetch_group_contests(self, contest_ids: List[int], groups: Dict[Hashable, Dict[str, int]],
+                             metas: Optional[Dict[int, Dict[str, Any]]] = None,
+                             on_contest: Optional[Callable[[int, Dict[Hashable, ContestInfo]], None]] = None,
+                             metrics: Collection[str] = (),
+                             on_submissions: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None
+                             ) -> Dict[Hashable, List[ContestInfo]]:
+        """
+        Fetches every contest once for several rosters.
+
+        :param groups: group -> {handle: row}.
+        :param metas: Already fetched contest metas (see contest_metas).
+        :param on_contest: Called from a worker thread as soon as a contest is ready.
+        :param metrics: Extra metrics collected in the same pass, see metrics.METRICS.
+        :param on_submissions: Called before on_contest with the submissions of the roster
+                               handles in the contest (see archive.py).
+        :return: group -> contest results in the order of contest_ids.
+        """
+        index = build_handle_index(groups)
+        metas = metas or {}
+
+        def fetch(contest_id: int) -> Dict[Hashable, ContestInfo]:
+            rows = [] if on_submissions is not None else None
+            infos = self.generate_group_contest_info(contest_id, groups, index, metas.get(contest_id), metrics,
+                                                     on_rows=rows.extend if rows is not None else None)
+            if on_submissions is not None:
+                on_submissions(contest_id, rows)
+            if on_contest is not None:
+                on_contest(contest_id, infos)
+            return infos
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            per_contest = list(pool.map(fetch, contest_ids))
+        return {group: [infos[group] for infos in per_contest] for group in groups}
 
     def generate_contest_info(self, contest_id : int, niknames : Dict[str, int]):
-        first_key = next(iter(niknames))
-        standings = self.cf.contest_standings(contest_id=contest_id, handles=[first_key])
-
-        name = standings["contest"].name
-        problems_ids = [problem.index for problem in standings["problems"]] 
-        problems_dict = {problem: idx for idx, problem in enumerate(problems_ids)}
-        print(problems_ids)
-
-        status = self.cf.contest_status(contest_id)
-        contest_result = [[-1 for _ in range(len(problems_ids))] for _ in range(len(niknames.keys()))]
-        for row in status:
-            if (row.author.members[0].handle in niknames):
-                # print(row)
-                # print(row.verdict)
-                # print(row.author.members[0].handle)
-                # print(row.problem.index)
-                num_child = niknames[row.author.members[0].handle]
-                problem_num = problems_dict[row.problem.index]
-                if (row.verdict == "OK") :
-                    contest_result[num_child][problem_num] = 1   
-                elif (contest_result[num_child][problem_num] != 1) :
-                    contest_result[num_child][problem_num] = 0    
-        
-        return ContestInfo(name=name, Tasks=problems_ids, Result=contest_result)
-
-    
+        return self.generate_group_contest_info(contest_id, {0: niknames})[0]
+
+    def generate_group_contest_info(self, contest_id: int, groups: Dict[Hashable, Dict[str, int]],
+                                    index: Optional[Dict[str, List[Tuple[Hashable, int]]]] = None,
+                                    meta: Optional[Dict[str, Any]] = None,
+                                    metrics: Collection[str] = (),
+                                    on_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+                                    ) -> Dict[Hashable, ContestInfo]:
+        """
+        Builds the result matrices of all groups in one pass over the contest submissions.
+
+        :param index: build_handle_index(groups), when already built for several contests.
+        :param meta: Contest meta, when already fetched.
+        :param metrics: Names of extra metrics (see metrics.METRICS) accumulated in the same pass.
+        :param on_rows: Called with every chunk of submissions of the roster handles.
+        """
+        if index is None:
+            index = build_handle_index(groups)
+        if meta is None:
+            meta = self.contest_meta(contest_id)
+
+        contest = ContestFold(meta, groups, index, metrics)
+        print(contest.problems_ids)
+
+        # Pages may arrive in any order: the fold only ever raises a cell from -1 to 0 to 1,
+        # and the metrics keep order-independent state.
+        def fold(rows):
+            contest.add(rows)
+            if on_rows is not None:
+                on_rows([row for row in rows if row["handle"] in index])
+
+        strategy = self.choose_strategy(contest_id, meta, index)
+        if strategy == STRATEGY_USER_STATUS:
+            fold(self.contest_user_submissions(contest_id, finished=is_finished(meta), handles=index))
+        else:
+            self.contest_submissions(contest_id, finished=is_finished(meta), handles=index, on_page=fold)
+        return contest.infos()
+
+
+class ContestFold:
+    """
+    Result matrices (and extra metric accumulators) of all groups for one
+    contest, filled chunk by chunk of submissions.
+
+    :param meta: Contest meta (see CodeforcesServer.contest_meta).
+    :param index: build_handle_index(groups).
+    """
+
+    def __init__(self, meta: Dict[str, Any], groups: Dict[Hashable, Dict[str, int]],
+                 index: Dict[str, List[Tuple[Hashable, int]]], metrics: Collection[str] = ()):
+        self.name = meta["contest"]["name"]
+        self.problems_ids = [problem["index"] for problem in meta["problems"]]
+        self.problems_dict = {problem: idx for idx, problem in enumerate(self.problems_ids)}
+        self.index = index
+        self.results = {group: [[-1 for _ in range(len(self.problems_ids))] for _ in range(len(niknames.keys()))]
+                        for group, niknames in groups.items()}
+        self.accumulators = {group: create_metrics(list(metrics), len(niknames), len(self.problems_ids))
+                             for group, niknames in groups.items()}
+        self._with_metrics = bool(metrics)
+
+    def add(self, rows: List[Dict[str, Any]]):
+        fold_group_submissions(self.results, rows, self.index, self.problems_dict,
+                               self.accumulators if self._with_metrics else None)
+
+    def infos(self) -> Dict[Hashable, ContestInfo]:
+        return {group: ContestInfo(name=self.name, Tasks=self.problems_ids, Result=result,
+                                   Metrics={metric.name: metric.matrix() for metric in self.accumulators[group]})
+                for group, result in self.results.items()}
+
+
+def build_handle_index(groups: Dict[Hashable, Dict[str, int]]) -> Dict[str, List[Tuple[Hashable, int]]]:
+    """handle -> [(group, row)]: one handle may study in several groups."""
+    index: Dict[str, List[Tuple[Hashable, int]]] = {}
+    for group, niknames in groups.items():
+        for handle, row in niknames.items():
+            index.setdefault(handle, []).append((group, row))
+    return index
+
+
+def fold_group_submissions(results: Dict[Hashable, List[List[int]]], rows: List[Dict[str, Any]],
+                           index: Dict[str, List[Tuple[Hashable, int]]], problems_dict: Dict[str, int],
+                           metrics: Optional[Dict[Hashable, List[Metric]]] = None):
+    """
+    Applies submissions to the -1/0/1 result matrices of all groups in place.
+
+    :param metrics: group -> extra metric accumulators fed with the same submissions.
+    """
+    for row in rows:
+        places = index.get(row["handle"])
+        if not places:
+            continue
+        problem_num = problems_dict[row["problem"]]
+        accepted = row["verdict"] == "OK"
+        for group, num_child in places:
+            cells = results[group][num_child]
+            if accepted:
+                cells[problem_num] = 1
+            elif cells[problem_num] != 1:
+                cells[problem_num] = 0
+            if metrics is not None:
+                for metric in metrics[group]:
+                    metric.add(num_child, problem_num, row)
+
+
+def fold_submissions(result: List[List[int]], rows: List[Dict[str, Any]], niknames: Dict[str, int],
+                     problems_dict: Dict[str, int]) -> List[Tuple[int, int]]:
+    """
+    Applies submissions to the -1/0/1 result matrix in place.
+
+    :return: (student, problem) cells whose value changed.
+    """
+    changed = []
+    for row in rows:
+        if (row["handle"] in niknames):
+            num_child = niknames[row["handle"]]
+            problem_num = problems_dict[row["problem"]]
+            if (row["verdict"] == "OK") :
+                new_value = 1
+            elif (result[num_child][problem_num] != 1) :
+                new_value = 0
+            else:
+                continue
+            if result[num_child][problem_num] != new_value:
+                result[num_child][problem_num] = new_value
+                changed.append((num_child, problem_num))
+    return changed
+
+
+def status_entry(cache: ResponseCache, contest_id: int) -> Optional[CacheEntry]:
+    """The cache entry marking the contest.status submissions of the contest as stored."""
+    entry = cache.get(contest_id, METHOD_STATUS)
+    # Older caches kept the whole response in the entry; it is downloaded again into the submissions table.
+    return entry if entry is not None and entry.payload == STATUS_STORED else None
+
+
+def is_finished(meta: Dict[str, Any]) -> bool:
+    return meta["contest"].get("phase") == "FINISHED"
+
 
 def get_contest_name(contest_id : int, niknames : Dict) -> str:
-    cf = codeforces_api.CodeforcesApi(api_key=config.CF_API_KEY, secret=config.CF_API_SECRET)
-    result = []
-    standings = cf.contest_standings(contest_id=contest_id, handles=["VladTim"])
-    result.append(standings["contest"].name)
+    client = CodeforcesClient(api_key=config.CF_API_KEY, secret=config.CF_API_SECRET)
+    standings = client.call(METHOD_STANDINGS, contestId=contest_id, **{"from": 1}, count=1)
+    return standings["contest"]["name"]
 
 if __name__ == "__main__":
     print("main")
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Command line entry point.
+
+    python cli.py run [--incremental] [--resume] ...     build the results table (generate.py)
+    python cli.py export FILE [--roster handles.csv]     write a local .xlsx, .csv or .parquet file
+    python cli.py watch CONTEST_ID [--poll 20] ...       keep a contest block up to date (watch.py)
+    python cli.py plan [CONTEST_ID ...] --students N     requests and cells a run would make, offline
+    python cli.py archive history HANDLE                 query the local results archive (archive.py)
+
+A command imports its module only when it runs, and local_config.py, gspread
+and the other heavy dependencies are loaded only when a command needs them,
+so help and plan start instantly.
+"""
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+# command -> (module with main(argv, prog), description)
+COMMANDS = {
+    "run": ("generate", "build (or incrementally update) the results table"),
+    "export": ("generate", "write the table to a local .xlsx, .csv or .parquet file"),
+    "watch": ("watch", "keep a contest block up to date during a live contest"),
+    "plan": ("plan", "print the requests and cells a run would make, without network access"),
+    "archive": ("archive", "query the local results archive: contests, history, problems"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Codeforces results table.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<8} {description}"
+                                         for name, (_, description) in COMMANDS.items())
+               + "\n\nRun 'cli.py COMMAND --help' for the options of a command.")
+    parser.add_argument("command", choices=COMMANDS, metavar="COMMAND")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    module_name, _ = COMMANDS[args.command]
+    command_args = args.args
+    if args.command == "export":
+        if not command_args or command_args[0].startswith("-"):
+            if not {"-h", "--help"} & set(command_args):
+                parser.error("export needs an output file: cli.py export results.xlsx")
+        else:
+            command_args = ["--output"] + command_args
+    module = importlib.import_module(module_name)
+    module.main(command_args, prog=f"cli.py {args.command}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,45 +1,104 @@
 """
 Configuration module that loads settings from local_config.py (gitignored).
 Create local_config.py from local_config.example.py template.
+
+local_config.py is loaded on the first access to a setting (config.TABLE_ID),
+so commands that need no settings (help, plan) work without it.
 """
 import importlib.util
 import sys
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 local_config_path = Path(__file__).parent / "local_config.py"
 
-if not local_config_path.exists():
-    raise ImportError(
-        "local_config.py not found! "
-        "Please copy local_config.example.py to local_config.py and fill in your secrets."
-    )
+_REQUIRED = object()
+# Setting -> default; _REQUIRED settings must be present in local_config.py.
+_SETTINGS: Dict[str, Any] = {
+    "CF_API_KEY": _REQUIRED,
+    "CF_API_SECRET": _REQUIRED,
+    "GOOGLE_SA_PATH": _REQUIRED,
+    "TABLE_ID": _REQUIRED,
+    "TABLE_LINK": _REQUIRED,
+    "WORKSHEET_NAME": _REQUIRED,
+    "CONTEST_IDS": _REQUIRED,
+    # "per_row", "range", "array" or "values", see worksheets.insert_sum_formula
+    "SUM_FORMULA_MODE": "range",
+    # SQLite file with cached Codeforces responses, None disables the cache
+    "CF_CACHE_PATH": str(Path(__file__).parent / "cf_cache.sqlite"),
+    # "status" or "user.status" to force a fetch strategy, None lets fetch_planner choose
+    "CF_FETCH_STRATEGY": None,
+    # Several groups at once: [{"table_id": ..., "worksheet_name": ..., "roster_sheet": "handles"}, ...].
+    # When set, TABLE_ID and WORKSHEET_NAME are not used.
+    "TARGETS": [],
+    # Checkpoint journal of the last run, see journal.py and generate.py --resume
+    "JOURNAL_PATH": str(Path(__file__).parent / "run_journal.jsonl"),
+    # SQLite file with cached rosters, None reads the roster sheet in full on every run
+    "ROSTER_CACHE_PATH": str(Path(__file__).parent / "roster_cache.sqlite"),
+    # SQLite archive of every processed contest, see archive.py; None disables it
+    "ARCHIVE_PATH": str(Path(__file__).parent / "results_archive.sqlite"),
+    # Extra per-problem metrics written next to the results, see metrics.METRICS
+    "EXTRA_METRICS": [],
+}
+
+if TYPE_CHECKING:
+    CF_API_KEY: str
+    CF_API_SECRET: str
+    GOOGLE_SA_PATH: str
+    TABLE_ID: Optional[str]
+    TABLE_LINK: Optional[str]
+    WORKSHEET_NAME: str
+    CONTEST_IDS: List[int]
+    SUM_FORMULA_MODE: str
+    CF_CACHE_PATH: Optional[str]
+    CF_FETCH_STRATEGY: Optional[str]
+    TARGETS: List[Dict[str, str]]
+    JOURNAL_PATH: str
+    ROSTER_CACHE_PATH: Optional[str]
+    ARCHIVE_PATH: Optional[str]
+    EXTRA_METRICS: List[str]
+
+_local_config = None
+_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    """Whether local_config.py exists, i.e. settings can be read."""
+    return local_config_path.exists()
+
+
+def load_local_config():
+    """Loads local_config.py once; raises ImportError if it does not exist."""
+    global _local_config
+    with _lock:
+        if _local_config is not None:
+            return _local_config
+        if not local_config_path.exists():
+            raise ImportError(
+                "local_config.py not found! "
+                "Please copy local_config.example.py to local_config.py and fill in your secrets."
+            )
 
+        spec = importlib.util.spec_from_file_location("local_config", local_config_path)
+        if spec is None or spec.loader is None:
+            raise ImportError("Failed to load local_config.py")
 
-spec = importlib.util.spec_from_file_location("local_config", local_config_path)
-if spec is None or spec.loader is None:
-    raise ImportError("Failed to load local_config.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["local_config"] = module
+        spec.loader.exec_module(module)
+        _local_config = module
+        return module
 
-local_config = importlib.util.module_from_spec(spec)
-sys.modules["local_config"] = local_config
-spec.loader.exec_module(local_config)
 
+def __getattr__(name: str) -> Any:
+    if name not in _SETTINGS:
+        raise AttributeError(f"module 'config' has no attribute {name!r}")
+    default = _SETTINGS[name]
+    if default is _REQUIRED:
+        return getattr(load_local_config(), name)
+    return getattr(load_local_config(), name, default)
 
-CF_API_KEY: str = local_config.CF_API_KEY
-CF_API_SECRET: str = local_config.CF_API_SECRET
-GOOGLE_SA_PATH: str = local_config.GOOGLE_SA_PATH
-TABLE_ID: Optional[str] = local_config.TABLE_ID
-TABLE_LINK: Optional[str] = local_config.TABLE_LINK
-WORKSHEET_NAME: str = local_config.WORKSHEET_NAME
-CONTEST_IDS: List[int] = local_config.CONTEST_IDS
 
 # Re-export for convenience
-__all__ = [
-    "CF_API_KEY",
-    "CF_API_SECRET",
-    "GOOGLE_SA_PATH",
-    "TABLE_ID",
-    "TABLE_LINK",
-    "WORKSHEET_NAME",
-    "CONTEST_IDS",
-]
+__all__ = list(_SETTINGS)
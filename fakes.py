@@ -0,0 +1,320 @@
+"""
+Offline stand-ins for the Codeforces API client and the gspread objects used
+by generate.py. They replay recorded or synthetic data with a configurable
+latency and count every call, so runs can be measured without the network.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterator, List, Optional
+
+from cfapi import CodeforcesApiError
+from sheet_writer import a1_to_grid_range
+
+
+class CallStats:
+    """Thread-safe call counter shared by the fakes of one run."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.payload_bytes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, payload: Any = None):
+        size = len(json.dumps(payload, ensure_ascii=False, default=str)) if payload is not None else 0
+        with self._lock:
+            self.counts[name] += 1
+            self.payload_bytes[name] += size
+
+
+class FakeCodeforcesClient:
+    """
+    Serves contest.standings, contest.status and user.status from in-memory
+    data shaped like the real API responses.
+
+    :param contests: contest id -> {"contest": {...}, "problems": [...], "submissions": [...]},
+                     submissions newest first.
+    :param unknown_handles: Handles user.status rejects as not found (renamed or misspelled).
+    """
+
+    def __init__(self, contests: Dict[int, Dict[str, Any]], latency: float = 0.0,
+                 stats: Optional[CallStats] = None, unknown_handles: Collection[str] = ()):
+        self.contests = contests
+        self.unknown_handles = set(unknown_handles)
+        self.latency = latency
+        self.stats = stats or CallStats()
+        self._by_handle: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_recording(cls, directory: str, **kwargs) -> "FakeCodeforcesClient":
+        """
+        Loads contests recorded with record_contest(): one <contest_id>.json file per contest.
+        """
+        contests = {}
+        for path in sorted(Path(directory).glob("*.json")):
+            contests[int(path.stem)] = json.loads(path.read_text(encoding="utf-8"))
+        return cls(contests, **kwargs)
+
+    def _contest(self, contest_id: int) -> Dict[str, Any]:
+        if contest_id not in self.contests:
+            raise CodeforcesApiError(f"contestId: Contest with id {contest_id} not found", status_code=400)
+        return self.contests[contest_id]
+
+    def call(self, method: str, **params) -> Any:
+        if self.latency:
+            time.sleep(self.latency)
+        result = self._result(method, params)
+        self.stats.record(f"cf.{method}", result)
+        return result
+
+    def stream(self, method: str, **params) -> Iterator[Any]:
+        yield from self.call(method, **params)
+
+    def _user_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._index_lock:
+            if self._by_handle is None:
+                by_handle: Dict[str, List[Dict[str, Any]]] = {}
+                for contest in self.contests.values():
+                    for row in contest["submissions"]:
+                        for member in row["author"]["members"]:
+                            by_handle.setdefault(member["handle"], []).append(row)
+                for rows in by_handle.values():
+                    rows.sort(key=lambda row: row["id"], reverse=True)
+                self._by_handle = by_handle
+            return self._by_handle
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "contest.standings":
+            contest = self._contest(params["contestId"])
+            return {"contest": contest["contest"], "problems": contest["problems"], "rows": []}
+        if method == "contest.status":
+            rows = self._contest(params["contestId"])["submissions"]
+        elif method == "user.status":
+            if params["handle"] in self.unknown_handles:
+                raise CodeforcesApiError(f"handle: User with handle {params['handle']} not found", status_code=400)
+            rows = self._user_index().get(params["handle"], [])
+        else:
+            raise CodeforcesApiError(f"Method {method} is not faked")
+        start = (params.get("from") or 1) - 1
+        count = params.get("count")
+        return rows[start:start + count] if count else rows[start:]
+
+
+def record_contest(client, contest_id: int, directory: str):
+    """Saves a contest from a real CodeforcesClient in the format of FakeCodeforcesClient.from_recording."""
+    standings = client.call("contest.standings", contestId=contest_id, **{"from": 1}, count=1)
+    submissions = client.call("contest.status", contestId=contest_id)
+    data = {"contest": standings["contest"], "problems": standings["problems"], "submissions": submissions}
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    (Path(directory) / f"{contest_id}.json").write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def synthetic_contests(handles: List[str], num_contests: int, submissions_per_handle: int = 3,
+                       other_participants: int = 0, first_contest_id: int = 1000,
+                       seed: int = 0) -> Dict[int, Dict[str, Any]]:
+    """Generates finished contests with random submissions of the roster and of other participants."""
+    rng = random.Random(seed)
+    verdicts = ["OK", "WRONG_ANSWER", "TIME_LIMIT_EXCEEDED", "COMPILATION_ERROR"]
+    others = [f"other_{i}" for i in range(other_participants)]
+    contests = {}
+    submission_id = 1
+    for number in range(num_contests):
+        contest_id = first_contest_id + number
+        problems = [chr(ord("A") + i) for i in range(rng.randint(4, 8))]
+        submissions = []
+        for handle in handles + others:
+            for _ in range(rng.randint(0, submissions_per_handle * 2)):
+                submissions.append({
+                    "id": submission_id,
+                    "contestId": contest_id,
+                    "creationTimeSeconds": 1700000000 + submission_id,
+                    "relativeTimeSeconds": rng.randint(0, 7200),
+                    "problem": {"contestId": contest_id, "index": rng.choice(problems)},
+                    "author": {"members": [{"handle": handle}], "participantType": "CONTESTANT"},
+                    "programmingLanguage": "GNU C++17",
+                    "verdict": rng.choice(verdicts),
+                })
+                submission_id += 1
+        submissions.reverse()
+        contests[contest_id] = {
+            "contest": {"id": contest_id, "name": f"Contest {contest_id}", "phase": "FINISHED",
+                        "durationSeconds": 7200},
+            "problems": [{"contestId": contest_id, "index": index} for index in problems],
+            "submissions": submissions,
+        }
+    return contests
+
+
+def _numericise(value: Any) -> Any:
+    """Like gspread's get_all_records: numeric-looking strings become int or float."""
+    if not isinstance(value, str):
+        return value
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", sheet_id: int, title: str,
+                 records: Optional[List[Dict[str, Any]]] = None):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.records = records or []
+        self.cells: Dict[tuple, Any] = {}
+        self.rules: List[Dict[str, Any]] = []
+
+    def _record(self, name: str, payload: Any = None):
+        self.spreadsheet.client.call(f"sheets.{name}", payload)
+
+    def get_all_records(self, numericise_ignore: Optional[List[Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        self._record("get_all_records")
+        if numericise_ignore == ["all"]:
+            return [dict(record) for record in self.records]
+        return [{name: _numericise(value) for name, value in record.items()} for record in self.records]
+
+    def _rows(self) -> List[List[Any]]:
+        if not self.records:
+            return self._grid(max((row for row, _ in self.cells), default=-1) + 1,
+                              max((col for _, col in self.cells), default=-1) + 1)
+        header = list(self.records[0])
+        return [header] + [[record.get(name, "") for name in header] for record in self.records]
+
+    def row_values(self, row: int, **kwargs) -> List[Any]:
+        self._record("row_values")
+        rows = self._rows()
+        return [str(value) for value in rows[row - 1]] if row <= len(rows) else []
+
+    def col_values(self, col: int, **kwargs) -> List[Any]:
+        self._record("col_values")
+        values = [str(row[col - 1]) if col <= len(row) else "" for row in self._rows()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def _grid(self, rows: int, cols: int, row_offset: int = 0, col_offset: int = 0) -> List[List[Any]]:
+        return [[self.cells.get((row_offset + row, col_offset + col), "") for col in range(cols)]
+                for row in range(rows)]
+
+    def get_all_values(self, **kwargs) -> List[List[Any]]:
+        self._record("get_all_values")
+        if not self.cells:
+            return []
+        rows = max(row for row, _ in self.cells) + 1
+        cols = max(col for _, col in self.cells) + 1
+        return self._grid(rows, cols)
+
+    def get(self, range_name: str, **kwargs) -> List[List[Any]]:
+        self._record("get")
+        grid = a1_to_grid_range(self.id, range_name)
+        rows = grid["endRowIndex"] - grid["startRowIndex"]
+        cols = grid["endColumnIndex"] - grid["startColumnIndex"]
+        return self._grid(rows, cols, grid["startRowIndex"], grid["startColumnIndex"])
+
+    def write(self, range_name: str, values: List[List[Any]]):
+        grid = a1_to_grid_range(self.id, range_name)
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                self.cells[(grid["startRowIndex"] + row_offset, grid["startColumnIndex"] + col_offset)] = value
+
+    def update(self, range_name, values=None, **kwargs):
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        self._record("update", values)
+        self.write(range_name, values)
+
+    def update_acell(self, label: str, value):
+        self._record("update_acell", value)
+        self.write(label, [[value]])
+
+    def merge_cells(self, name: str, **kwargs):
+        self._record("merge_cells")
+
+    def format(self, ranges, format: Dict[str, Any]):
+        self._record("format", format)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client: "FakeClient", handles: List[Dict[str, Any]]):
+        self.client = client
+        self.id = "fake-spreadsheet"
+        self._next_id = 1
+        self._worksheets: List[FakeWorksheet] = []
+        self._add("handles", records=handles)
+
+    def _add(self, title: str, records=None) -> FakeWorksheet:
+        worksheet = FakeWorksheet(self, self._next_id, title, records)
+        self._next_id += 1
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.client.call("sheets.worksheets")
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.client.call("sheets.worksheet")
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> FakeWorksheet:
+        self.client.call("sheets.add_worksheet")
+        return self._add(title)
+
+    def del_worksheet(self, worksheet: FakeWorksheet):
+        self.client.call("sheets.del_worksheet")
+        self._worksheets.remove(worksheet)
+
+    def values_batch_update(self, body: Dict[str, Any]):
+        self.client.call("sheets.values_batch_update", body)
+        for data in body["data"]:
+            title, range_name = data["range"].rsplit("!", 1)
+            self.worksheet_by_title(title.strip("'").replace("''", "'")).write(range_name, data["values"])
+
+    def batch_update(self, body: Dict[str, Any]):
+        self.client.call("sheets.batch_update", body)
+        for request in body["requests"]:
+            if "addConditionalFormatRule" in request:
+                params = request["addConditionalFormatRule"]
+                worksheet = self._by_id(params["rule"]["ranges"][0].get("sheetId", 0))
+                worksheet.rules.insert(params.get("index", len(worksheet.rules)), params["rule"])
+            elif "deleteConditionalFormatRule" in request:
+                params = request["deleteConditionalFormatRule"]
+                del self._by_id(params.get("sheetId", 0)).rules[params["index"]]
+
+    def fetch_sheet_metadata(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.client.call("sheets.fetch_sheet_metadata")
+        return {"sheets": [{"properties": {"sheetId": worksheet.id}, "conditionalFormats": list(worksheet.rules)}
+                           for worksheet in self._worksheets]}
+
+    def _by_id(self, sheet_id: int) -> FakeWorksheet:
+        return next(worksheet for worksheet in self._worksheets if worksheet.id == sheet_id)
+
+    def worksheet_by_title(self, title: str) -> FakeWorksheet:
+        return next(worksheet for worksheet in self._worksheets if worksheet.title == title)
+
+
+class FakeClient:
+    """Stand-in for gspread.Client: every spreadsheet key opens the same fake spreadsheet."""
+
+    def __init__(self, handles: List[Dict[str, Any]], latency: float = 0.0, stats: Optional[CallStats] = None):
+        self.latency = latency
+        self.stats = stats or CallStats()
+        self.spreadsheet = FakeSpreadsheet(self, handles)
+
+    def call(self, name: str, payload: Any = None):
+        if self.latency:
+            time.sleep(self.latency)
+        self.stats.record(name, payload)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        return self.spreadsheet
@@ -0,0 +1,75 @@
+"""
+Chooses how the submissions of a contest are downloaded.
+
+Both strategies produce exactly the same ContestInfo:
+
+* STRATEGY_STATUS — contest.status, every submission of the contest;
+* STRATEGY_USER_STATUS — user.status for every roster handle, filtered by contest.
+
+contest.standings?handles=... is deliberately not a strategy: problemResults
+ignore compilation errors and report partial points, so the matrix would
+differ from the one built from submissions.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+STRATEGY_STATUS = "status"
+STRATEGY_USER_STATUS = "user.status"
+STRATEGIES = (STRATEGY_STATUS, STRATEGY_USER_STATUS)
+
+# Rough payload model: the API limit dominates for many small calls,
+# the download size for a few big ones.
+SUBMISSION_BYTES = 500
+BYTES_PER_SECOND = 2 * 1024 * 1024
+SUBMISSIONS_PER_USER = 400
+
+GYM_FIRST_ID = 100000
+GYM_SUBMISSIONS = 5000
+ROUND_SUBMISSIONS_PER_MINUTE = 500
+
+
+@dataclass
+class FetchEstimate:
+    strategy: str
+    calls: int
+    submissions: int
+    seconds: float
+
+
+def estimate_contest_submissions(contest_id: int, meta: Dict[str, Any]) -> int:
+    """Guesses the size of contest.status from the contest metadata."""
+    if contest_id >= GYM_FIRST_ID:
+        return GYM_SUBMISSIONS
+    duration_minutes = meta["contest"].get("durationSeconds", 2 * 60 * 60) // 60
+    return duration_minutes * ROUND_SUBMISSIONS_PER_MINUTE
+
+
+def _estimate(strategy: str, calls: int, submissions: int, calls_per_second: float) -> FetchEstimate:
+    seconds = calls / calls_per_second + submissions * SUBMISSION_BYTES / BYTES_PER_SECOND
+    return FetchEstimate(strategy=strategy, calls=calls, submissions=submissions, seconds=seconds)
+
+
+def estimate_strategies(contest_id: int, meta: Dict[str, Any], roster_size: int, calls_per_second: float,
+                        page_size: int, status_rows: Optional[int] = None,
+                        known_users: int = 0) -> List[FetchEstimate]:
+    """
+    :param page_size: Page size of paged contest.status downloads.
+    :param status_rows: Size of contest.status if it is known (0 when it is cached).
+    :param known_users: Roster handles whose user.status was already downloaded in this run.
+    """
+    if status_rows is None:
+        status_rows = estimate_contest_submissions(contest_id, meta)
+    status_calls = 0 if status_rows == 0 else max(1, -(-status_rows // page_size))
+    missing_users = max(0, roster_size - known_users)
+    return [
+        _estimate(STRATEGY_STATUS, status_calls, status_rows, calls_per_second),
+        _estimate(STRATEGY_USER_STATUS, missing_users, missing_users * SUBMISSIONS_PER_USER, calls_per_second),
+    ]
+
+
+def plan_fetch(contest_id: int, meta: Dict[str, Any], roster_size: int, calls_per_second: float,
+               page_size: int, status_rows: Optional[int] = None, known_users: int = 0) -> FetchEstimate:
+    """Returns the cheapest strategy for the contest."""
+    estimates = estimate_strategies(contest_id, meta, roster_size, calls_per_second, page_size, status_rows,
+                                    known_users)
+    return min(estimates, key=lambda estimate: estimate.seconds)
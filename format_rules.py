@@ -0,0 +1,169 @@
+"""
+Conditional format rules of one worksheet, reconciled before they are sent.
+
+Rules are collected locally while the worksheet is built (see
+SheetWriter.add_conditional_format_rule) and turned into one list of
+spreadsheets.batchUpdate requests on flush:
+
+- a rule whose ranges overlap an earlier queued rule replaces it;
+- a rule already on the sheet (same ranges, same gradient) is not sent again;
+- other gradient rules on the sheet with exactly the ranges of a new rule are
+  deleted, so reruns and incremental updates do not pile up duplicates.
+
+Only such gradient rules are treated as written by this tool: rules added by
+hand (a boolean highlight over A:Z, a gradient over an unbounded range, ...)
+are never deleted, even when they overlap a new rule.
+
+The rules already on the sheet are read (one spreadsheets.get) only when
+there is something to reconcile them with.
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Bounds = Tuple[int, int, int, int, int]  # sheetId, start row, end row, start col, end col; -1 = unbounded
+
+
+def _bounds(grid: Dict[str, Any]) -> Bounds:
+    # The API leaves out zero indexes; a missing end index means the range is unbounded.
+    return (grid.get("sheetId", 0), grid.get("startRowIndex", 0), grid.get("endRowIndex", -1),
+            grid.get("startColumnIndex", 0), grid.get("endColumnIndex", -1))
+
+
+def _spans_overlap(start_a: int, end_a: int, start_b: int, end_b: int) -> bool:
+    return (end_b == -1 or start_a < end_b) and (end_a == -1 or start_b < end_a)
+
+
+def ranges_overlap(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Whether two rules (API properties) share at least one cell."""
+    for first in map(_bounds, a.get("ranges", [])):
+        for second in map(_bounds, b.get("ranges", [])):
+            if (first[0] == second[0] and _spans_overlap(first[1], first[2], second[1], second[2])
+                    and _spans_overlap(first[3], first[4], second[3], second[4])):
+                return True
+    return False
+
+
+def same_ranges(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Whether two rules (API properties) cover exactly the same ranges."""
+    return sorted(map(_bounds, a.get("ranges", []))) == sorted(map(_bounds, b.get("ranges", [])))
+
+
+def is_owned(existing: Dict[str, Any], rule: Dict[str, Any]) -> bool:
+    """Whether a rule on the sheet is one this tool wrote for the ranges of rule."""
+    return "gradientRule" in existing and same_ranges(existing, rule)
+
+
+def _normalize(value: Any) -> Any:
+    # Colors come back from the API as float32 and with an extra colorStyle.
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if key != "colorStyle"}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def rule_key(rule: Dict[str, Any]) -> str:
+    """Identifies a rule by its ranges and formatting, ignoring how the API spells them."""
+    body = {key: value for key, value in rule.items() if key != "ranges"}
+    return json.dumps([sorted(map(_bounds, rule.get("ranges", []))), _normalize(body)], sort_keys=True)
+
+
+def read_conditional_rules(worksheet) -> List[Dict[str, Any]]:
+    """Conditional format rules currently on the worksheet, in order (one spreadsheets.get)."""
+    metadata = worksheet.spreadsheet.fetch_sheet_metadata(
+        params={"fields": "sheets(properties(sheetId),conditionalFormats)"})
+    for sheet in metadata.get("sheets", []):
+        if sheet.get("properties", {}).get("sheetId", 0) == worksheet.id:
+            return sheet.get("conditionalFormats", [])
+    return []
+
+
+class ConditionalRules:
+    """
+    :param sheet_id: Worksheet the rules belong to.
+    :param existing: Reads the rules already on the worksheet (called at most once,
+                     and only if rules are queued); None for a new worksheet.
+    :param known_count: Rules added to the worksheet earlier whose contents are not
+                        known (a resumed run): they are kept and never reconciled.
+    """
+
+    def __init__(self, sheet_id: int,
+                 existing: Optional[Callable[[], List[Dict[str, Any]]]] = None, known_count: int = 0):
+        self.sheet_id = sheet_id
+        self._load = existing
+        # Rules on the worksheet in order; None for the ones whose contents are unknown.
+        self._sheet: Optional[List[Optional[Dict[str, Any]]]] = None if existing is not None else []
+        self._unknown = known_count
+        self._pending: List[Dict[str, Any]] = []
+        self._planned: Tuple[set, List[Dict[str, Any]]] = (set(), [])
+
+    def add(self, rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Queues a rule; a queued rule with overlapping ranges is replaced.
+
+        :return: The queued rules it replaced.
+        """
+        replaced = [queued for queued in self._pending if ranges_overlap(queued, rule)]
+        if replaced:
+            self._pending = [queued for queued in self._pending if not ranges_overlap(queued, rule)]
+        self._pending.append(rule)
+        return replaced
+
+    @property
+    def pending(self) -> List[Dict[str, Any]]:
+        return list(self._pending)
+
+    @property
+    def count(self) -> int:
+        """Number of rules on the worksheet after the last flush."""
+        return self._unknown + len(self._sheet or [])
+
+    def _sheet_rules(self) -> List[Optional[Dict[str, Any]]]:
+        if self._sheet is None:
+            self._sheet = list(self._load())
+        return [None] * self._unknown + self._sheet
+
+    def requests(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Reconciles the queued rules with the worksheet.
+
+        :return: (delete requests, add requests), to be sent in this order;
+                 every add request keeps the queued rule dict under "rule".
+        """
+        if not self._pending:
+            return [], []
+        sheet = self._sheet_rules()
+        deleted, kept = set(), set()
+        to_add = []
+        for rule in self._pending:
+            key = rule_key(rule)
+            matched = False
+            for index, existing in enumerate(sheet):
+                if existing is None or index in deleted or index in kept or not is_owned(existing, rule):
+                    continue
+                if not matched and rule_key(existing) == key:
+                    # Already on the worksheet: keep the first copy, delete the duplicates.
+                    matched = True
+                    kept.add(index)
+                else:
+                    deleted.add(index)
+            if not matched:
+                to_add.append(rule)
+        deletes = [{"deleteConditionalFormatRule": {"sheetId": self.sheet_id, "index": index}}
+                   for index in sorted(deleted, reverse=True)]
+        remaining = len(sheet) - len(deleted)
+        adds = [{"addConditionalFormatRule": {"rule": rule, "index": remaining + offset}}
+                for offset, rule in enumerate(to_add)]
+        self._planned = (deleted, to_add)
+        return deletes, adds
+
+    def sent(self):
+        """Marks the requests from the last requests() call as sent."""
+        if not self._pending:
+            return
+        deleted, added = self._planned
+        self._sheet = [rule for index, rule in enumerate(self._sheet) if index + self._unknown not in deleted]
+        self._sheet.extend(added)
+        self._pending = []
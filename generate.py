@@ -1,68 +1,342 @@
-import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import csv
+from typing import Callable, Collection, Dict, Hashable, List, Optional, Tuple
 
 import config
-from cfscript import CodeforcesServer
-from worksheets import insert_contest_info, client_init_json, get_table_by_id, create_worksheet, update_children_info,extract_data_from_sheet, insert_sum_formula, insert_main_sum_column
+import tracing
+from archive import ArchivedContests, ResultsArchive
+from cf_cache import ResponseCache
+from cfapi import CodeforcesClient
+from cfscript import CodeforcesServer, ContestInfo
+from fetch_planner import STRATEGIES
+from journal import RunJournal, file_digest, run_fingerprint
+from layout import header, plan_layout
+from metrics import METRICS
+from roster_cache import ROSTER_MAX_AGE, RosterCache
+from sinks import OutputSink, SheetsSink, sink_for_path
+from worksheets import client_init_json, get_table_by_id, extract_data_from_sheet, SUM_MODES
 
-contests_ids = config.CONTEST_IDS
-table_link = config.TABLE_LINK
-table_id = config.TABLE_ID
-worksheet_name = config.WORKSHEET_NAME
-header = [["Фамилия", "Имя", "Cf", "Σ"]]
+# Spreadsheets written at the same time in multi-group runs.
+GROUP_WRITE_WORKERS = 4
 
-if __name__ == "__main__":
-    if not contests_ids:
-        raise RuntimeError("CONTEST_IDS is required in config.local.py (list of contest IDs).")
-    if not table_id:
-        raise RuntimeError("TABLE_ID is required in config.local.py (Google Sheet key).")
-    client = client_init_json()
-    cur_table = get_table_by_id(client, table_id)
-    cfserver = CodeforcesServer()
-    worksheet_names = [ws.title for ws in cur_table.worksheets()]
-    if worksheet_name in worksheet_names:
-        worksheet = cur_table.worksheet(worksheet_name)
-        cur_table.del_worksheet(worksheet)
-
-    create_worksheet(table=cur_table, title=worksheet_name, rows=20, cols=500)
-    worksheet = cur_table.worksheet(worksheet_name)
-    children = extract_data_from_sheet(table=cur_table, sheet_name="handles")
+
+@dataclass
+class Target:
+    """One group: a worksheet with results and the sheet with its roster."""
+    table_id: str
+    worksheet_name: str
+    roster_sheet: str = "handles"
+
+    @property
+    def key(self) -> str:
+        return f"{self.table_id}/{self.worksheet_name}"
+
+
+def targets_from_config(entries: List[Dict[str, str]]) -> List[Target]:
+    targets = [Target(**entry) for entry in entries]
+    keys = [target.key for target in targets]
+    if len(set(keys)) != len(keys):
+        raise RuntimeError("TARGETS contains the same worksheet twice.")
+    return targets
+
+
+def load_roster(cur_table, roster_sheet: str = "handles",
+                cache: Optional[RosterCache] = None) -> Tuple[List[List[str]], Dict[str, int]]:
+    """
+    Reads the roster of a group.
+
+    :param cache: Reuse the roster of an earlier run while its handle column is unchanged.
+    :return: Rows (surname, name, handle) and handle -> row index.
+    """
+    if cache is None:
+        return index_roster(extract_data_from_sheet(table=cur_table, sheet_name=roster_sheet))
+    return index_roster(cache.load(f"{cur_table.id}/{roster_sheet}", cur_table.worksheet(roster_sheet)))
+
+
+def load_roster_csv(path: str) -> Tuple[List[List[str]], Dict[str, int]]:
+    """Reads a roster from a CSV file with the columns of the "handles" sheet: surname, name, cf_login."""
+    with open(path, encoding="utf-8", newline="") as file:
+        children = [[row.get("surname", ""), row.get("name", ""), row.get("cf_login", "")]
+                    for row in csv.DictReader(file)]
+    return index_roster(children)
+
+
+def load_archived_roster(archive: ResultsArchive, group: Hashable) -> Tuple[List[List[str]], Dict[str, int]]:
+    """Reads the roster archived for the group (see archive.py)."""
+    children = archive.roster(group)
+    if children is None:
+        raise RuntimeError(f"No roster of {group!r} in the archive {archive.path}, pass --roster.")
+    return index_roster(children)
+
+
+def archived_roster_key(archive: ResultsArchive, candidates: List[str]) -> str:
+    """
+    The first of the keys a roster may have been archived under.
+    Rosters are archived under the key of the run that published them: the worksheet
+    name of a single run, "<table_id>/<worksheet>" of a TARGETS run, the output path of an export.
+    """
+    groups = archive.roster_groups()
+    for key in candidates:
+        if key in groups:
+            return key
+    raise RuntimeError(f"No roster of {' or '.join(map(repr, candidates))} in the archive {archive.path}, "
+                       f"pass --group (one of {groups}) or --roster.")
+
+
+def index_roster(children: List[List[str]]) -> Tuple[List[List[str]], Dict[str, int]]:
     map = {}
     i = 0
     for child in children:
         print(child)
         map[child[2]] = i
         i += 1
+    return children, map
+
+
+@dataclass
+class Group:
+    """One roster and where its results are written."""
+    sink: OutputSink
+    children: List[List[str]]
+    niknames: Dict[str, int]
+
+
+def publish(groups: Dict[Hashable, Group], cfserver: CodeforcesServer, contests_ids: List[int], sum_mode: str,
+            max_workers: int = GROUP_WRITE_WORKERS, journal: Optional[RunJournal] = None,
+            metrics: Collection[str] = (), archive: Optional[ResultsArchive] = None) -> Dict[Hashable, int]:
+    """
+    Builds the results of one or several rosters.
+
+    The layout is planned from the contest problem lists first, so the sinks
+    write their static part while the submissions are downloaded. Every
+    contest is downloaded once for all rosters; the sinks are written in parallel.
+
+    :param cfserver: CodeforcesServer, or archive.ArchivedContests to build from the archive.
+    :param journal: Records every completed step; steps already in it are skipped.
+    :param metrics: Extra metrics collected in the same pass (see metrics.py) and written next to the results.
+    :param archive: Every fetched contest and the rosters are appended to it.
+    :return: key -> number of Sheets requests sent.
+    """
+    metas = cfserver.contest_metas(contests_ids)
+    layout = plan_layout(contests_ids, metas, header_size=len(header[0]))
 
-    update_children_info(worksheet=worksheet, header=header, children=children)
-
-    start = len(header[0]) + 1  # First contest starts at column E (5)
-    # Track all contest Σ columns (each contest has its Σ column at start_col)
-    contest_sum_columns = []  # List of column numbers that are Σ columns for each contest
-    result_start_row = 3  # Results start at row 3
-    num_children = len(children)
-    end_row = result_start_row + num_children - 1
-    
-    for contest_id in contests_ids:
-        time.sleep(20)
-        contest = cfserver.generate_contest_info(contest_id=contest_id, niknames=map)
-        insert_contest_info(worksheet = worksheet, contest_info = contest, start_col = start)
-        print(len(contest.Result))
-        # Track the Σ column for this contest (at start_col)
-        contest_sum_columns.append(start)
-        start += len(contest.Tasks) + 1  # Move to next contest (skip Σ column + tasks)
-    
-    time.sleep(20)
-    # Insert main Σ column formula and apply gradient formatting
-    if contest_sum_columns:
-        sum_col = len(header[0])  # Column D (4)
-        insert_main_sum_column(
-            worksheet=worksheet,
-            sum_col=sum_col,
-            contest_sum_columns=contest_sum_columns,
-            start_row=result_start_row,
-            end_row=end_row,
-            num_contests=len(contests_ids)
-        )
-
-    
-    
+    def prepare(key: Hashable, group: Group):
+        if journal is None:
+            group.sink.prepare(group.children, layout, sum_mode)
+            return
+        state = journal.prepared.get(str(key))
+        if state is not None and group.sink.resume(state):
+            return
+        group.sink.prepare(group.children, layout, sum_mode)
+        state = group.sink.checkpoint()
+        if state is not None:
+            journal.record_prepared(key, state)
+
+    pending = {key: group for key, group in groups.items() if journal is None or str(key) not in journal.written}
+    if not pending:
+        return {}
+    done = set(journal.contests) if journal is not None else set()
+    if archive is not None:
+        for key, group in pending.items():
+            archive.record_roster(key, group.children)
+    niknames = {key: group.niknames for key, group in pending.items()}
+
+    def on_contest(contest_id: int, infos: Dict[Hashable, ContestInfo]):
+        if journal is not None:
+            journal.record_contest(contest_id, infos)
+        if archive is not None:
+            archive.record_contest(contest_id, metas[contest_id], infos, niknames)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as prepare_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as write_pool:
+        prepared = {key: prepare_pool.submit(prepare, key, group) for key, group in pending.items()}
+        fetched = cfserver.fetch_group_contests(
+            contest_ids=[contest_id for contest_id in contests_ids if contest_id not in done], metas=metas,
+            groups=niknames, on_contest=on_contest, metrics=metrics,
+            on_submissions=archive.record_submissions if archive is not None else None)
+        contests = {key: iter(infos) for key, infos in fetched.items()}
+
+        def write(key: Hashable) -> int:
+            group = groups[key]
+            results = [journal.contest(contest_id, key) if contest_id in done else next(contests[key])
+                       for contest_id in contests_ids]
+            prepared[key].result()
+            sent = group.sink.write(group.children, layout, results, sum_mode)
+            if journal is not None:
+                journal.record_written(key)
+            return sent
+
+        return dict(zip(pending, write_pool.map(write, pending)))
+
+
+def load_group_roster(key: Hashable, loader: Callable[[], Tuple[List[List[str]], Dict[str, int]]],
+                      journal: Optional[RunJournal] = None) -> Tuple[List[List[str]], Dict[str, int]]:
+    """Loads a roster, or takes it from the journal of the run being resumed."""
+    children = journal.roster(key) if journal is not None else None
+    if children is not None:
+        return index_roster(children)
+    children, map = loader()
+    if journal is not None:
+        journal.record_roster(key, children)
+    return children, map
+
+
+def run(cur_table, cfserver: CodeforcesServer, contests_ids: List[int], worksheet_name: str, sum_mode: str,
+        incremental: bool = False, journal: Optional[RunJournal] = None, metrics: Collection[str] = (),
+        roster_cache: Optional[RosterCache] = None, archive: Optional[ResultsArchive] = None) -> int:
+    """
+    Builds (or incrementally updates) the results worksheet.
+
+    :param cur_table: Spreadsheet with the "handles" sheet.
+    :return: Number of Sheets requests sent by the deferred writer.
+    """
+    children, map = load_group_roster(worksheet_name, lambda: load_roster(cur_table, cache=roster_cache), journal)
+    group = Group(sink=SheetsSink(cur_table, worksheet_name, incremental), children=children, niknames=map)
+    return publish({worksheet_name: group}, cfserver, contests_ids, sum_mode, journal=journal,
+                   metrics=metrics, archive=archive).get(worksheet_name, 0)
+
+
+def run_groups(client, cfserver: CodeforcesServer, targets: List[Target], contests_ids: List[int], sum_mode: str,
+               incremental: bool = False, max_workers: int = GROUP_WRITE_WORKERS,
+               journal: Optional[RunJournal] = None, metrics: Collection[str] = (),
+               roster_cache: Optional[RosterCache] = None, archive: Optional[ResultsArchive] = None) -> Dict[str, int]:
+    """
+    Builds the results of several groups: every contest is downloaded once,
+    the matrices of all rosters are filled in one pass over its submissions
+    and the spreadsheets are written in parallel.
+
+    :param client: gspread Client.
+    :return: target key -> number of Sheets requests sent.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        table_ids = list(dict.fromkeys(target.table_id for target in targets))
+        tables = dict(zip(table_ids, pool.map(lambda table_id: get_table_by_id(client, table_id), table_ids)))
+        rosters = list(pool.map(
+            lambda target: load_group_roster(
+                target.key, lambda: load_roster(tables[target.table_id], target.roster_sheet, roster_cache), journal),
+            targets))
+
+    groups = {target.key: Group(sink=SheetsSink(tables[target.table_id], target.worksheet_name, incremental),
+                                children=children, niknames=niknames)
+              for target, (children, niknames) in zip(targets, rosters)}
+    return publish(groups, cfserver, contests_ids, sum_mode, max_workers, journal, metrics, archive)
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Generate the Codeforces results table.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the existing worksheet in place instead of recreating it")
+    parser.add_argument("--trace-report", help="write a JSON report of all external calls to this file")
+    parser.add_argument("--prometheus", help="write the call metrics as a Prometheus textfile")
+    parser.add_argument("--output", help="write a local .xlsx, .csv or .parquet file instead of the worksheet")
+    parser.add_argument("--roster", help="CSV with surname,name,cf_login columns instead of the \"handles\" sheet")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the previous run after a failure, skipping the steps it completed")
+    parser.add_argument("--refresh-roster", action="store_true",
+                        help="read the whole roster sheet even if the cached roster looks up to date")
+    parser.add_argument("--metrics", help=f"comma-separated extra metrics ({', '.join(METRICS)}), "
+                                          f"overrides EXTRA_METRICS")
+    parser.add_argument("--from-archive", action="store_true",
+                        help="take the contests from the results archive (ARCHIVE_PATH) instead of Codeforces; "
+                             "with --output the roster comes from the archive too")
+    parser.add_argument("--group", help="archived roster used by --from-archive --output: a worksheet name, "
+                                        "<table_id>/<worksheet> of TARGETS or an output path "
+                                        "(default: the configured run's)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    args = build_parser(prog).parse_args(argv)
+    contests_ids = config.CONTEST_IDS
+    table_id = config.TABLE_ID
+    worksheet_name = config.WORKSHEET_NAME
+    sum_mode = config.SUM_FORMULA_MODE
+    metrics = args.metrics.split(",") if args.metrics is not None else config.EXTRA_METRICS
+
+    if not contests_ids:
+        raise RuntimeError("CONTEST_IDS is required in config.local.py (list of contest IDs).")
+    targets = targets_from_config(config.TARGETS)
+    if not table_id and not targets and not (args.output and (args.roster or args.from_archive)):
+        raise RuntimeError("TABLE_ID (or TARGETS) is required in config.local.py (Google Sheet key).")
+    if sum_mode not in SUM_MODES:
+        raise RuntimeError(f"SUM_FORMULA_MODE must be one of {SUM_MODES}, got {sum_mode!r}.")
+    if config.CF_FETCH_STRATEGY is not None and config.CF_FETCH_STRATEGY not in STRATEGIES:
+        raise RuntimeError(f"CF_FETCH_STRATEGY must be one of {STRATEGIES} or None, "
+                           f"got {config.CF_FETCH_STRATEGY!r}.")
+    unknown_metrics = [metric for metric in metrics if metric not in METRICS]
+    if unknown_metrics:
+        raise RuntimeError(f"Unknown metrics {unknown_metrics}, expected some of {list(METRICS)}.")
+    if args.from_archive and not config.ARCHIVE_PATH:
+        raise RuntimeError("--from-archive needs ARCHIVE_PATH in config.local.py.")
+    # Every external call is traced; the quota guards slow the run down before Sheets quotas run out.
+    tracer = tracing.Tracer()
+    tracing.start(tracer)
+    cf_client = tracing.TracedCodeforcesClient(
+        CodeforcesClient(api_key=config.CF_API_KEY, secret=config.CF_API_SECRET), tracer)
+    archive = ResultsArchive(config.ARCHIVE_PATH) if config.ARCHIVE_PATH else None
+    if args.from_archive:
+        cfserver = ArchivedContests(archive)
+    else:
+        cfserver = CodeforcesServer(cache=ResponseCache(config.CF_CACHE_PATH) if config.CF_CACHE_PATH else None,
+                                    strategy=config.CF_FETCH_STRATEGY, client=cf_client)
+        cfserver.on_retry = tracer.record_retry
+    # A run from the archive has nothing new to append to it.
+    append_to = None if args.from_archive else archive
+    roster_cache = None
+    if config.ROSTER_CACHE_PATH:
+        roster_cache = RosterCache(config.ROSTER_CACHE_PATH, max_age=0 if args.refresh_roster else ROSTER_MAX_AGE)
+    destination = args.output or [target.key for target in targets] or [table_id, worksheet_name]
+    journal = RunJournal(config.JOURNAL_PATH,
+                         run_fingerprint(contests_ids, sum_mode, destination,
+                                         file_digest(args.roster) if args.roster else None, args.incremental,
+                                         metrics),
+                         resume=args.resume)
+    try:
+        if args.output:
+            if args.roster:
+                children, map = load_group_roster(args.output, lambda: load_roster_csv(args.roster), journal)
+            elif args.from_archive:
+                # The roster archived by the last run of the configured worksheet (or of this export).
+                if args.group:
+                    candidates = [args.group]
+                elif len(targets) > 1:
+                    raise RuntimeError(f"TARGETS has {len(targets)} groups, choose the roster with --group "
+                                       f"(one of {[target.key for target in targets]}).")
+                else:
+                    candidates = [targets[0].key if targets else worksheet_name, args.output]
+                key = archived_roster_key(archive, candidates)
+                children, map = load_group_roster(args.output, lambda: load_archived_roster(archive, key), journal)
+            else:
+                client = tracing.TracedClient(client_init_json(), tracer)
+                children, map = load_group_roster(
+                    args.output, lambda: load_roster(get_table_by_id(client, table_id), cache=roster_cache), journal)
+            group = Group(sink=sink_for_path(args.output, worksheet_name), children=children, niknames=map)
+            publish({args.output: group}, cfserver=cfserver, contests_ids=contests_ids, sum_mode=sum_mode,
+                    journal=journal, metrics=metrics, archive=append_to)
+        elif targets:
+            client = tracing.TracedClient(client_init_json(), tracer)
+            run_groups(client=client, cfserver=cfserver, targets=targets, contests_ids=contests_ids,
+                       sum_mode=sum_mode, incremental=args.incremental, journal=journal, metrics=metrics,
+                       roster_cache=roster_cache, archive=append_to)
+        else:
+            client = tracing.TracedClient(client_init_json(), tracer)
+            run(cur_table=get_table_by_id(client, table_id), cfserver=cfserver, contests_ids=contests_ids,
+                worksheet_name=worksheet_name, sum_mode=sum_mode, incremental=args.incremental, journal=journal,
+                metrics=metrics, roster_cache=roster_cache, archive=append_to)
+        journal.finish()
+    finally:
+        journal.close()
+        if roster_cache is not None:
+            roster_cache.close()
+        if archive is not None:
+            archive.close()
+        if args.trace_report:
+            tracer.write_json(args.trace_report)
+        if args.prometheus:
+            tracer.write_prometheus(args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
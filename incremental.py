@@ -0,0 +1,257 @@
+"""
+Incremental worksheet update: the current grid is read once, diffed against
+freshly computed contest results and only the changed cells are written.
+Formatting is reapplied only for blocks whose layout changed.
+"""
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Set, Tuple
+
+from cfscript import ContestInfo
+from results import ResultStore
+from sheet_writer import VALUE_INPUT_RAW, VALUE_INPUT_USER_ENTERED, column_letter_to_number
+from worksheets import (column_number_to_letter, insert_contest_info, insert_main_sum_column,
+                        main_sum_formula_cells, sum_formula_cells, update_children_info)
+
+RESULT_START_ROW = 3
+
+# Marks cells that are filled by an ARRAYFORMULA spill and must not be touched.
+SPILL = object()
+
+Cell = Tuple[int, int]  # (row, col), 1-based
+
+
+@dataclass
+class ContestBlock:
+    start_col: int
+    contest: ContestInfo
+
+    @property
+    def end_col(self) -> int:
+        return self.start_col + len(self.contest.Tasks)
+
+
+def plan_blocks(contests: List[ContestInfo], first_col: int) -> List[ContestBlock]:
+    """Places contest blocks one after another starting from first_col."""
+    blocks = []
+    start = first_col
+    for contest in contests:
+        blocks.append(ContestBlock(start_col=start, contest=contest))
+        start += len(contest.Tasks) + 1
+    return blocks
+
+
+def read_grid(worksheet) -> List[List[Any]]:
+    """Reads the whole worksheet in one request, formulas instead of their values."""
+    return worksheet.get_all_values(value_render_option="FORMULA")
+
+
+def _normalize(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _put_range(cells: Dict[Cell, Any], row: int, col: int, values: List[List[Any]]):
+    for row_offset, row_values in enumerate(values):
+        for col_offset, value in enumerate(row_values):
+            cells[(row + row_offset, col + col_offset)] = value
+
+
+def _put_formulas(cells: Dict[Cell, Any], formula_cells, end_row: int):
+    for address, values in formula_cells:
+        top_left = address.split(":")[0]
+        letters = top_left.rstrip("0123456789")
+        row = int(top_left[len(letters):])
+        col = column_letter_to_number(letters)
+        _put_range(cells, row, col, values)
+        if len(values) == 1 and ":" not in address and row < end_row:
+            # A single formula for a whole column is an ARRAYFORMULA spill.
+            for spill_row in range(row + 1, end_row + 1):
+                cells[(spill_row, col)] = SPILL
+
+
+def build_grid(header: List[List[str]], children: List[List[str]], blocks: List[ContestBlock],
+               sum_mode: str, store: ResultStore) -> Dict[Cell, Any]:
+    """Computes the values the worksheet should contain, keyed by (row, col)."""
+    cells: Dict[Cell, Any] = {}
+    end_row = RESULT_START_ROW + len(children) - 1
+    contest_totals = store.contest_totals()
+
+    _put_range(cells, 2, 1, header)
+    _put_range(cells, RESULT_START_ROW, 1, children)
+
+    for index, block in enumerate(blocks):
+        contest = block.contest
+        cells[(1, block.start_col)] = contest.name
+        cells[(2, block.start_col)] = "Σ"
+        _put_range(cells, 2, block.start_col + 1, [contest.Tasks])
+        results = [["" if cell == -1 else cell for cell in row] for row in contest.Result]
+        _put_range(cells, RESULT_START_ROW, block.start_col + 1, results)
+        _put_formulas(cells, sum_formula_cells(block.start_col, block.end_col, RESULT_START_ROW, end_row, sum_mode,
+                                               contest_totals[:, index]), end_row)
+
+    if blocks:
+        sum_col = len(header[0])
+        contest_sum_columns = [block.start_col for block in blocks]
+        _put_formulas(cells, main_sum_formula_cells(sum_col, contest_sum_columns, RESULT_START_ROW, end_row, sum_mode,
+                                                    store.totals()), end_row)
+    return cells
+
+
+def _existing_value(grid: List[List[Any]], row: int, col: int) -> Any:
+    if row - 1 < len(grid) and col - 1 < len(grid[row - 1]):
+        return grid[row - 1][col - 1]
+    return ""
+
+
+def diff_grid(grid: List[List[Any]], desired: Dict[Cell, Any], written: Collection[Cell] = ()) -> Dict[Cell, Any]:
+    """
+    Returns the cells that have to be written so that the worksheet matches desired.
+    Non-empty cells outside of the desired layout are cleared.
+
+    :param written: Desired cells that are already written another way (rebuilt blocks);
+                    they are left out, except for clearing formulas in the way of a spill.
+    """
+    changes: Dict[Cell, Any] = {}
+    for (row, col), value in desired.items():
+        existing = _existing_value(grid, row, col)
+        if value is SPILL:
+            # Leftover per-row formulas would block the spill with #REF!.
+            if isinstance(existing, str) and existing.startswith("="):
+                changes[(row, col)] = ""
+            continue
+        if (row, col) in written:
+            continue
+        if _normalize(existing) != _normalize(value):
+            changes[(row, col)] = value
+
+    for row_idx, row_values in enumerate(grid):
+        for col_idx, value in enumerate(row_values):
+            cell = (row_idx + 1, col_idx + 1)
+            if cell not in desired and _normalize(value) != "":
+                changes[cell] = ""
+    return changes
+
+
+def _value_input_option(value: Any) -> str:
+    if isinstance(value, str) and value.startswith("="):
+        return VALUE_INPUT_USER_ENTERED
+    return VALUE_INPUT_RAW
+
+
+def group_changes(changes: Dict[Cell, Any]) -> List[Tuple[str, List[List[Any]], str]]:
+    """
+    Groups changed cells into horizontal runs so that neighbouring changes are
+    written as one range.
+
+    :return: List of (A1 range, values, value input option).
+    """
+    ranges = []
+    run: List[Tuple[Cell, Any]] = []
+
+    def close_run():
+        if not run:
+            return
+        (row, first_col), _ = run[0]
+        last_col = run[-1][0][1]
+        address = f"{column_number_to_letter(first_col)}{row}"
+        if last_col != first_col:
+            address += f":{column_number_to_letter(last_col)}{row}"
+        ranges.append((address, [[value for _, value in run]], _value_input_option(run[0][1])))
+        run.clear()
+
+    for cell in sorted(changes):
+        value = changes[cell]
+        if run:
+            (row, col), last_value = run[-1]
+            if cell != (row, col + 1) or _value_input_option(value) != _value_input_option(last_value):
+                close_run()
+        run.append((cell, value))
+    close_run()
+    return ranges
+
+
+def _block_layout_changed(grid: List[List[Any]], block: ContestBlock, num_children: int,
+                          old_num_children: int) -> bool:
+    if num_children != old_num_children:
+        return True
+    contest = block.contest
+    if _normalize(_existing_value(grid, 1, block.start_col)) != contest.name:
+        return True
+    old_tasks = [_normalize(_existing_value(grid, 2, col)) for col in range(block.start_col + 1, block.end_col + 1)]
+    # The column after the block must be empty or start another block.
+    next_header = _normalize(_existing_value(grid, 2, block.end_col + 1))
+    return old_tasks != contest.Tasks or next_header not in ("", "Σ")
+
+
+def _old_children_count(grid: List[List[Any]], handle_col: int) -> int:
+    count = 0
+    for row in grid[RESULT_START_ROW - 1:]:
+        if handle_col - 1 < len(row) and _normalize(row[handle_col - 1]) != "":
+            count += 1
+        else:
+            break
+    return count
+
+
+def apply_incremental_update(worksheet, grid: List[List[Any]], header: List[List[str]],
+                             children: List[List[str]], contests: List[ContestInfo],
+                             sum_mode: str) -> int:
+    """
+    Brings the worksheet up to date with the given contests without rebuilding it.
+
+    :param worksheet: SheetWriter (or Worksheet) the changes are written to.
+    :param grid: Current worksheet contents, see read_grid.
+    :return: Number of cells written.
+    """
+    num_children = len(children)
+    end_row = RESULT_START_ROW + num_children - 1
+    header_size = len(header[0])
+    blocks = plan_blocks(contests, first_col=header_size + 1)
+    store = ResultStore.from_contests(num_children, contests)
+    contest_totals = store.contest_totals()
+    old_num_children = _old_children_count(grid, handle_col=3)
+    old_header = [_normalize(_existing_value(grid, 2, col)) for col in range(1, header_size + 1)]
+
+    # Cells written in full by the layout writers below are not diffed again.
+    written: Set[Cell] = set()
+    if num_children != old_num_children or old_header != header[0]:
+        worksheet.unmerge_cells(f"A1:{column_number_to_letter(header_size)}2")
+        update_children_info(worksheet=worksheet, header=header, children=children)
+        written.update((2, col) for col in range(1, header_size + 1))
+        written.update((row, col) for row in range(RESULT_START_ROW, end_row + 1) for col in range(1, header_size))
+
+    changed_blocks = [block for block in blocks
+                      if _block_layout_changed(grid, block, num_children, old_num_children)]
+    if changed_blocks:
+        # Blocks before the first changed one keep their title merges, everything
+        # after it is unmerged and merged again with the new widths.
+        worksheet.unmerge_cells(f"{column_number_to_letter(changed_blocks[0].start_col)}1:1")
+    for block in changed_blocks:
+        insert_contest_info(worksheet=worksheet, contest_info=block.contest, start_col=block.start_col,
+                            sum_mode=sum_mode, totals=contest_totals[:, blocks.index(block)])
+        written.update((row, col) for row in range(1, end_row + 1)
+                       for col in range(block.start_col, block.end_col + 1))
+    if blocks and changed_blocks:
+        # The main Σ column is rewritten (with its formatting) below.
+        written.update((row, header_size) for row in range(RESULT_START_ROW, end_row + 1))
+
+    # Only the blocks whose layout did not change are written by diffing.
+    changes = diff_grid(grid, build_grid(header, children, blocks, sum_mode, store), written)
+    for address, values, value_input_option in group_changes(changes):
+        worksheet.update(address, values, value_input_option=value_input_option)
+
+    if blocks and changed_blocks:
+        insert_main_sum_column(
+            worksheet=worksheet,
+            sum_col=len(header[0]),
+            contest_sum_columns=[block.start_col for block in blocks],
+            start_row=RESULT_START_ROW,
+            end_row=end_row,
+            num_contests=len(blocks),
+            mode=sum_mode,
+            totals=store.totals(),
+        )
+    return len(changes)
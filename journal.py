@@ -0,0 +1,135 @@
+"""
+Checkpoint journal of a generate.py run.
+
+Every completed step is appended to a JSON lines file and synced to disk:
+roster loaded, contest fetched, worksheet prepared (static part written) and
+results written. A run started with --resume replays the journal of the
+previous, unfinished run with the same fingerprint and skips those steps.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict
+from typing import Any, Dict, Hashable, List, Optional
+
+from cfscript import ContestInfo
+
+STEP_RUN = "run"
+STEP_ROSTER = "roster"
+STEP_CONTEST = "contest"
+STEP_PREPARED = "prepared"
+STEP_WRITTEN = "written"
+STEP_FINISHED = "finished"
+
+
+def run_fingerprint(*parts: Any) -> str:
+    """Identifies what a run produces: a journal is only resumed by an identical run."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Digest of a file's contents, for run_fingerprint: an edited roster CSV is a different run."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunJournal:
+    """
+    :param path: JSON lines file, rewritten by every run that does not resume.
+    :param fingerprint: See run_fingerprint.
+    :param resume: Continue the previous run if it has the same fingerprint and did not finish.
+    """
+
+    def __init__(self, path: str, fingerprint: str, resume: bool = False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.rosters: Dict[str, List[List[str]]] = {}
+        self.contests: Dict[int, Dict[str, ContestInfo]] = {}
+        self.prepared: Dict[str, Dict[str, Any]] = {}
+        self.written: set = set()
+        self._lock = threading.Lock()
+
+        entries = self._read() if resume else []
+        if entries and entries[0].get("fingerprint") == fingerprint and entries[-1]["step"] != STEP_FINISHED:
+            for entry in entries[1:]:
+                self._apply(entry)
+            # Rewritten without a line cut short by a crash, so new steps do not end up glued to it.
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            print(f"Resuming: {len(self.rosters)} rosters, {len(self.contests)} contests, "
+                  f"{len(self.prepared)} worksheets prepared, {len(self.written)} written")
+        else:
+            if resume:
+                print("Nothing to resume, starting a new run")
+            self._file = open(path, "w", encoding="utf-8")
+            self._append({"step": STEP_RUN, "fingerprint": fingerprint})
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # The last line may be cut short by a crash.
+                    break
+        return entries
+
+    def _apply(self, entry: Dict[str, Any]):
+        step = entry["step"]
+        if step == STEP_ROSTER:
+            self.rosters[entry["group"]] = entry["children"]
+        elif step == STEP_CONTEST:
+            self.contests[entry["contest_id"]] = {group: ContestInfo(**info)
+                                                  for group, info in entry["results"].items()}
+        elif step == STEP_PREPARED:
+            self.prepared[entry["group"]] = entry["state"]
+        elif step == STEP_WRITTEN:
+            self.written.add(entry["group"])
+
+    def _append(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_roster(self, group: Hashable, children: List[List[str]]):
+        self.rosters[str(group)] = children
+        self._append({"step": STEP_ROSTER, "group": str(group), "children": children})
+
+    def record_contest(self, contest_id: int, results: Dict[Hashable, ContestInfo]):
+        with self._lock:
+            self.contests[contest_id] = {str(group): info for group, info in results.items()}
+        self._append({"step": STEP_CONTEST, "contest_id": contest_id,
+                      "results": {str(group): asdict(info) for group, info in results.items()}})
+
+    def record_prepared(self, group: Hashable, state: Dict[str, Any]):
+        self.prepared[str(group)] = state
+        self._append({"step": STEP_PREPARED, "group": str(group), "state": state})
+
+    def record_written(self, group: Hashable):
+        with self._lock:
+            self.written.add(str(group))
+        self._append({"step": STEP_WRITTEN, "group": str(group)})
+
+    def finish(self):
+        self._append({"step": STEP_FINISHED})
+        self.close()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def roster(self, group: Hashable) -> Optional[List[List[str]]]:
+        return self.rosters.get(str(group))
+
+    def contest(self, contest_id: int, group: Hashable) -> Optional[ContestInfo]:
+        return self.contests.get(contest_id, {}).get(str(group))
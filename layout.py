@@ -0,0 +1,61 @@
+"""
+Worksheet layout planned from contest metadata alone.
+
+Contest blocks are placed one after another, so the start column of a block
+depends on the task counts of all previous ones. The problem lists come from
+contest.standings with one row (cheap and cached), so the whole layout, the
+Σ columns and the main Σ references are known before any submissions are
+downloaded, and the static part of the worksheet can be written while the
+results are still being fetched.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+RESULT_START_ROW = 3
+# Roster columns; the last one is the main Σ column.
+header = [["Фамилия", "Имя", "Cf", "Σ"]]
+
+
+@dataclass
+class BlockLayout:
+    contest_id: int
+    name: str
+    tasks: List[str]
+    start_col: int
+
+    @property
+    def end_col(self) -> int:
+        return self.start_col + len(self.tasks)
+
+
+@dataclass
+class SheetLayout:
+    header_size: int
+    blocks: List[BlockLayout]
+
+    @property
+    def sum_col(self) -> int:
+        """Main Σ column: the last header column."""
+        return self.header_size
+
+    @property
+    def contest_sum_columns(self) -> List[int]:
+        return [block.start_col for block in self.blocks]
+
+    def end_row(self, num_children: int) -> int:
+        return RESULT_START_ROW + num_children - 1
+
+
+def plan_layout(contest_ids: List[int], metas: Dict[int, Dict[str, Any]], header_size: int) -> SheetLayout:
+    """
+    :param metas: contest id -> contest meta (see CodeforcesServer.contest_meta).
+    :param header_size: Number of roster columns; the first block starts right after them.
+    """
+    blocks = []
+    start = header_size + 1
+    for contest_id in contest_ids:
+        meta = metas[contest_id]
+        tasks = [problem["index"] for problem in meta["problems"]]
+        blocks.append(BlockLayout(contest_id=contest_id, name=meta["contest"]["name"], tasks=tasks, start_col=start))
+        start += len(tasks) + 1
+    return SheetLayout(header_size=header_size, blocks=blocks)
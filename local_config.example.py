@@ -19,3 +19,49 @@ WORKSHEET_NAME = "Your_worksheet_name"
 # Contest IDs as a list
 CONTEST_IDS = [12345, 67890]  # Replace with your actual contest IDs
 
+# How Σ columns are written: "per_row" (one formula per cell, one call each),
+# "range" (one range write per column), "array" (one ARRAYFORMULA per column)
+# or "values" (totals computed locally, written as numbers)
+SUM_FORMULA_MODE = "range"
+
+# Local cache of Codeforces responses (finished contests are never downloaded twice).
+# Every submission of a contest is written to it while parsing, only the
+# roster's submissions are kept in memory. Set to None to disable it.
+CF_CACHE_PATH = "cf_cache.sqlite"
+
+# Force how submissions are downloaded: "status" (contest.status) or
+# "user.status" (one call per handle, cached per contest in CF_CACHE_PATH;
+# a handle Codeforces does not know has no submissions). None picks the
+# cheaper one per contest.
+CF_FETCH_STRATEGY = None
+
+# Local copy of the "handles" sheets. The whole sheet is read again only when
+# the cf_login column changes, or once a day (names are not compared);
+# `python generate.py --refresh-roster` forces it. Set to None to disable.
+ROSTER_CACHE_PATH = "roster_cache.sqlite"
+
+# Publish the same contests to several groups in one run: every contest is
+# downloaded once. Each target has its own table, results worksheet and roster
+# sheet (default "handles"). When set, TABLE_ID and WORKSHEET_NAME are not used.
+TARGETS = [
+    # {"table_id": "group_1_sheet_id", "worksheet_name": "Results"},
+    # {"table_id": "group_2_sheet_id", "worksheet_name": "Results", "roster_sheet": "handles"},
+]
+
+# Every step of a run is recorded here; `python generate.py --resume` skips
+# the steps a failed run already completed.
+JOURNAL_PATH = "run_journal.jsonl"
+
+# Every processed contest (results and the submissions of the roster handles)
+# is appended here. `python cli.py archive ...` queries it and
+# `python generate.py --from-archive` rebuilds the tables from it without
+# Codeforces API calls. Set to None to disable.
+ARCHIVE_PATH = "results_archive.sqlite"
+
+# Extra per-problem metrics, collected in the same pass over the submissions
+# and written to one more worksheet each ("<worksheet> (<metric>)"):
+#   "attempts" — rejected attempts before the first AC
+#   "first_ac" — time of the first AC (h:mm in the contest, date when upsolved)
+#   "mode"     — where it was solved: contest / virtual / upsolve
+#   "language" — language of the first AC
+EXTRA_METRICS = []
@@ -0,0 +1 @@
+CF_API_KEY="k";CF_API_SECRET="s";GOOGLE_SA_PATH="x";TABLE_ID="t";TABLE_LINK="";WORKSHEET_NAME="w";CONTEST_IDS=[1]
@@ -0,0 +1,294 @@
+"""
+In-memory spreadsheet that understands the subset of the Sheets API the
+worksheet builders use (values.batchUpdate, mergeCells, repeatCell,
+updateBorders, updateDimensionProperties, add/deleteConditionalFormatRule) and
+saves the result as XLSX.
+
+The layout code in worksheets.py runs unchanged against it through a
+SheetWriter, so the local file has the same cells, formulas, merges,
+borders, widths and gradients as the Google worksheet.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sheet_writer import a1_to_grid_range
+
+Cell = Tuple[int, int]  # (row, col), 0-based
+
+_BORDER_STYLES = {"SOLID": 1, "SOLID_MEDIUM": 2, "DASHED": 3, "DOTTED": 4, "SOLID_THICK": 5, "DOUBLE": 6}
+_ALIGNMENT = {"LEFT": "left", "CENTER": "center", "RIGHT": "right"}
+_VERTICAL_ALIGNMENT = {"TOP": "top", "MIDDLE": "vcenter", "BOTTOM": "bottom"}
+
+
+def _hex(color: Dict[str, float]) -> str:
+    """Sheets API color (0..1 per channel) -> "#RRGGBB"."""
+    return "#" + "".join(f"{min(255, round(color.get(channel, 0) * 256)):02X}"
+                         for channel in ("red", "green", "blue"))
+
+
+def _bounds(grid: Dict[str, Any], worksheet: "LocalWorksheet") -> Tuple[int, int, int, int]:
+    return (grid.get("startRowIndex", 0), grid.get("endRowIndex", worksheet.row_count),
+            grid.get("startColumnIndex", 0), grid.get("endColumnIndex", worksheet.col_count))
+
+
+class LocalWorksheet:
+    def __init__(self, spreadsheet: "LocalSpreadsheet", sheet_id: int, title: str, rows: int, cols: int):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells: Dict[Cell, Any] = {}
+        # Cells written with USER_ENTERED: strings starting with "=" are formulas.
+        self.entered: set = set()
+        self.merges: List[Tuple[int, int, int, int]] = []
+        self.styles: Dict[Cell, Dict[str, Any]] = {}
+        self.widths: Dict[int, int] = {}
+        self.rules: List[Dict[str, Any]] = []
+
+    def write(self, range_name: str, values: List[List[Any]], user_entered: bool):
+        grid = a1_to_grid_range(self.id, range_name)
+        top, left = grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0)
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                cell = (top + row_offset, left + col_offset)
+                self.cells[cell] = value
+                if user_entered:
+                    self.entered.add(cell)
+                else:
+                    self.entered.discard(cell)
+        self.row_count = max(self.row_count, top + len(values))
+
+    def _style(self, cell: Cell) -> Dict[str, Any]:
+        return self.styles.setdefault(cell, {})
+
+    def repeat_cell(self, request: Dict[str, Any]):
+        top, bottom, left, right = _bounds(request["range"], self)
+        cell_format = request["cell"].get("userEnteredFormat", {})
+        style: Dict[str, Any] = {}
+        if "horizontalAlignment" in cell_format:
+            style["align"] = _ALIGNMENT.get(cell_format["horizontalAlignment"], "general")
+        if "verticalAlignment" in cell_format:
+            style["valign"] = _VERTICAL_ALIGNMENT.get(cell_format["verticalAlignment"], "bottom")
+        text = cell_format.get("textFormat", {})
+        if "bold" in text:
+            style["bold"] = text["bold"]
+        if "fontSize" in text:
+            style["font_size"] = text["fontSize"]
+        if "fontFamily" in text:
+            style["font_name"] = text["fontFamily"]
+        if "backgroundColor" in cell_format:
+            style["bg_color"] = _hex(cell_format["backgroundColor"])
+            style["pattern"] = 1
+        for row in range(top, bottom):
+            for col in range(left, right):
+                self._style((row, col)).update(style)
+
+    def update_borders(self, request: Dict[str, Any]):
+        top, bottom, left, right = _bounds(request["range"], self)
+
+        def side(name: str) -> Optional[int]:
+            border = request.get(name)
+            return _BORDER_STYLES.get(border.get("style"), 1) if border else None
+
+        outer = {"top": side("top"), "bottom": side("bottom"), "left": side("left"), "right": side("right")}
+        # Outer borders only touch the edges, so large ranges stay cheap.
+        for col in range(left, right):
+            if outer["top"]:
+                self._style((top, col))["top"] = outer["top"]
+            if outer["bottom"]:
+                self._style((bottom - 1, col))["bottom"] = outer["bottom"]
+        for row in range(top, bottom):
+            if outer["left"]:
+                self._style((row, left))["left"] = outer["left"]
+            if outer["right"]:
+                self._style((row, right - 1))["right"] = outer["right"]
+
+        horizontal, vertical = side("innerHorizontal"), side("innerVertical")
+        if horizontal or vertical:
+            for row in range(top, bottom):
+                for col in range(left, right):
+                    style = self._style((row, col))
+                    if horizontal and row > top:
+                        style["top"] = horizontal
+                    if horizontal and row < bottom - 1:
+                        style["bottom"] = horizontal
+                    if vertical and col > left:
+                        style["left"] = vertical
+                    if vertical and col < right - 1:
+                        style["right"] = vertical
+
+    def merge(self, request: Dict[str, Any]):
+        self.merges.append(_bounds(request["range"], self))
+
+    def unmerge(self, request: Dict[str, Any]):
+        top, bottom, left, right = _bounds(request["range"], self)
+        self.merges = [merge for merge in self.merges
+                       if not (top <= merge[0] and merge[1] <= bottom and left <= merge[2] and merge[3] <= right)]
+
+    def set_dimension(self, request: Dict[str, Any]):
+        dimension = request["range"]
+        if dimension.get("dimension") != "COLUMNS" or "pixelSize" not in request["properties"]:
+            return
+        for col in range(dimension["startIndex"], dimension["endIndex"]):
+            self.widths[col] = request["properties"]["pixelSize"]
+
+    def get_all_values(self, **kwargs) -> List[List[Any]]:
+        if not self.cells:
+            return []
+        rows = max(row for row, _ in self.cells) + 1
+        cols = max(col for _, col in self.cells) + 1
+        return [[self.cells.get((row, col), "") for col in range(cols)] for row in range(rows)]
+
+
+class LocalSpreadsheet:
+    """Stand-in for gspread.Spreadsheet that keeps everything in memory, see save_xlsx."""
+
+    def __init__(self):
+        self._worksheets: List[LocalWorksheet] = []
+        self._next_id = 1
+
+    def worksheets(self) -> List[LocalWorksheet]:
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> LocalWorksheet:
+        return self._by_title(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> LocalWorksheet:
+        worksheet = LocalWorksheet(self, self._next_id, title, rows, cols)
+        self._next_id += 1
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def del_worksheet(self, worksheet: LocalWorksheet):
+        self._worksheets.remove(worksheet)
+
+    def _by_title(self, title: str) -> LocalWorksheet:
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(title)
+
+    def _by_id(self, sheet_id: int) -> LocalWorksheet:
+        return next(worksheet for worksheet in self._worksheets if worksheet.id == sheet_id)
+
+    def fetch_sheet_metadata(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {"sheets": [{"properties": {"sheetId": worksheet.id}, "conditionalFormats": list(worksheet.rules)}
+                           for worksheet in self._worksheets]}
+
+    def values_batch_update(self, body: Dict[str, Any]):
+        user_entered = body.get("valueInputOption") == "USER_ENTERED"
+        for data in body["data"]:
+            title, range_name = data["range"].rsplit("!", 1)
+            if title.startswith("'"):
+                title = title[1:-1].replace("''", "'")
+            self._by_title(title).write(range_name, data["values"], user_entered)
+
+    def batch_update(self, body: Dict[str, Any]):
+        for request in body["requests"]:
+            (kind, params), = request.items()
+            if kind == "addConditionalFormatRule":
+                rules = self._by_id(params["rule"]["ranges"][0].get("sheetId", 0)).rules
+                rules.insert(params.get("index", len(rules)), params["rule"])
+                continue
+            if kind == "deleteConditionalFormatRule":
+                del self._by_id(params.get("sheetId", 0)).rules[params["index"]]
+                continue
+            sheet_range = params["range"]
+            worksheet = self._by_id(sheet_range.get("sheetId"))
+            if kind == "repeatCell":
+                worksheet.repeat_cell(params)
+            elif kind == "updateBorders":
+                worksheet.update_borders(params)
+            elif kind == "mergeCells":
+                worksheet.merge(params)
+            elif kind == "unmergeCells":
+                worksheet.unmerge(params)
+            elif kind == "updateDimensionProperties":
+                worksheet.set_dimension(params)
+            else:
+                raise ValueError(f"Unsupported Sheets request: {kind}")
+
+    def save_xlsx(self, path: str):
+        """Writes every worksheet into one XLSX file (needs XlsxWriter)."""
+        try:
+            import xlsxwriter
+        except ImportError as error:
+            raise ImportError("XLSX export needs XlsxWriter: pip install XlsxWriter") from error
+
+        # SEQUENCE (used by the "array" Σ mode) is an Excel 365 function.
+        workbook = xlsxwriter.Workbook(path, {"use_future_functions": True})
+        try:
+            for worksheet in self._worksheets:
+                _render(workbook, worksheet)
+        finally:
+            workbook.close()
+
+
+def _render(workbook, worksheet: LocalWorksheet):
+    from xlsxwriter.utility import xl_range
+
+    sheet = workbook.add_worksheet(worksheet.title[:31])
+    formats: Dict[tuple, Any] = {}
+
+    def cell_format(style: Optional[Dict[str, Any]]):
+        if not style:
+            return None
+        key = tuple(sorted(style.items()))
+        if key not in formats:
+            formats[key] = workbook.add_format(dict(style))
+        return formats[key]
+
+    def write(row: int, col: int, value: Any, fmt):
+        if isinstance(value, str) and value.startswith("=") and (row, col) in worksheet.entered:
+            if value.upper().startswith("=ARRAYFORMULA(") and value.endswith(")"):
+                # Excel spills dynamic arrays by itself.
+                sheet.write_dynamic_array_formula(row, col, row, col, "=" + value[len("=ARRAYFORMULA("):-1], fmt)
+            else:
+                sheet.write_formula(row, col, value, fmt)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            if value in ("", None):
+                if fmt is not None:
+                    sheet.write_blank(row, col, None, fmt)
+            else:
+                sheet.write_string(row, col, str(value), fmt)
+        else:
+            sheet.write_number(row, col, value, fmt)
+
+    merged: set = set()
+    for top, bottom, left, right in worksheet.merges:
+        cells = [(row, col) for row in range(top, bottom) for col in range(left, right)]
+        merged.update(cells)
+        style: Dict[str, Any] = {}
+        for cell in cells:
+            style.update(worksheet.styles.get(cell, {}))
+        # Like Sheets, a merge keeps the value when only one of the cells has one.
+        value = next((worksheet.cells[cell] for cell in cells if worksheet.cells.get(cell, "") != ""), "")
+        if len(cells) > 1:
+            sheet.merge_range(top, left, bottom - 1, right - 1, "", cell_format(style))
+        write(top, left, value, cell_format(style))
+
+    for cell in sorted(set(worksheet.cells) | set(worksheet.styles)):
+        if cell in merged:
+            continue
+        write(cell[0], cell[1], worksheet.cells.get(cell, ""), cell_format(worksheet.styles.get(cell)))
+
+    for col, width in worksheet.widths.items():
+        sheet.set_column_pixels(col, col, width)
+
+    for rule in worksheet.rules:
+        gradient = rule.get("gradientRule")
+        if gradient is None:
+            continue
+        options = {
+            "min_type": "min", "min_color": _hex(gradient["minpoint"]["color"]),
+            "max_type": "max", "max_color": _hex(gradient["maxpoint"]["color"]),
+        }
+        midpoint = gradient.get("midpoint")
+        if midpoint is not None:
+            options.update(type="3_color_scale", mid_type="num", mid_value=float(midpoint["value"]),
+                           mid_color=_hex(midpoint["color"]))
+        else:
+            options["type"] = "2_color_scale"
+        for grid in rule["ranges"]:
+            top, bottom, left, right = _bounds(grid, worksheet)
+            sheet.conditional_format(xl_range(top, left, bottom - 1, right - 1), options)
@@ -0,0 +1,143 @@
+"""
+Extra per-problem metrics collected in the same pass over the submissions as
+the solved/attempted matrix (see cfscript.fold_group_submissions).
+
+A metric is an accumulator with one cell per (student, problem). Submissions
+arrive newest first and pages of a paged download in any order, so every
+metric keeps order-independent state (the smallest accepted submission id
+and so on) and only turns it into values in matrix().
+
+New metrics are added with @register_metric and selected by name in
+config.EXTRA_METRICS.
+"""
+import datetime
+from typing import Any, Dict, List, Optional, Type
+
+# Verdicts that do not count as an attempt (no penalty on Codeforces, or not judged yet).
+NOT_ATTEMPTS = {"COMPILATION_ERROR", "TESTING", None}
+IN_CONTEST_TYPES = {"CONTESTANT", "OUT_OF_COMPETITION"}
+
+METRICS: Dict[str, Type["Metric"]] = {}
+
+
+def register_metric(cls: Type["Metric"]) -> Type["Metric"]:
+    METRICS[cls.name] = cls
+    return cls
+
+
+def create_metrics(names: List[str], num_students: int, num_problems: int) -> List["Metric"]:
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}, expected some of {sorted(METRICS)}")
+    return [METRICS[name](num_students, num_problems) for name in names]
+
+
+class Metric:
+    name = ""
+    # Used in the worksheet title.
+    title = ""
+    # Whether the values can be summed up into Σ columns.
+    summable = False
+
+    def __init__(self, num_students: int, num_problems: int):
+        self.num_students = num_students
+        self.num_problems = num_problems
+
+    def add(self, student: int, problem: int, row: Dict[str, Any]):
+        """Takes one slimmed submission (see cfscript.slim_submission)."""
+        raise NotImplementedError
+
+    def matrix(self) -> List[List[Any]]:
+        """students × problems, None for empty cells."""
+        raise NotImplementedError
+
+
+class _FirstAccepted(Metric):
+    """Base for metrics that describe the first accepted submission of a cell."""
+
+    def __init__(self, num_students: int, num_problems: int):
+        super().__init__(num_students, num_problems)
+        self._accepted: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(self, student: int, problem: int, row: Dict[str, Any]):
+        if row["verdict"] != "OK":
+            return
+        first = self._accepted.get((student, problem))
+        if first is None or row["id"] < first["id"]:
+            self._accepted[(student, problem)] = row
+
+    def value(self, row: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    def matrix(self) -> List[List[Any]]:
+        result: List[List[Any]] = [[None] * self.num_problems for _ in range(self.num_students)]
+        for (student, problem), row in self._accepted.items():
+            result[student][problem] = self.value(row)
+        return result
+
+
+@register_metric
+class AttemptsBeforeAccepted(Metric):
+    """Rejected attempts before the first AC (compilation errors do not count); empty if not solved."""
+    name = "attempts"
+    title = "попытки"
+    summable = True
+
+    def __init__(self, num_students: int, num_problems: int):
+        super().__init__(num_students, num_problems)
+        self._accepted: Dict[tuple, int] = {}
+        self._rejected: Dict[tuple, set] = {}
+
+    def add(self, student: int, problem: int, row: Dict[str, Any]):
+        cell = (student, problem)
+        if row["verdict"] == "OK":
+            if cell not in self._accepted or row["id"] < self._accepted[cell]:
+                self._accepted[cell] = row["id"]
+        elif row["verdict"] not in NOT_ATTEMPTS:
+            self._rejected.setdefault(cell, set()).add(row["id"])
+
+    def matrix(self) -> List[List[Any]]:
+        result: List[List[Any]] = [[None] * self.num_problems for _ in range(self.num_students)]
+        for (student, problem), accepted in self._accepted.items():
+            rejected = self._rejected.get((student, problem), ())
+            result[student][problem] = sum(1 for submission_id in rejected if submission_id < accepted)
+        return result
+
+
+@register_metric
+class FirstAcceptedTime(_FirstAccepted):
+    """h:mm from the contest start for an AC in the contest, otherwise the date (UTC) of the AC."""
+    name = "first_ac"
+    title = "время AC"
+
+    def value(self, row: Dict[str, Any]) -> Any:
+        if row["type"] in IN_CONTEST_TYPES and row["relative"] is not None:
+            minutes = row["relative"] // 60
+            return f"{minutes // 60}:{minutes % 60:02d}"
+        if row["time"] is None:
+            return None
+        return datetime.datetime.fromtimestamp(row["time"], tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+@register_metric
+class SolveMode(_FirstAccepted):
+    """Where the problem was first solved: "contest", "virtual" or "upsolve" (practice)."""
+    name = "mode"
+    title = "контест-дорешка"
+
+    def value(self, row: Dict[str, Any]) -> Optional[str]:
+        if row["type"] in IN_CONTEST_TYPES:
+            return "contest"
+        if row["type"] == "VIRTUAL":
+            return "virtual"
+        return "upsolve"
+
+
+@register_metric
+class AcceptedLanguage(_FirstAccepted):
+    """Language of the first AC."""
+    name = "language"
+    title = "язык"
+
+    def value(self, row: Dict[str, Any]) -> Optional[str]:
+        return row["lang"]
@@ -0,0 +1,237 @@
+"""
+Dry run: what a run would send, without network access.
+
+    python cli.py plan [CONTEST_ID ...] [--students N | --roster handles.csv] [--sum-mode range]
+
+Contest problem lists come from the Codeforces response cache when the
+contests were fetched before (otherwise --tasks problems per contest are
+assumed). The worksheet is built in memory by the same code as a real run
+(see local_sheet.LocalSpreadsheet) and every Sheets call is counted instead
+of sent. local_config.py is only read when it exists, for the defaults.
+"""
+import argparse
+import csv
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import config
+from cf_cache import ResponseCache
+from cfscript import (CF_CALLS_PER_SECOND, METHOD_STANDINGS, METHOD_USER_STATUS, STATUS_PAGE_SIZE, ContestInfo,
+                      is_finished, status_entry)
+from fetch_planner import STRATEGIES, STRATEGY_USER_STATUS, estimate_strategies
+from layout import header, plan_layout
+from local_sheet import LocalSpreadsheet
+from metrics import METRICS
+from roster_cache import RosterCache
+from sinks import prepare_worksheet, write_contest_results, write_metric_worksheets
+from worksheets import SUM_MODES
+
+DEFAULT_TASKS = 6
+
+
+class CountingSpreadsheet(LocalSpreadsheet):
+    """LocalSpreadsheet that counts the Sheets calls a real spreadsheet would receive."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self.requests: Counter = Counter()
+        self.cells = 0
+        self.payload_bytes = 0
+
+    def _count(self, name: str, body: Any = None):
+        self.calls[name] += 1
+        if body is not None:
+            self.payload_bytes += len(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+    def worksheets(self):
+        self._count("worksheets")
+        return super().worksheets()
+
+    def worksheet(self, title: str):
+        self._count("worksheet")
+        return super().worksheet(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int):
+        self._count("add_worksheet")
+        return super().add_worksheet(title, rows, cols)
+
+    def del_worksheet(self, worksheet):
+        self._count("del_worksheet")
+        super().del_worksheet(worksheet)
+
+    def values_batch_update(self, body: Dict[str, Any]):
+        self._count("values_batch_update", body)
+        self.cells += sum(len(row) for data in body["data"] for row in data["values"])
+        super().values_batch_update(body)
+
+    def batch_update(self, body: Dict[str, Any]):
+        self._count("batch_update", body)
+        self.requests.update(kind for request in body["requests"] for kind in request)
+        super().batch_update(body)
+
+
+@dataclass
+class ContestPlan:
+    contest_id: int
+    name: str
+    tasks: int
+    # False when the problem list is not cached and --tasks was assumed.
+    known: bool
+    strategy: str
+    calls: int
+    seconds: float
+
+
+def _placeholder_meta(contest_id: int, tasks: int) -> Dict[str, Any]:
+    return {"contest": {"id": contest_id, "name": f"Contest {contest_id}", "phase": "FINISHED",
+                        "durationSeconds": 2 * 60 * 60},
+            "problems": [{"index": chr(ord("A") + index)} for index in range(tasks)]}
+
+
+def plan_contests(contest_ids: List[int], roster_size: int, cache: Optional[ResponseCache],
+                  tasks: int = DEFAULT_TASKS, strategy: Optional[str] = None):
+    """
+    Codeforces side of a run, mirroring CodeforcesServer.choose_strategy.
+
+    :return: contest id -> meta, and the plan of every contest.
+    """
+    metas, plans = {}, []
+    known_users = 0
+    for contest_id in contest_ids:
+        entry = cache.get(contest_id, METHOD_STANDINGS) if cache is not None else None
+        meta = entry.payload if entry is not None else _placeholder_meta(contest_id, tasks)
+        metas[contest_id] = meta
+        meta_calls = 0 if entry is not None and entry.is_fresh(cache.running_ttl) else 1
+
+        status_rows = None
+        stored = status_entry(cache, contest_id) if cache is not None else None
+        # An entry saved before the contest finished is downloaded again in full.
+        if stored is not None and (stored.finished or not is_finished(meta)):
+            status_rows = 0
+        cached_users = 0
+        user_entry = cache.get(contest_id, METHOD_USER_STATUS) if cache is not None else None
+        if user_entry is not None and (user_entry.finished or not is_finished(meta)):
+            # The roster is not known here: assume the cached handles are still in it.
+            cached_users = min(roster_size, len(user_entry.payload["handles"]))
+        estimates = estimate_strategies(contest_id, meta, roster_size, calls_per_second=CF_CALLS_PER_SECOND,
+                                        page_size=STATUS_PAGE_SIZE, status_rows=status_rows,
+                                        known_users=max(known_users, cached_users))
+        if strategy is None:
+            estimate = min(estimates, key=lambda option: option.seconds)
+        else:
+            estimate = next(option for option in estimates if option.strategy == strategy)
+        if estimate.strategy == STRATEGY_USER_STATUS:
+            # user.status histories are downloaded once per run and shared by all contests.
+            known_users = roster_size
+        plans.append(ContestPlan(contest_id=contest_id, name=meta["contest"]["name"], tasks=len(meta["problems"]),
+                                 known=entry is not None, strategy=estimate.strategy,
+                                 calls=meta_calls + estimate.calls, seconds=estimate.seconds))
+    return metas, plans
+
+
+def plan_sheets(contest_ids: List[int], metas: Dict[int, Dict[str, Any]], roster_size: int, sum_mode: str,
+                worksheet_name: str = "Results", metrics: List[str] = ()) -> CountingSpreadsheet:
+    """Builds the worksheet of a full (not incremental) run in memory and counts the Sheets calls."""
+    layout = plan_layout(contest_ids, metas, header_size=len(header[0]))
+    children = [["", "", f"handle_{index}"] for index in range(roster_size)]
+    contests = [ContestInfo(name=block.name, Tasks=block.tasks,
+                            Result=[[-1] * len(block.tasks) for _ in range(roster_size)],
+                            Metrics={metric: [[None] * len(block.tasks) for _ in range(roster_size)]
+                                     for metric in metrics})
+                for block in layout.blocks]
+    table = CountingSpreadsheet()
+    writer = prepare_worksheet(table, worksheet_name, children, layout, sum_mode)
+    write_contest_results(writer, children, layout, contests, sum_mode)
+    write_metric_worksheets(table, worksheet_name, children, layout, contests)
+    return table
+
+
+def _roster_size(args) -> Optional[int]:
+    if args.students is not None:
+        return args.students
+    if args.roster:
+        with open(args.roster, encoding="utf-8", newline="") as file:
+            return sum(1 for _ in csv.DictReader(file))
+    # The roster cached by an earlier run of the configured table.
+    if config.is_configured() and config.ROSTER_CACHE_PATH and os.path.exists(config.ROSTER_CACHE_PATH):
+        cache = RosterCache(config.ROSTER_CACHE_PATH)
+        try:
+            entry = cache.get(f"{config.TABLE_ID}/handles")
+        finally:
+            cache.close()
+        if entry is not None:
+            return len(entry.children)
+    return None
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Show what a run would send, without network access.")
+    parser.add_argument("contest_ids", type=int, nargs="*", help="contests (default: CONTEST_IDS)")
+    parser.add_argument("--students", type=int, help="roster size (default: the cached roster)")
+    parser.add_argument("--roster", help="CSV roster to count the students in")
+    parser.add_argument("--sum-mode", choices=SUM_MODES, help="default: SUM_FORMULA_MODE or range")
+    parser.add_argument("--tasks", type=int, default=DEFAULT_TASKS,
+                        help="problems assumed for contests missing from the cache")
+    parser.add_argument("--metrics", help=f"comma-separated extra metrics ({', '.join(METRICS)})")
+    parser.add_argument("--cache", help="Codeforces response cache (default: CF_CACHE_PATH)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = build_parser(prog)
+    args = parser.parse_args(argv)
+    configured = config.is_configured()
+
+    contest_ids = args.contest_ids or (config.CONTEST_IDS if configured else [])
+    if not contest_ids:
+        parser.error("no contests: pass contest ids or set CONTEST_IDS in local_config.py")
+    roster_size = _roster_size(args)
+    if roster_size is None:
+        parser.error("unknown roster size: pass --students or --roster")
+    sum_mode = args.sum_mode or (config.SUM_FORMULA_MODE if configured else "range")
+    metrics = args.metrics.split(",") if args.metrics else (config.EXTRA_METRICS if configured else [])
+    unknown_metrics = [metric for metric in metrics if metric not in METRICS]
+    if unknown_metrics:
+        parser.error(f"unknown metrics {unknown_metrics}, expected some of {list(METRICS)}")
+    worksheet_name = config.WORKSHEET_NAME if configured else "Results"
+
+    cache_path = args.cache or (config.CF_CACHE_PATH if configured else None)
+    # Opening a missing SQLite file would create it.
+    cache = ResponseCache(cache_path) if cache_path and os.path.exists(cache_path) else None
+    strategy = config.CF_FETCH_STRATEGY if configured else None
+    if strategy is not None and strategy not in STRATEGIES:
+        parser.error(f"CF_FETCH_STRATEGY must be one of {STRATEGIES} or None, got {strategy!r}")
+    try:
+        metas, plans = plan_contests(contest_ids, roster_size, cache, args.tasks, strategy)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    calls = sum(plan.calls for plan in plans)
+    seconds = calls / CF_CALLS_PER_SECOND
+    print(f"Codeforces: {len(plans)} contests, {roster_size} students, {calls} calls (~{seconds:.0f} s)")
+    for plan in plans:
+        assumed = "" if plan.known else " (not cached, tasks assumed)"
+        print(f"  {plan.contest_id:>7}  {plan.name[:40]:<40} {plan.tasks:>3} tasks  "
+              f"{plan.strategy:<12} {plan.calls:>4} calls{assumed}")
+
+    table = plan_sheets(contest_ids, metas, roster_size, sum_mode, worksheet_name, metrics)
+    writes = table.calls["values_batch_update"] + table.calls["batch_update"]
+    print(f"Sheets ({sum_mode}): {writes} write requests "
+          f"({table.calls['values_batch_update']} values.batchUpdate, {table.calls['batch_update']} batchUpdate), "
+          f"{table.calls['add_worksheet']} worksheets created, "
+          f"{table.calls['worksheets'] + table.calls['worksheet']} metadata reads")
+    print(f"  cells written: {table.cells}, payload: {table.payload_bytes / 1024:.0f} KiB")
+    print("  batchUpdate requests: " + ", ".join(f"{kind}={count}" for kind, count in sorted(table.requests.items())))
+    for worksheet in table.worksheets():
+        rows = max((row for row, _ in worksheet.cells), default=-1) + 1
+        cols = max((col for _, col in worksheet.cells), default=-1) + 1
+        print(f"  {worksheet.title}: {rows} rows × {cols} columns")
+
+
+if __name__ == "__main__":
+    main()
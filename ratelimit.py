@@ -0,0 +1,68 @@
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    :param rate: Tokens added per second.
+    :param capacity: Maximum number of tokens (burst size).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1):
+        """Blocks until the requested number of tokens is available and takes them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def call_with_retries(func: Callable[[], T], is_retryable: Callable[[Exception], bool],
+                      limiter: Optional[TokenBucket] = None, max_attempts: int = 5,
+                      base_delay: float = 2.0, max_delay: float = 60.0,
+                      sleep: Callable[[float], None] = time.sleep,
+                      on_retry: Optional[Callable[[Exception, int], None]] = None) -> T:
+    """
+    Calls func, waiting for the limiter before every attempt and retrying
+    retryable errors with exponential backoff and jitter.
+
+    :param on_retry: Called with the error and the attempt number before every retry.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func()
+        except Exception as error:
+            attempt += 1
+            if attempt >= max_attempts or not is_retryable(error):
+                raise
+            if on_retry is not None:
+                on_retry(error, attempt)
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,98 @@
+"""
+Compact results store: one int8 students × problems matrix for all contests,
+with vectorized totals, solve rates and rankings.
+"""
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from cfscript import ContestInfo
+
+UNTOUCHED = -1
+ATTEMPTED = 0
+SOLVED = 1
+
+
+@dataclass
+class ContestSlice:
+    name: str
+    tasks: List[str]
+    start: int
+    stop: int
+
+
+class ResultStore:
+    def __init__(self, num_students: int):
+        self.num_students = num_students
+        self.contests: List[ContestSlice] = []
+        self._blocks: List[np.ndarray] = []
+        self._matrix = np.empty((num_students, 0), dtype=np.int8)
+
+    @classmethod
+    def from_contests(cls, num_students: int, contests: List[ContestInfo]) -> "ResultStore":
+        store = cls(num_students)
+        for contest in contests:
+            store.add_contest(contest)
+        return store
+
+    def add_contest(self, contest: ContestInfo):
+        block = np.asarray(contest.Result, dtype=np.int8).reshape(self.num_students, len(contest.Tasks))
+        start = self.contests[-1].stop if self.contests else 0
+        self.contests.append(ContestSlice(name=contest.name, tasks=list(contest.Tasks), start=start,
+                                          stop=start + len(contest.Tasks)))
+        self._blocks.append(block)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """students × problems of all contests, -1 untouched / 0 attempted / 1 solved."""
+        if self._blocks:
+            # Blocks are stacked lazily so that adding a contest stays O(block).
+            self._matrix = np.hstack([self._matrix] + self._blocks)
+            self._blocks = []
+        return self._matrix
+
+    def problem_labels(self) -> List[str]:
+        return [f"{contest.name}: {task}" for contest in self.contests for task in contest.tasks]
+
+    def solved(self) -> np.ndarray:
+        return self.matrix == SOLVED
+
+    def attempted(self) -> np.ndarray:
+        return self.matrix != UNTOUCHED
+
+    def contest_totals(self) -> np.ndarray:
+        """students × contests, number of solved problems in every contest (the Σ columns)."""
+        cumulative = np.zeros((self.num_students, self.matrix.shape[1] + 1), dtype=np.int32)
+        np.cumsum(self.solved(), axis=1, out=cumulative[:, 1:])
+        starts = np.array([contest.start for contest in self.contests], dtype=np.intp)
+        stops = np.array([contest.stop for contest in self.contests], dtype=np.intp)
+        return cumulative[:, stops] - cumulative[:, starts]
+
+    def totals(self) -> np.ndarray:
+        """Solved problems of every student over all contests (the main Σ column)."""
+        return self.solved().sum(axis=1, dtype=np.int32)
+
+    def solve_rates(self) -> np.ndarray:
+        """Share of students who solved each problem."""
+        if self.num_students == 0:
+            return np.zeros(self.matrix.shape[1])
+        return self.solved().mean(axis=0)
+
+    def attempt_rates(self) -> np.ndarray:
+        """Share of students who submitted anything for each problem."""
+        if self.num_students == 0:
+            return np.zeros(self.matrix.shape[1])
+        return self.attempted().mean(axis=0)
+
+    def difficulty(self) -> np.ndarray:
+        """Share of attempting students who did not solve the problem (NaN if nobody tried)."""
+        attempted = self.attempted().sum(axis=0)
+        solved = self.solved().sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(attempted > 0, 1 - solved / attempted, np.nan)
+
+    def ranking(self) -> np.ndarray:
+        """Competition ranking by total solved ("1224"): 1 + number of students with more solved."""
+        totals = self.totals()
+        return np.searchsorted(np.sort(-totals), -totals, side="left") + 1
@@ -0,0 +1,118 @@
+"""
+Local cache of group rosters (the "handles" sheet).
+
+Reading the whole roster sheet is slow on large shared rosters and counts
+against the Sheets read quota. The cache keeps the parsed roster together
+with a fingerprint: a hash of the handle column, read as one narrow range.
+The full sheet is read again only when the handle column changes or the
+entry is older than max_age (edits of names alone do not change the
+fingerprint). A full read is a single get_all_records: the handle column
+and its fingerprint are taken from the records it returns.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from worksheets import records_to_rows
+
+ROSTER_MAX_AGE = 24 * 60 * 60  # seconds
+HANDLE_COLUMN = "cf_login"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rosters (
+    key TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    handle_column INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    children TEXT NOT NULL
+)
+"""
+
+
+@dataclass
+class RosterEntry:
+    children: List[List[str]]
+    fetched_at: float
+    # 1-based column with the handles and the hash of its values.
+    handle_column: int
+    fingerprint: str
+
+
+def column_fingerprint(values: List[Any]) -> str:
+    return hashlib.sha1(json.dumps([str(value) for value in values], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def records_fingerprint(records: List[Dict[str, Any]]) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Handle column and its column_fingerprint, taken from get_all_records rows
+    so that a full read needs no extra requests.
+
+    :return: (None, None) if the sheet has no rows or no handle column.
+    """
+    if not records or HANDLE_COLUMN not in records[0]:
+        return None, None
+    # Same values as col_values: the header first, trailing empty cells trimmed.
+    values = [HANDLE_COLUMN] + [str(record.get(HANDLE_COLUMN, "")) for record in records]
+    while values and values[-1] == "":
+        values.pop()
+    return list(records[0]).index(HANDLE_COLUMN) + 1, column_fingerprint(values)
+
+
+class RosterCache:
+    def __init__(self, path: str, max_age: float = ROSTER_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        # Rosters of several groups are loaded from a thread pool.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def get(self, key: str) -> Optional[RosterEntry]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT children, fetched_at, handle_column, fingerprint FROM rosters WHERE key = ?", (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        children, fetched_at, handle_column, fingerprint = row
+        return RosterEntry(children=json.loads(children), fetched_at=fetched_at, handle_column=handle_column,
+                           fingerprint=fingerprint)
+
+    def put(self, key: str, entry: RosterEntry):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO rosters (key, fetched_at, handle_column, fingerprint, children) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry.fetched_at, entry.handle_column, entry.fingerprint,
+                 json.dumps(entry.children, ensure_ascii=False)),
+            )
+
+    def load(self, key: str, worksheet, refresh: bool = False) -> List[List[str]]:
+        """
+        Roster rows (surname, name, handle) of the worksheet, read in full only when it changed.
+
+        :param key: Identifies the roster sheet, e.g. "<table id>/<sheet name>".
+        :param refresh: Read the whole sheet even if the fingerprint matches.
+        """
+        entry = self.get(key)
+        if entry is not None and not refresh and time.time() - entry.fetched_at < self.max_age:
+            if column_fingerprint(worksheet.col_values(entry.handle_column)) == entry.fingerprint:
+                return entry.children
+
+        # As text, like col_values: a numeric-looking handle ("007", "1e5") gets the same fingerprint on both paths.
+        records = worksheet.get_all_records(numericise_ignore=["all"])
+        children = records_to_rows(records)
+        handle_column, fingerprint = records_fingerprint(records)
+        if fingerprint is not None:
+            self.put(key, RosterEntry(children=children, fetched_at=time.time(), handle_column=handle_column,
+                                      fingerprint=fingerprint))
+        return children
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
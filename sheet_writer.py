@@ -0,0 +1,240 @@
+import json
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import tracing
+from format_rules import ConditionalRules, read_conditional_rules
+
+if TYPE_CHECKING:
+    from gspread import Worksheet
+
+# Google Sheets rejects request bodies above ~10 MB and becomes slow well before
+# that, so every batch is kept under a conservative limit.
+MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+MAX_REQUESTS_PER_BATCH = 1000
+
+VALUE_INPUT_RAW = "RAW"
+VALUE_INPUT_USER_ENTERED = "USER_ENTERED"
+
+_A1_CELL = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def column_letter_to_number(letters: str) -> int:
+    """Преобразует буквы столбца (A, B, ..., AA) в номер столбца (1-based)."""
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + (ord(char) - 64)
+    return number
+
+
+def a1_to_grid_range(sheet_id: int, a1_range: str) -> Dict[str, int]:
+    """
+    Converts an A1 range ("B2", "B2:D5", "A:A") into a Sheets API GridRange.
+
+    :param sheet_id: ID of the worksheet the range belongs to.
+    :param a1_range: Range in A1 notation without the sheet name.
+    :return: GridRange dict with 0-based, end-exclusive indexes.
+    """
+    parts = a1_range.split(":")
+    if len(parts) == 1:
+        parts = parts * 2
+
+    grid = {"sheetId": sheet_id}
+    (start_col, start_row), (end_col, end_row) = (_parse_a1_cell(part) for part in parts)
+    if start_row:
+        grid["startRowIndex"] = start_row - 1
+    if end_row:
+        grid["endRowIndex"] = end_row
+    if start_col:
+        grid["startColumnIndex"] = start_col - 1
+    if end_col:
+        grid["endColumnIndex"] = end_col
+    return grid
+
+
+def _parse_a1_cell(cell: str) -> Tuple[int, int]:
+    match = _A1_CELL.match(cell)
+    if match is None:
+        raise ValueError(f"Invalid A1 notation: {cell!r}")
+    letters, digits = match.groups()
+    return (column_letter_to_number(letters) if letters else 0, int(digits) if digits else 0)
+
+
+def _payload_size(item: Any) -> int:
+    return len(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+
+
+def _chunk(items: List[Any], max_items: int, max_bytes: int) -> List[List[Any]]:
+    """Splits items into batches that fit both the item count and payload size limits."""
+    chunks: List[List[Any]] = []
+    current: List[Any] = []
+    current_size = 0
+    for item in items:
+        size = _payload_size(item)
+        if current and (len(current) >= max_items or current_size + size > max_bytes):
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _DeferredSpreadsheet:
+    """Stand-in for worksheet.spreadsheet that queues batch_update bodies."""
+
+    def __init__(self, writer: "SheetWriter"):
+        self._writer = writer
+
+    def batch_update(self, body: Dict[str, Any]):
+        self._writer.add_requests(body.get("requests", []))
+
+
+class SheetWriter:
+    """
+    Deferred writer for a single worksheet.
+
+    Mimics the subset of the gspread Worksheet API used in worksheets.py
+    (update, update_acell, merge_cells, format, spreadsheet.batch_update),
+    but keeps everything in memory until flush() sends it as a handful of
+    values.batchUpdate and spreadsheets.batchUpdate calls.
+    """
+
+    def __init__(self, worksheet: "Worksheet",
+                 max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+                 max_requests_per_batch: int = MAX_REQUESTS_PER_BATCH, rules_sent: int = 0,
+                 reconcile_rules: bool = False):
+        self.worksheet = worksheet
+        self.id = worksheet.id
+        self.title = worksheet.title
+        self.spreadsheet = _DeferredSpreadsheet(self)
+        self.max_payload_bytes = max_payload_bytes
+        self.max_requests_per_batch = max_requests_per_batch
+        self.requests_sent = 0
+
+        self._values: Dict[str, List[Dict[str, Any]]] = {VALUE_INPUT_RAW: [], VALUE_INPUT_USER_ENTERED: []}
+        self._requests: List[Dict[str, Any]] = []
+        # rules_sent: rules added by an earlier run, kept in front of the new ones.
+        # reconcile_rules: the worksheet already has rules, see format_rules.ConditionalRules.
+        self._rules = ConditionalRules(
+            self.id, existing=(lambda: read_conditional_rules(worksheet)) if reconcile_rules else None,
+            known_count=rules_sent)
+        # id(queued item) -> function that queued it, filled only while tracing is active.
+        self._origins: Dict[int, str] = {}
+
+    def _remember_origin(self, items: List[Any]):
+        if tracing.active() is None:
+            return
+        origin = tracing.caller_origin()
+        for item in items:
+            self._origins[id(item)] = origin
+
+    def _batch_origins(self, chunk: List[Any]) -> Dict[str, int]:
+        return dict(Counter(self._origins.get(id(item), "unknown") for item in chunk))
+
+    def _absolute_range(self, a1_range: str) -> str:
+        title = self.title.replace("'", "''")
+        return f"'{title}'!{a1_range}"
+
+    def add_values(self, a1_range: str, values: List[List[Any]], value_input_option: str = VALUE_INPUT_RAW):
+        """Queues a value write for the given range."""
+        item = {"range": self._absolute_range(a1_range), "values": values}
+        self._remember_origin([item])
+        self._values[value_input_option].append(item)
+
+    def add_requests(self, requests: List[Dict[str, Any]]):
+        """Queues raw spreadsheets.batchUpdate requests (borders, widths, ...)."""
+        self._remember_origin(requests)
+        self._requests.extend(requests)
+
+    def add_conditional_format_rule(self, rule: Dict[str, Any]):
+        """
+        Queues a conditional format rule given as API properties
+        (ConditionalFormatRule.to_props()). Rules keep the order they were added in;
+        a rule replaces a queued one with overlapping ranges.
+        """
+        self._remember_origin([rule])
+        for replaced in self._rules.add(rule):
+            self._origins.pop(id(replaced), None)
+
+    def update(self, range_name, values=None, value_input_option: str = VALUE_INPUT_RAW):
+        # gspread 6 swapped the argument order; accept both like gspread does.
+        if isinstance(range_name, list) and (values is None or isinstance(values, str)):
+            range_name, values = values, range_name
+        self.add_values(range_name, values, value_input_option)
+
+    def update_acell(self, label: str, value):
+        self.add_values(label, [[value]], VALUE_INPUT_USER_ENTERED)
+
+    def merge_cells(self, name: str, merge_type: str = "MERGE_ALL"):
+        self.add_requests([{
+            "mergeCells": {
+                "range": a1_to_grid_range(self.id, name),
+                "mergeType": merge_type,
+            }
+        }])
+
+    def unmerge_cells(self, name: str):
+        self.add_requests([{"unmergeCells": {"range": a1_to_grid_range(self.id, name)}}])
+
+    def format(self, ranges, format: Dict[str, Any]):
+        if isinstance(ranges, str):
+            ranges = [ranges]
+        fields = "userEnteredFormat(" + ",".join(format.keys()) + ")"
+        self.add_requests([{
+            "repeatCell": {
+                "range": a1_to_grid_range(self.id, cell_range),
+                "cell": {"userEnteredFormat": format},
+                "fields": fields,
+            }
+        } for cell_range in ranges])
+
+    @property
+    def rules_sent(self) -> int:
+        """Number of conditional format rules on the sheet after the last flush."""
+        return self._rules.count
+
+    @property
+    def pending(self) -> int:
+        """Number of queued operations that have not been sent yet."""
+        values = sum(len(data) for data in self._values.values())
+        return values + len(self._requests) + len(self._rules.pending)
+
+    def _spreadsheet_requests(self) -> List[Dict[str, Any]]:
+        deletes, adds = self._rules.requests()
+        for request in adds:
+            rule = request["addConditionalFormatRule"]["rule"]
+            if id(rule) in self._origins:
+                self._origins[id(request)] = self._origins[id(rule)]
+        return self._requests + deletes + adds
+
+    def flush(self) -> int:
+        """
+        Sends every queued operation and clears the queue.
+
+        :return: Number of HTTP requests sent by this flush.
+        """
+        spreadsheet = self.worksheet.spreadsheet
+        sent = 0
+
+        # Values go first: value writes grow the grid, which borders and
+        # formats on rows past the initial sheet size rely on.
+        for value_input_option, data in self._values.items():
+            for chunk in _chunk(data, self.max_requests_per_batch, self.max_payload_bytes):
+                with tracing.batch_origins(self._batch_origins(chunk)):
+                    spreadsheet.values_batch_update({"valueInputOption": value_input_option, "data": chunk})
+                sent += 1
+
+        for chunk in _chunk(self._spreadsheet_requests(), self.max_requests_per_batch, self.max_payload_bytes):
+            with tracing.batch_origins(self._batch_origins(chunk)):
+                spreadsheet.batch_update({"requests": chunk})
+            sent += 1
+
+        self._values = {option: [] for option in self._values}
+        self._requests = []
+        self._rules.sent()
+        self._origins = {}
+        self.requests_sent += sent
+        return sent
@@ -0,0 +1,376 @@
+"""
+Output sinks: where the results table is written.
+
+Every sink gets the planned layout first (prepare, possibly while the
+results are still being downloaded) and then the results (write).
+
+    SheetsSink   — Google worksheet, or any object with the gspread Spreadsheet
+                   interface such as local_sheet.LocalSpreadsheet
+    XlsxSink     — the same worksheet rendered into a local XLSX file
+    CsvSink      — the same grid with values instead of formulas
+    ParquetSink  — one row per student, one column per problem
+
+Extra metrics collected with the results (ContestInfo.Metrics, see
+metrics.py) go to one more worksheet per metric, one more CSV file per
+metric, or more Parquet columns.
+"""
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from cfscript import ContestInfo
+from incremental import ContestBlock, apply_incremental_update, build_grid, read_grid
+from layout import RESULT_START_ROW, SheetLayout, header
+from local_sheet import LocalSpreadsheet
+from metrics import METRICS
+from results import ResultStore
+from sheet_writer import SheetWriter
+from worksheets import (SUM_MODE_VALUES, create_worksheet, insert_contest_header, insert_contest_results,
+                        insert_main_sum_column, insert_metric_block, insert_sum_values, update_children_info)
+
+
+class OutputSink:
+    def prepare(self, children: List[List[str]], layout: SheetLayout, sum_mode: str):
+        """Writes what does not depend on the results. Called from a worker thread."""
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        """State saved in the run journal after prepare; None if there is nothing to resume from."""
+        return None
+
+    def resume(self, state: Dict[str, Any]) -> bool:
+        """Reattaches to a destination prepared by an earlier run; False if it has to be prepared again."""
+        return False
+
+    def write(self, children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+              sum_mode: str) -> int:
+        """
+        Writes the results.
+
+        :return: Number of Google Sheets requests sent (0 for local sinks).
+        """
+        raise NotImplementedError
+
+
+def _recreate_worksheet(table, worksheet_name: str) -> SheetWriter:
+    worksheet_names = [ws.title for ws in table.worksheets()]
+    if worksheet_name in worksheet_names:
+        table.del_worksheet(table.worksheet(worksheet_name))
+
+    create_worksheet(table=table, title=worksheet_name, rows=20, cols=500)
+    return SheetWriter(table.worksheet(worksheet_name))
+
+
+def prepare_worksheet(table, worksheet_name: str, children: List[List[str]], layout: SheetLayout,
+                      sum_mode: str) -> SheetWriter:
+    """
+    Recreates the results worksheet and writes everything that does not depend
+    on the results: roster, contest headers, formatting and Σ formulas.
+
+    :return: The flushed writer of the new worksheet, to be reused by write_contest_results.
+    """
+    worksheet = _recreate_worksheet(table, worksheet_name)
+    update_children_info(worksheet=worksheet, header=header, children=children)
+
+    num_children = len(children)
+    for block in layout.blocks:
+        insert_contest_header(worksheet=worksheet, name=block.name, tasks=block.tasks, start_col=block.start_col,
+                              num_children=num_children, sum_mode=sum_mode)
+
+    # In the "values" mode the main Σ column needs the results, see write_contest_results.
+    if layout.blocks and sum_mode != SUM_MODE_VALUES:
+        insert_main_sum_column(
+            worksheet=worksheet,
+            sum_col=layout.sum_col,
+            contest_sum_columns=layout.contest_sum_columns,
+            start_row=RESULT_START_ROW,
+            end_row=layout.end_row(num_children),
+            num_contests=len(layout.blocks),
+            mode=sum_mode
+        )
+
+    worksheet.flush()
+    return worksheet
+
+
+def write_contest_results(writer: SheetWriter, children: List[List[str]], layout: SheetLayout,
+                          contests: List[ContestInfo], sum_mode: str) -> int:
+    """
+    Writes the results into a worksheet prepared by prepare_worksheet, all blocks in one batch.
+
+    :return: Number of Sheets requests sent for the worksheet in total.
+    """
+    num_children = len(children)
+    end_row = layout.end_row(num_children)
+    for block, contest in zip(layout.blocks, contests):
+        insert_contest_results(worksheet=writer, contest_info=contest, start_col=block.start_col)
+
+    if layout.blocks and sum_mode == SUM_MODE_VALUES:
+        # Totals are computed locally; they are written as numbers in the "values" mode.
+        store = ResultStore.from_contests(num_children, contests)
+        contest_totals = store.contest_totals()
+        for index, block in enumerate(layout.blocks):
+            insert_sum_values(writer, target_col=block.start_col, start_row=RESULT_START_ROW, end_row=end_row,
+                              totals=contest_totals[:, index])
+        insert_main_sum_column(
+            worksheet=writer,
+            sum_col=layout.sum_col,
+            contest_sum_columns=layout.contest_sum_columns,
+            start_row=RESULT_START_ROW,
+            end_row=end_row,
+            num_contests=len(layout.blocks),
+            mode=sum_mode,
+            totals=store.totals()
+        )
+
+    writer.flush()
+    return writer.requests_sent
+
+
+def update_results(table, worksheet_name: str, children: List[List[str]], contests: List[ContestInfo],
+                   sum_mode: str) -> int:
+    """
+    Incrementally updates an existing results worksheet.
+
+    :return: Number of Sheets requests sent by the deferred writer.
+    """
+    existing = table.worksheet(worksheet_name)
+    grid = read_grid(existing)
+    # Rules of rebuilt blocks replace the old ones instead of piling up on every run.
+    worksheet = SheetWriter(existing, reconcile_rules=True)
+    changed = apply_incremental_update(worksheet=worksheet, grid=grid, header=header, children=children,
+                                       contests=contests, sum_mode=sum_mode)
+    worksheet.flush()
+    print(f"{worksheet_name}: changed cells: {changed}, Sheets requests sent: {worksheet.requests_sent}")
+    return worksheet.requests_sent
+
+
+def contest_metrics(contests: List[ContestInfo]) -> List[str]:
+    """Names of the extra metrics collected with the results, in a stable order."""
+    return list(dict.fromkeys(name for contest in contests for name in contest.Metrics))
+
+
+def metric_worksheet_name(worksheet_name: str, metric: str) -> str:
+    return f"{worksheet_name} ({METRICS[metric].title})"
+
+
+def metric_totals(metric: str, contests: List[ContestInfo], num_children: int) -> Optional[List[List[int]]]:
+    """Row sums of a summable metric per contest (contests × students), None otherwise."""
+    if not METRICS[metric].summable:
+        return None
+    return [[sum(value for value in row if value is not None) for row in contest.Metrics[metric]]
+            if metric in contest.Metrics else [0] * num_children
+            for contest in contests]
+
+
+def _metric_values(metric: str, contest: ContestInfo, num_children: int) -> List[List[Any]]:
+    return contest.Metrics.get(metric) or [[None] * len(contest.Tasks) for _ in range(num_children)]
+
+
+def write_metric_worksheet(table, worksheet_name: str, children: List[List[str]], layout: SheetLayout,
+                           contests: List[ContestInfo], metric: str) -> int:
+    """
+    Recreates the worksheet of one extra metric: the same roster and contest
+    blocks as the results worksheet, with the metric values in the cells.
+
+    :return: Number of Sheets requests sent.
+    """
+    num_children = len(children)
+    writer = _recreate_worksheet(table, metric_worksheet_name(worksheet_name, metric))
+    update_children_info(worksheet=writer, header=header, children=children)
+    totals = metric_totals(metric, contests, num_children)
+    for index, (block, contest) in enumerate(zip(layout.blocks, contests)):
+        insert_metric_block(writer, name=block.name, tasks=block.tasks, start_col=block.start_col,
+                            values=_metric_values(metric, contest, num_children),
+                            totals=totals[index] if totals is not None else None)
+    if totals is not None and num_children:
+        insert_sum_values(writer, target_col=layout.sum_col, start_row=RESULT_START_ROW,
+                          end_row=layout.end_row(num_children), totals=[sum(row) for row in zip(*totals)])
+    writer.flush()
+    return writer.requests_sent
+
+
+def write_metric_worksheets(table, worksheet_name: str, children: List[List[str]], layout: SheetLayout,
+                            contests: List[ContestInfo]) -> int:
+    return sum(write_metric_worksheet(table, worksheet_name, children, layout, contests, metric)
+               for metric in contest_metrics(contests))
+
+
+class SheetsSink(OutputSink):
+    """
+    Results worksheet in a spreadsheet.
+
+    :param incremental: Update an existing worksheet in place instead of recreating it.
+    """
+
+    def __init__(self, table, worksheet_name: str, incremental: bool = False):
+        self.table = table
+        self.worksheet_name = worksheet_name
+        self.incremental = incremental
+        self._writer: Optional[SheetWriter] = None
+
+    def prepare(self, children: List[List[str]], layout: SheetLayout, sum_mode: str):
+        if self.incremental and self.worksheet_name in [ws.title for ws in self.table.worksheets()]:
+            self._writer = None
+            return
+        self._writer = prepare_worksheet(self.table, self.worksheet_name, children, layout, sum_mode)
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        if self._writer is None:
+            return None
+        return {"worksheet_id": self._writer.id, "rules_sent": self._writer.rules_sent}
+
+    def resume(self, state: Dict[str, Any]) -> bool:
+        worksheets = {ws.id: ws for ws in self.table.worksheets()}
+        worksheet = worksheets.get(state["worksheet_id"])
+        if worksheet is None or worksheet.title != self.worksheet_name:
+            return False
+        self._writer = SheetWriter(worksheet, rules_sent=state["rules_sent"])
+        return True
+
+    def write(self, children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+              sum_mode: str) -> int:
+        if self._writer is None:
+            sent = update_results(self.table, self.worksheet_name, children, contests, sum_mode)
+        else:
+            sent = write_contest_results(self._writer, children, layout, contests, sum_mode)
+            print(f"{self.worksheet_name}: Sheets requests sent: {sent}")
+        return sent + write_metric_worksheets(self.table, self.worksheet_name, children, layout, contests)
+
+
+class XlsxSink(SheetsSink):
+    """The worksheet built in memory (see local_sheet.py) and saved as XLSX, without the Sheets API."""
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        # The prepared worksheet only lives in memory.
+        return None
+
+    def __init__(self, path: str, worksheet_name: str = "Results"):
+        super().__init__(LocalSpreadsheet(), worksheet_name)
+        self.path = path
+
+    def write(self, children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+              sum_mode: str) -> int:
+        write_contest_results(self._writer, children, layout, contests, sum_mode)
+        write_metric_worksheets(self.table, self.worksheet_name, children, layout, contests)
+        self.table.save_xlsx(self.path)
+        print(f"{self.worksheet_name}: saved to {self.path}")
+        return 0
+
+
+def _blocks(layout: SheetLayout, contests: List[ContestInfo]) -> List[ContestBlock]:
+    return [ContestBlock(start_col=block.start_col, contest=contest) for block, contest in zip(layout.blocks, contests)]
+
+
+def metric_grid(children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+                metric: str) -> Dict[Tuple[int, int], Any]:
+    """(row, col) -> value of the metric worksheet (see write_metric_worksheet), 1-based like build_grid."""
+    num_children = len(children)
+    totals = metric_totals(metric, contests, num_children)
+    cells: Dict[Tuple[int, int], Any] = {}
+    for col, label in enumerate(header[0], start=1):
+        cells[(2, col)] = label
+    for row, child in enumerate(children, start=RESULT_START_ROW):
+        for col, value in enumerate(child, start=1):
+            cells[(row, col)] = value
+        if totals is not None:
+            cells[(row, layout.sum_col)] = sum(contest_totals[row - RESULT_START_ROW] for contest_totals in totals)
+    for index, (block, contest) in enumerate(zip(layout.blocks, contests)):
+        cells[(1, block.start_col)] = block.name
+        cells[(2, block.start_col)] = "Σ" if totals is not None else ""
+        for offset, task in enumerate(block.tasks, start=1):
+            cells[(2, block.start_col + offset)] = task
+        for row, values in enumerate(_metric_values(metric, contest, num_children), start=RESULT_START_ROW):
+            if totals is not None:
+                cells[(row, block.start_col)] = totals[index][row - RESULT_START_ROW]
+            for offset, value in enumerate(values, start=1):
+                cells[(row, block.start_col + offset)] = "" if value is None else value
+    return cells
+
+
+def _save_csv(path: str, cells: Dict[Tuple[int, int], Any]):
+    rows = max(row for row, _ in cells)
+    cols = max(col for _, col in cells)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        for row in range(1, rows + 1):
+            writer.writerow([cells.get((row, col), "") for col in range(1, cols + 1)])
+    print(f"saved to {path}")
+
+
+class CsvSink(OutputSink):
+    """
+    The worksheet grid (two header rows, contest blocks) with computed totals
+    instead of formulas. Every extra metric goes to "<name>.<metric>.csv" next to it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+              sum_mode: str) -> int:
+        store = ResultStore.from_contests(len(children), contests)
+        _save_csv(self.path, build_grid(header, children, _blocks(layout, contests), SUM_MODE_VALUES, store))
+        path = Path(self.path)
+        for metric in contest_metrics(contests):
+            _save_csv(str(path.with_name(f"{path.stem}.{metric}{path.suffix}")),
+                      metric_grid(children, layout, contests, metric))
+        return 0
+
+
+class ParquetSink(OutputSink):
+    """
+    A flat table for analysis (needs pyarrow): surname, name, handle, total,
+    then "<contest id>:Σ" and "<contest id>:<problem>" per contest with
+    1 solved / 0 attempted / null untouched. Extra metrics add
+    "<contest id>:<problem>:<metric>" columns. Contest names are kept in the
+    file metadata.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, children: List[List[str]], layout: SheetLayout, contests: List[ContestInfo],
+              sum_mode: str) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from error
+
+        store = ResultStore.from_contests(len(children), contests)
+        matrix = store.matrix
+        columns: Dict[str, Any] = {
+            "surname": pa.array([child[0] for child in children], type=pa.string()),
+            "name": pa.array([child[1] for child in children], type=pa.string()),
+            "handle": pa.array([child[2] for child in children], type=pa.string()),
+            "total": pa.array(store.totals(), type=pa.int32()),
+        }
+        contest_totals = store.contest_totals()
+        for index, (block, contest) in enumerate(zip(layout.blocks, store.contests)):
+            columns[f"{block.contest_id}:Σ"] = pa.array(contest_totals[:, index], type=pa.int32())
+            for offset, task in enumerate(contest.tasks):
+                values = matrix[:, contest.start + offset]
+                columns[f"{block.contest_id}:{task}"] = pa.array(values, type=pa.int8(), mask=values < 0)
+        for metric in contest_metrics(contests):
+            for block, contest in zip(layout.blocks, contests):
+                rows = _metric_values(metric, contest, len(children))
+                for offset, task in enumerate(block.tasks):
+                    columns[f"{block.contest_id}:{task}:{metric}"] = pa.array([row[offset] for row in rows])
+        metadata = {"contests": json.dumps({block.contest_id: block.name for block in layout.blocks},
+                                           ensure_ascii=False)}
+        pq.write_table(pa.table(columns).replace_schema_metadata(metadata), self.path)
+        print(f"saved to {self.path}")
+        return 0
+
+
+def sink_for_path(path: str, worksheet_name: str = "Results") -> OutputSink:
+    """Chooses a local sink by the file extension: .xlsx, .csv or .parquet."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".xlsx":
+        return XlsxSink(path, worksheet_name)
+    if suffix == ".csv":
+        return CsvSink(path)
+    if suffix == ".parquet":
+        return ParquetSink(path)
+    raise ValueError(f"Unknown output format {suffix!r}: expected .xlsx, .csv or .parquet")
@@ -0,0 +1,83 @@
+import csv
+
+import pytest
+
+import config
+from archive import ArchivedContests, ResultsArchive
+from cfscript import CodeforcesServer
+from fakes import FakeClient, FakeCodeforcesClient, synthetic_contests
+from generate import Group, Target, main, publish, run, run_groups
+from ratelimit import TokenBucket
+from sinks import sink_for_path
+
+HANDLES = [{"surname": f"Surname{i}", "name": f"Name{i}", "cf_login": f"h{i}"} for i in range(5)]
+CONTESTS = synthetic_contests([row["cf_login"] for row in HANDLES], num_contests=2, other_participants=3, seed=5)
+CONTEST_IDS = sorted(CONTESTS)
+
+
+def _server():
+    return CodeforcesServer(client=FakeCodeforcesClient(CONTESTS), limiter=TokenBucket(1000, 1000))
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    settings = {"CONTEST_IDS": CONTEST_IDS, "TABLE_ID": None, "WORKSHEET_NAME": "Results", "TARGETS": [],
+                "SUM_FORMULA_MODE": "range", "EXTRA_METRICS": [], "CF_API_KEY": None, "CF_API_SECRET": None,
+                "CF_CACHE_PATH": None, "CF_FETCH_STRATEGY": None, "ROSTER_CACHE_PATH": None,
+                "JOURNAL_PATH": str(tmp_path / "journal.jsonl"), "ARCHIVE_PATH": str(tmp_path / "archive.sqlite")}
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+    archive = ResultsArchive(config.ARCHIVE_PATH)
+    yield archive
+    archive.close()
+
+
+def _export(tmp_path, *args):
+    output = str(tmp_path / "export.csv")
+    main(["--from-archive", "--output", output, *args])
+    with open(output, encoding="utf-8", newline="") as file:
+        return [row[2] for row in csv.reader(file)][2:]
+
+
+def test_archived_contests_rebuild_the_same_results(archive):
+    groups = {"A": {"h0": 0, "h1": 1, "h2": 2}, "B": {"h2": 0, "h3": 1, "h4": 2}}
+    metrics = ["attempts", "first_ac", "language"]
+    fetched = _server().fetch_group_contests(CONTEST_IDS, groups, metrics=metrics,
+                                             on_contest=lambda contest_id, infos: archive.record_contest(
+                                                 contest_id, CONTESTS[contest_id], infos, groups),
+                                             on_submissions=archive.record_submissions)
+    assert ArchivedContests(archive).fetch_group_contests(CONTEST_IDS, groups, metrics=metrics) == fetched
+    assert [contest_id for contest_id, *_ in archive.contests()] == CONTEST_IDS
+
+
+def test_single_run_roster_is_found_by_worksheet_name(archive, tmp_path):
+    run(cur_table=FakeClient(HANDLES).spreadsheet, cfserver=_server(), contests_ids=CONTEST_IDS,
+        worksheet_name="Results", sum_mode="range", archive=archive)
+    assert archive.roster_groups() == ["Results"]
+    assert _export(tmp_path) == [row["cf_login"] for row in HANDLES]
+
+
+def test_targets_run_roster_is_found_by_target_key(archive, tmp_path, monkeypatch):
+    # FakeClient opens the same spreadsheet for every key: the groups need their own worksheets.
+    targets = [Target(table_id="t1", worksheet_name="A"), Target(table_id="t2", worksheet_name="B")]
+    run_groups(FakeClient(HANDLES), _server(), targets, CONTEST_IDS, "range", archive=archive)
+    assert archive.roster_groups() == ["t1/A", "t2/B"]
+
+    monkeypatch.setattr(config, "TARGETS", [{"table_id": "t2", "worksheet_name": "B"}])
+    assert len(_export(tmp_path)) == len(HANDLES)
+    monkeypatch.setattr(config, "TARGETS", [{"table_id": "t1", "worksheet_name": "A"},
+                                            {"table_id": "t2", "worksheet_name": "B"}])
+    with pytest.raises(RuntimeError, match="--group"):
+        _export(tmp_path)
+    assert len(_export(tmp_path, "--group", "t1/A")) == len(HANDLES)
+
+
+def test_export_roster_is_found_by_output_path(archive, tmp_path, monkeypatch):
+    output = str(tmp_path / "export.csv")
+    group = Group(sink=sink_for_path(output), children=[[row["surname"], row["name"], row["cf_login"]]
+                                                        for row in HANDLES[:2]], niknames={"h0": 0, "h1": 1})
+    publish({output: group}, _server(), CONTEST_IDS, "range", archive=archive)
+    monkeypatch.setattr(config, "WORKSHEET_NAME", "Other")
+    assert _export(tmp_path) == ["h0", "h1"]
+    with pytest.raises(RuntimeError, match="Missing"):
+        _export(tmp_path, "--group", "Missing")
@@ -0,0 +1,13 @@
+from benchmark import run_scenario
+
+
+def test_strategy_is_chosen_for_the_production_rate_without_waiting():
+    # At the production rate 50 user.status calls take longer than one contest.status per contest.
+    result = run_scenario(50, 2, "range")
+    assert result.calls["cf.contest.status"] == 2
+    assert "cf.user.status" not in result.calls
+    assert result.wall_seconds < 2
+
+    result = run_scenario(50, 2, "range", cf_rate=1e9)
+    assert result.calls["cf.user.status"] == 50
+    assert "cf.contest.status" not in result.calls
@@ -0,0 +1,120 @@
+import cfscript
+from cf_cache import CacheEntry, ResponseCache
+from cfscript import METHOD_STATUS, CodeforcesServer
+from fakes import FakeCodeforcesClient
+from ratelimit import TokenBucket
+
+CONTEST_ID = 1500
+
+
+def _submission(submission_id, handle, verdict, problem="A"):
+    return {"id": submission_id, "contestId": CONTEST_ID, "creationTimeSeconds": 1700000000 + submission_id,
+            "relativeTimeSeconds": submission_id, "problem": {"contestId": CONTEST_ID, "index": problem},
+            "author": {"members": [{"handle": handle}], "participantType": "CONTESTANT"},
+            "programmingLanguage": "GNU C++17", "verdict": verdict}
+
+
+def _contest(phase, submissions):
+    return {CONTEST_ID: {"contest": {"id": CONTEST_ID, "name": "Round", "phase": phase, "durationSeconds": 7200},
+                         "problems": [{"index": "A"}, {"index": "B"}],
+                         "submissions": sorted(submissions, key=lambda row: row["id"], reverse=True)}}
+
+
+def _server(contests, cache):
+    return CodeforcesServer(client=FakeCodeforcesClient(contests), cache=cache, limiter=TokenBucket(1000, 1000))
+
+
+def _verdicts(rows):
+    return {row["id"]: row["verdict"] for row in rows}
+
+
+def test_cache_entry_ttl():
+    assert CacheEntry(payload=[], fetched_at=100, finished=False).is_fresh(60, now=159)
+    assert not CacheEntry(payload=[], fetched_at=100, finished=False).is_fresh(60, now=161)
+    assert CacheEntry(payload=[], fetched_at=100, finished=True).is_fresh(60, now=10 ** 9)
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put(1, METHOD_STATUS, [{"id": 1, "handle": "ёжик"}], finished=True)
+    entry = cache.get(1, METHOD_STATUS)
+    assert entry.payload == [{"id": 1, "handle": "ёжик"}] and entry.finished
+    assert cache.get(2, METHOD_STATUS) is None
+    cache.close()
+
+
+def test_finished_contest_is_served_from_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), running_ttl=0)
+    contests = _contest("FINISHED", [_submission(1, "a", "OK"), _submission(2, "b", "WRONG_ANSWER")])
+    _server(contests, cache).contest_submissions(CONTEST_ID, finished=True)
+    client = FakeCodeforcesClient(contests)
+    server = CodeforcesServer(client=client, cache=cache, limiter=TokenBucket(1000, 1000))
+    assert _verdicts(server.contest_submissions(CONTEST_ID, finished=True)) == {1: "OK", 2: "WRONG_ANSWER"}
+    assert sum(client.stats.counts.values()) == 0
+
+
+def test_refresh_of_running_contest_sees_a_hack(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), running_ttl=0)
+    submissions = [_submission(1, "a", "WRONG_ANSWER"), _submission(2, "a", "OK"), _submission(3, "b", "TESTING")]
+    contests = _contest("CODING", submissions)
+    server = _server(contests, cache)
+    assert _verdicts(server.contest_submissions(CONTEST_ID, finished=False))[2] == "OK"
+
+    submissions[1]["verdict"] = "CHALLENGED"
+    submissions[2]["verdict"] = "OK"
+    submissions.append(_submission(4, "b", "OK"))
+    contests[CONTEST_ID]["submissions"] = sorted(submissions, key=lambda row: row["id"], reverse=True)
+    assert _verdicts(server.contest_submissions(CONTEST_ID, finished=False)) == {
+        1: "WRONG_ANSWER", 2: "CHALLENGED", 3: "OK", 4: "OK"}
+    assert not cache.get(CONTEST_ID, METHOD_STATUS).finished
+
+
+def test_contest_is_downloaded_again_when_it_finishes(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), running_ttl=3600)
+    submissions = [_submission(1, "a", "OK"), _submission(2, "b", "OK")]
+    contests = _contest("CODING", submissions)
+    _server(contests, cache).contest_submissions(CONTEST_ID, finished=False)
+
+    # System tests reject a submission that passed pretests; the cached entry is still fresh.
+    submissions[0]["verdict"] = "WRONG_ANSWER"
+    contests[CONTEST_ID]["contest"]["phase"] = "FINISHED"
+    server = _server(contests, cache)
+    assert _verdicts(server.contest_submissions(CONTEST_ID, finished=True)) == {1: "WRONG_ANSWER", 2: "OK"}
+    assert cache.get(CONTEST_ID, METHOD_STATUS).finished
+    assert _verdicts(_stored(cache)) == {1: "WRONG_ANSWER", 2: "OK"}
+
+
+def _stored(cache):
+    return [row for batch in cache.iter_submissions(CONTEST_ID, batch_size=2) for row in batch]
+
+
+def test_cache_gets_every_submission_but_memory_only_the_roster(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfscript, "STATUS_STORE_BATCH", 2)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    batches = []
+    put_submissions = cache.put_submissions
+    monkeypatch.setattr(cache, "put_submissions", lambda contest_id, rows: (batches.append(len(rows)),
+                                                                            put_submissions(contest_id, rows)))
+    submissions = [_submission(index, "a" if index % 3 == 0 else f"other{index}", "OK") for index in range(1, 8)]
+    for phase, finished in (("CODING", False), ("FINISHED", True)):
+        batches.clear()
+        server = _server(_contest(phase, submissions), cache)
+        assert sorted(_verdicts(server.contest_submissions(CONTEST_ID, finished=finished, handles={"a"}))) == [3, 6]
+        # Rows are written while they are parsed, a few at a time.
+        assert batches and max(batches) <= 2 and sum(batches) == 7
+        assert [row["id"] for row in _stored(cache)] == [7, 6, 5, 4, 3, 2, 1]
+
+    # A cached contest is read back in batches, keeping only the roster rows.
+    pages = []
+    rows = _server({}, cache).contest_submissions(CONTEST_ID, finished=True, handles={"a"}, on_page=pages.append)
+    assert [row["id"] for row in rows] == [6, 3] and sum(map(len, pages)) == 2
+
+
+def test_whole_response_entry_of_an_older_cache_is_downloaded_again(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put(CONTEST_ID, METHOD_STATUS, [{"id": 1, "handle": "a", "verdict": "OK"}], finished=True)
+    contests = _contest("FINISHED", [_submission(1, "a", "WRONG_ANSWER"), _submission(2, "a", "OK")])
+    client = FakeCodeforcesClient(contests)
+    server = CodeforcesServer(client=client, cache=cache, limiter=TokenBucket(1000, 1000))
+    assert _verdicts(server.contest_submissions(CONTEST_ID, finished=True)) == {1: "WRONG_ANSWER", 2: "OK"}
+    assert client.stats.counts["cf.contest.status"] == 1
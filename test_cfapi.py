@@ -0,0 +1,51 @@
+import io
+import json
+
+import pytest
+
+from cfapi import CodeforcesApiError, is_retryable_error, iter_result
+
+ROWS = [{"id": 3, "handle": "ёжик", "nested": {"list": [1, 2, "]"]}}, {"id": 2}, {"id": 1, "text": "a,b ]"}]
+
+
+def _body(rows):
+    return json.dumps({"status": "OK", "result": rows}, ensure_ascii=False).encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64 * 1024])
+def test_iter_result_parses_any_chunking(chunk_size):
+    assert list(iter_result(io.BytesIO(_body(ROWS)), chunk_size=chunk_size)) == ROWS
+
+
+def test_iter_result_empty_result():
+    assert list(iter_result(io.BytesIO(_body([])), chunk_size=3)) == []
+
+
+def test_iter_result_raises_api_error_for_failed_status():
+    body = json.dumps({"status": "FAILED", "comment": "handles: User with handle x not found"}).encode()
+    with pytest.raises(CodeforcesApiError, match="not found"):
+        list(iter_result(io.BytesIO(body), chunk_size=5))
+
+
+def test_truncated_response_is_retryable():
+    body = _body(ROWS)[:-20]
+    with pytest.raises(json.JSONDecodeError) as error:
+        list(iter_result(io.BytesIO(body), chunk_size=4))
+    assert is_retryable_error(error.value)
+
+
+def test_html_error_page_is_retryable():
+    with pytest.raises(json.JSONDecodeError) as error:
+        list(iter_result(io.BytesIO(b"<html>502 Bad Gateway</html>")))
+    assert is_retryable_error(error.value)
+
+
+def test_retryable_errors():
+    assert is_retryable_error(CodeforcesApiError("Call limit exceeded"))
+    assert is_retryable_error(CodeforcesApiError("Internal error", status_code=503))
+    assert is_retryable_error(ConnectionResetError())
+    assert is_retryable_error(TimeoutError())
+    assert not is_retryable_error(CodeforcesApiError("contestId: Contest with id 1 not found", status_code=400))
+    # Programming errors are not retried.
+    assert not is_retryable_error(ValueError("invalid literal for int()"))
+    assert not is_retryable_error(KeyError("id"))
@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cf_cache import ResponseCache
+from cfscript import METHOD_USER_STATUS, CodeforcesServer
+from fakes import FakeCodeforcesClient, synthetic_contests
+from fetch_planner import STRATEGY_STATUS, STRATEGY_USER_STATUS
+from ratelimit import TokenBucket
+
+HANDLES = [f"h{i}" for i in range(6)]
+
+
+def _server(client, strategy, cache=None):
+    return CodeforcesServer(client=client, strategy=strategy, cache=cache, limiter=TokenBucket(1000, 1000),
+                            max_workers=4)
+
+
+def _groups(handles):
+    return {"A": {handle: row for row, handle in enumerate(handles[:4])},
+            "B": {handle: row for row, handle in enumerate(handles[3:])}}
+
+
+def _results(per_group):
+    return {group: [(info.name, info.Tasks, info.Result, info.Metrics) for info in infos] for group, infos in per_group.items()}
+
+
+@pytest.mark.parametrize("metrics", [(), ("attempts", "first_ac", "language")])
+def test_strategies_build_the_same_results(metrics):
+    contests = synthetic_contests(HANDLES, num_contests=3, other_participants=5, seed=3)
+    results = {}
+    for strategy in (STRATEGY_STATUS, STRATEGY_USER_STATUS):
+        server = _server(FakeCodeforcesClient(contests), strategy)
+        results[strategy] = _results(server.fetch_group_contests(list(contests), _groups(HANDLES), metrics=metrics))
+    assert results[STRATEGY_STATUS] == results[STRATEGY_USER_STATUS]
+
+
+def test_user_status_downloads_every_handle_once():
+    contests = synthetic_contests(HANDLES, num_contests=5, seed=1)
+    client = FakeCodeforcesClient(contests, latency=0.01)
+    _server(client, STRATEGY_USER_STATUS).fetch_group_contests(list(contests), _groups(HANDLES))
+    assert client.stats.counts["cf.user.status"] == len(HANDLES)
+
+
+def test_unknown_handle_has_no_submissions():
+    contests = synthetic_contests(HANDLES, num_contests=2, seed=2)
+    client = FakeCodeforcesClient(contests, unknown_handles=["renamed"])
+    groups = {"A": {handle: row for row, handle in enumerate(HANDLES + ["renamed"])}}
+    results = _server(client, STRATEGY_USER_STATUS).fetch_group_contests(list(contests), groups)
+    assert all(info.Result[-1] == [-1] * len(info.Tasks) for info in results["A"])
+    expected = _server(FakeCodeforcesClient(contests), STRATEGY_STATUS).fetch_group_contests(list(contests), groups)
+    assert _results(results) == _results(expected)
+
+
+def test_user_status_is_cached_per_contest(tmp_path):
+    contests = synthetic_contests(HANDLES, num_contests=2, seed=4)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    groups = {"A": {handle: row for row, handle in enumerate(HANDLES[:4])}}
+    first = _server(FakeCodeforcesClient(contests), STRATEGY_USER_STATUS, cache)
+    expected = _results(first.fetch_group_contests(list(contests), groups))
+
+    client = FakeCodeforcesClient(contests)
+    assert _results(_server(client, STRATEGY_USER_STATUS, cache).fetch_group_contests(list(contests), groups)) \
+        == expected
+    assert client.stats.counts["cf.user.status"] == 0
+
+    # Only the handles added to the roster are downloaded.
+    groups["A"].update({handle: row for row, handle in enumerate(HANDLES[4:], start=4)})
+    client = FakeCodeforcesClient(contests)
+    _server(client, STRATEGY_USER_STATUS, cache).fetch_group_contests(list(contests), groups)
+    assert client.stats.counts["cf.user.status"] == 2
+    assert sorted(cache.get(min(contests), METHOD_USER_STATUS).payload["handles"]) == HANDLES
+    cache.close()
+
+
+class _FailingClient(FakeCodeforcesClient):
+    """user.status of "h0" fails with a non-retryable error once a second caller is waiting."""
+
+    def __init__(self, contests):
+        super().__init__(contests)
+        self.started = threading.Event()
+
+    def stream(self, method, **params):
+        if method == "user.status" and params["handle"] == "h0":
+            self.started.set()
+            threading.Event().wait(0.05)
+            raise KeyError("id")
+        return super().stream(method, **params)
+
+
+def test_failed_handle_download_reaches_waiting_contests():
+    client = _FailingClient(synthetic_contests(HANDLES, num_contests=2, seed=5))
+    server = _server(client, STRATEGY_USER_STATUS)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        owner = pool.submit(server.user_submissions, "h0")
+        client.started.wait(5)
+        waiting = pool.submit(server.user_submissions, "h0")
+        for future in (owner, waiting):
+            with pytest.raises(KeyError):
+                future.result(timeout=5)
+    # The failure is not remembered: the next call downloads the handle again.
+    assert "h0" not in server._user_submissions
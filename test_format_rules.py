@@ -0,0 +1,78 @@
+from format_rules import ConditionalRules, ranges_overlap
+
+SHEET_ID = 7
+
+
+def _range(start_row, end_row, start_col, end_col):
+    grid = {"sheetId": SHEET_ID, "startRowIndex": start_row, "startColumnIndex": start_col}
+    if end_row is not None:
+        grid["endRowIndex"] = end_row
+    if end_col is not None:
+        grid["endColumnIndex"] = end_col
+    return grid
+
+
+def _gradient(grid, mid="0.5"):
+    return {"ranges": [grid], "gradientRule": {
+        "minpoint": {"color": {"red": 1.0}, "type": "MIN"},
+        "midpoint": {"color": {"green": 0.8666667}, "type": "NUMBER", "value": mid},
+        "maxpoint": {"color": {"green": 1.0}, "type": "MAX"}}}
+
+
+def _highlight(grid):
+    return {"ranges": [grid], "booleanRule": {"condition": {"type": "BLANK"},
+                                              "format": {"backgroundColor": {"red": 1.0}}}}
+
+
+def _reconcile(existing, queued):
+    rules = ConditionalRules(SHEET_ID, existing=lambda: existing)
+    for rule in queued:
+        rules.add(rule)
+    return rules.requests()
+
+
+def test_overlapping_queued_rule_replaces_the_earlier_one():
+    rules = ConditionalRules(SHEET_ID)
+    first = _gradient(_range(2, 10, 3, 4))
+    second = _gradient(_range(5, 12, 3, 4), mid="1")
+    assert rules.add(first) == []
+    assert rules.add(second) == [first]
+    assert rules.pending == [second]
+    assert ranges_overlap(first, second) and not ranges_overlap(first, _gradient(_range(2, 10, 4, 5)))
+
+
+def test_rule_already_on_the_sheet_is_not_sent_again():
+    rule = _gradient(_range(2, 10, 3, 4))
+    # The API returns float32 colors, a colorStyle and no zero indexes.
+    on_sheet = _gradient({"sheetId": SHEET_ID, "startRowIndex": 2, "endRowIndex": 10, "startColumnIndex": 3,
+                          "endColumnIndex": 4})
+    on_sheet["gradientRule"]["maxpoint"]["colorStyle"] = {"rgbColor": {"green": 1.0}}
+    assert _reconcile([on_sheet, on_sheet], [rule]) == (
+        [{"deleteConditionalFormatRule": {"sheetId": SHEET_ID, "index": 1}}], [])
+
+
+def test_old_gradient_on_the_same_ranges_is_replaced():
+    deletes, adds = _reconcile([_gradient(_range(2, 10, 3, 4), mid="3")], [_gradient(_range(2, 10, 3, 4))])
+    assert deletes == [{"deleteConditionalFormatRule": {"sheetId": SHEET_ID, "index": 0}}]
+    assert [add["addConditionalFormatRule"]["index"] for add in adds] == [0]
+
+
+def test_rules_not_written_by_the_tool_are_left_alone():
+    existing = [
+        _highlight(_range(0, None, 0, 26)),                 # A:Z
+        _gradient(_range(0, None, 3, 4), mid="3"),          # D:D, unbounded
+        _highlight(_range(2, 10, 3, 4)),                    # same ranges, not a gradient
+        _gradient(_range(2, 9, 3, 4), mid="3"),             # overlapping, other ranges
+    ]
+    deletes, adds = _reconcile(existing, [_gradient(_range(2, 10, 3, 4))])
+    assert deletes == []
+    assert [add["addConditionalFormatRule"]["index"] for add in adds] == [4]
+
+
+def test_unknown_rules_of_a_resumed_run_are_kept():
+    rules = ConditionalRules(SHEET_ID, known_count=2)
+    rules.add(_gradient(_range(2, 10, 3, 4)))
+    deletes, adds = rules.requests()
+    assert deletes == [] and adds[0]["addConditionalFormatRule"]["index"] == 2
+    rules.sent()
+    assert rules.count == 3
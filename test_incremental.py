@@ -0,0 +1,79 @@
+from collections import Counter
+
+from cfscript import ContestInfo
+from fakes import FakeClient
+from incremental import SPILL, diff_grid, group_changes
+from layout import header, plan_layout
+from sheet_writer import VALUE_INPUT_RAW, VALUE_INPUT_USER_ENTERED, a1_to_grid_range
+from sinks import prepare_worksheet, update_results, write_contest_results
+
+CHILDREN = [["Ivanov", "Ivan", "h0"], ["Petrov", "Petr", "h1"], ["Sidorov", "Sidor", "h2"]]
+
+
+def _meta(name, tasks):
+    return {"contest": {"name": name}, "problems": [{"index": task} for task in tasks]}
+
+
+def _build(table, contests, sum_mode):
+    metas = {index: _meta(contest.name, contest.Tasks) for index, contest in enumerate(contests)}
+    layout = plan_layout(list(metas), metas, header_size=len(header[0]))
+    writer = prepare_worksheet(table, "Results", CHILDREN, layout, sum_mode)
+    write_contest_results(writer, CHILDREN, layout, contests, sum_mode)
+
+
+def _written_cells(table):
+    """Counts how many times every cell was sent in values.batchUpdate."""
+    written = Counter()
+    original = table.values_batch_update
+
+    def values_batch_update(body):
+        for data in body["data"]:
+            grid = a1_to_grid_range(0, data["range"].rsplit("!", 1)[1])
+            for row_offset, row in enumerate(data["values"]):
+                for col_offset in range(len(row)):
+                    written[(grid["startRowIndex"] + row_offset, grid["startColumnIndex"] + col_offset)] += 1
+        original(body)
+
+    table.values_batch_update = values_batch_update
+    return written
+
+
+def test_diff_grid_writes_changes_and_clears_leftovers():
+    grid = [["a", "b", "old"], ["", 1.0, ""]]
+    desired = {(1, 1): "a", (1, 2): "B", (2, 2): 1}
+    assert diff_grid(grid, desired) == {(1, 2): "B", (1, 3): ""}
+
+
+def test_diff_grid_skips_written_cells_but_clears_spill():
+    grid = [["x", "=A1"], ["", "=A2"]]
+    desired = {(1, 1): "y", (1, 2): "=ARRAYFORMULA(A1:A2)", (2, 2): SPILL}
+    assert diff_grid(grid, desired, written={(1, 1), (1, 2), (2, 2)}) == {(2, 2): ""}
+
+
+def test_group_changes_joins_neighbours_with_the_same_input_option():
+    changes = {(3, 5): 1, (3, 6): "", (3, 7): "=SUM(A3)", (3, 9): 0, (4, 5): 1}
+    assert group_changes(changes) == [
+        ("E3:F3", [[1, ""]], VALUE_INPUT_RAW),
+        ("G3", [["=SUM(A3)"]], VALUE_INPUT_USER_ENTERED),
+        ("I3", [[0]], VALUE_INPUT_RAW),
+        ("E4", [[1]], VALUE_INPUT_RAW),
+    ]
+
+
+def test_changed_block_is_written_once():
+    for sum_mode in ["per_row", "range", "array", "values"]:
+        table = FakeClient([]).spreadsheet
+        first = ContestInfo(name="First", Tasks=["A", "B"], Result=[[1, -1], [0, 1], [-1, -1]])
+        second = ContestInfo(name="Second", Tasks=["A", "B"], Result=[[1, 1], [-1, 0], [1, -1]])
+        _build(table, [first, second], sum_mode)
+
+        written = _written_cells(table)
+        first = ContestInfo(name="First", Tasks=["A", "B"], Result=[[1, 1], [0, 1], [-1, -1]])
+        second = ContestInfo(name="Second", Tasks=["A", "B", "C"], Result=[[1, 1, 0], [-1, 0, -1], [1, -1, 1]])
+        update_results(table, "Results", CHILDREN, [first, second], sum_mode)
+        assert written and max(written.values()) == 1, (sum_mode, written.most_common(3))
+
+        expected = FakeClient([]).spreadsheet
+        _build(expected, [first, second], sum_mode)
+        assert (table.worksheet("Results").get_all_values() == expected.worksheet("Results").get_all_values()), \
+            sum_mode
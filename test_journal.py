@@ -0,0 +1,55 @@
+from cfscript import ContestInfo
+from journal import RunJournal, file_digest, run_fingerprint
+
+CHILDREN = [["Ivanov", "Ivan", "ёжик"], ["Petrov", "Petr", "h1"]]
+
+
+def _interrupted_run(path, fingerprint):
+    journal = RunJournal(path, fingerprint)
+    journal.record_roster("Results", CHILDREN)
+    journal.record_contest(1500, {"Results": ContestInfo(name="Round", Tasks=["A"], Result=[[1], [-1]])})
+    journal.record_prepared("Results", {"rules_sent": 3})
+    journal.record_written("Other")
+    journal.close()
+
+
+def test_resume_replays_completed_steps(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _interrupted_run(path, "f1")
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"step": "contest", "contest_id": 16')  # cut short by a crash
+
+    journal = RunJournal(path, "f1", resume=True)
+    assert journal.roster("Results") == CHILDREN
+    assert journal.contest(1500, "Results") == ContestInfo(name="Round", Tasks=["A"], Result=[[1], [-1]])
+    assert journal.contest(1600, "Results") is None
+    assert journal.prepared == {"Results": {"rules_sent": 3}} and journal.written == {"Other"}
+    journal.finish()
+
+    # A finished run is not resumed.
+    journal = RunJournal(path, "f1", resume=True)
+    assert journal.rosters == {} and journal.contests == {}
+    journal.close()
+
+
+def test_other_run_or_no_resume_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _interrupted_run(path, "f1")
+    journal = RunJournal(path, "f2", resume=True)
+    assert journal.rosters == {}
+    journal.close()
+
+    _interrupted_run(path, "f1")
+    RunJournal(path, "f1").close()
+    journal = RunJournal(path, "f1", resume=True)
+    assert journal.rosters == {}
+    journal.close()
+
+
+def test_fingerprint_follows_the_roster_contents(tmp_path):
+    roster = tmp_path / "roster.csv"
+    roster.write_text("surname,name,cf_login\nIvanov,Ivan,h0\n", encoding="utf-8")
+    before = run_fingerprint([1500], "range", "out.xlsx", file_digest(str(roster)))
+    assert before == run_fingerprint([1500], "range", "out.xlsx", file_digest(str(roster)))
+    roster.write_text("surname,name,cf_login\nIvanov,Ivan,h0\nPetrov,Petr,h1\n", encoding="utf-8")
+    assert before != run_fingerprint([1500], "range", "out.xlsx", file_digest(str(roster)))
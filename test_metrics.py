@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+from metrics import METRICS, create_metrics
+
+
+def _row(submission_id, verdict, type="CONTESTANT", relative=3725, time=1700000000, lang="GNU C++17"):
+    return {"id": submission_id, "verdict": verdict, "type": type, "relative": relative, "time": time, "lang": lang}
+
+
+ROWS = [
+    (0, 0, _row(1, "WRONG_ANSWER")),
+    (0, 0, _row(2, "COMPILATION_ERROR")),
+    (0, 0, _row(3, "TIME_LIMIT_EXCEEDED")),
+    (0, 0, _row(4, "OK", relative=5430, lang="Python 3")),
+    (0, 0, _row(5, "WRONG_ANSWER")),
+    (0, 0, _row(6, "OK", lang="Kotlin")),
+    (0, 1, _row(7, "WRONG_ANSWER")),
+    (1, 1, _row(8, "OK", type="VIRTUAL", time=1700086400)),
+    (1, 0, _row(9, "OK", type="PRACTICE", relative=None, time=1700172800, lang="PyPy 3")),
+]
+
+
+def _matrices(rows):
+    metrics = create_metrics(list(METRICS), num_students=2, num_problems=2)
+    for student, problem, row in rows:
+        for metric in metrics:
+            metric.add(student, problem, row)
+    return {metric.name: metric.matrix() for metric in metrics}
+
+
+def test_metric_values():
+    assert _matrices(ROWS) == {
+        "attempts": [[2, None], [0, 0]],
+        "first_ac": [["1:30", None], ["2023-11-16", "2023-11-15"]],
+        "mode": [["contest", None], ["upsolve", "virtual"]],
+        "language": [["Python 3", None], ["PyPy 3", "GNU C++17"]],
+    }
+
+
+def test_metrics_do_not_depend_on_the_order_of_submissions():
+    # Pages of a paged download may arrive in any order.
+    expected = _matrices(ROWS)
+    for permutation in itertools.islice(itertools.permutations(ROWS), 0, 5000, 97):
+        assert _matrices(permutation) == expected
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError, match="unknown_metric"):
+        create_metrics(["unknown_metric"], 1, 1)
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+
+from cfscript import ContestInfo
+from results import ResultStore
+
+FIRST = ContestInfo(name="First", Tasks=["A", "B", "C"], Result=[[1, 0, -1], [1, 1, 1], [-1, -1, -1], [0, 1, -1]])
+SECOND = ContestInfo(name="Second", Tasks=["A", "B"], Result=[[1, 1], [-1, 0], [0, -1], [1, -1]])
+CONTESTS = [FIRST, SECOND]
+
+
+def _rows():
+    """students × problems of all contests, as plain lists."""
+    return [FIRST.Result[student] + SECOND.Result[student] for student in range(4)]
+
+
+def test_matrix_round_trips_contest_results():
+    store = ResultStore.from_contests(4, CONTESTS)
+    assert store.matrix.dtype == np.int8
+    assert store.matrix.tolist() == _rows()
+    for contest, info in zip(store.contests, CONTESTS):
+        assert store.matrix[:, contest.start:contest.stop].tolist() == info.Result
+    assert store.problem_labels() == ["First: A", "First: B", "First: C", "Second: A", "Second: B"]
+
+
+def test_totals_and_rates_match_plain_python():
+    store = ResultStore.from_contests(4, CONTESTS)
+    rows = _rows()
+    columns = list(zip(*rows))
+    assert store.totals().tolist() == [sum(cell == 1 for cell in row) for row in rows]
+    assert store.contest_totals().tolist() == [
+        [sum(cell == 1 for cell in info.Result[student]) for info in CONTESTS] for student in range(4)]
+    assert store.solve_rates().tolist() == [sum(cell == 1 for cell in column) / 4 for column in columns]
+    assert store.attempt_rates().tolist() == [sum(cell != -1 for cell in column) / 4 for column in columns]
+
+    for value, column in zip(store.difficulty().tolist(), columns):
+        attempted = sum(cell != -1 for cell in column)
+        if attempted == 0:
+            assert math.isnan(value)
+        else:
+            assert value == 1 - sum(cell == 1 for cell in column) / attempted
+
+
+def test_ranking_shares_places():
+    store = ResultStore.from_contests(4, CONTESTS)
+    totals = store.totals().tolist()
+    assert store.ranking().tolist() == [1 + sum(other > total for other in totals) for total in totals]
+    assert store.ranking().tolist() == [1, 1, 4, 3]
+
+
+def test_adding_contests_one_by_one():
+    store = ResultStore(4)
+    store.add_contest(FIRST)
+    assert store.totals().tolist() == [1, 3, 0, 1]
+    store.add_contest(SECOND)
+    assert store.matrix.tolist() == _rows()
+
+
+def test_empty_roster_and_no_contests():
+    empty_roster = ResultStore.from_contests(0, [ContestInfo(name="First", Tasks=["A", "B"], Result=[])])
+    assert empty_roster.matrix.shape == (0, 2)
+    assert empty_roster.totals().tolist() == [] and empty_roster.ranking().tolist() == []
+    assert empty_roster.solve_rates().tolist() == [0, 0] and empty_roster.attempt_rates().tolist() == [0, 0]
+    assert all(math.isnan(value) for value in empty_roster.difficulty().tolist())
+    assert empty_roster.contest_totals().shape == (0, 1)
+
+    no_contests = ResultStore.from_contests(3, [])
+    assert no_contests.matrix.shape == (3, 0)
+    assert no_contests.totals().tolist() == [0, 0, 0] and no_contests.ranking().tolist() == [1, 1, 1]
+    assert no_contests.contest_totals().shape == (3, 0)
+    assert no_contests.solve_rates().tolist() == [] and no_contests.difficulty().tolist() == []
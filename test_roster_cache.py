@@ -0,0 +1,53 @@
+from fakes import FakeClient
+from roster_cache import RosterCache, column_fingerprint
+
+HANDLES = [{"surname": "Ivanov", "name": "Ivan", "cf_login": "ёжик"},
+           {"surname": "Petrov", "name": "Petr", "cf_login": "h1"},
+           {"surname": "Guest", "name": "", "cf_login": ""}]
+
+
+def _worksheet():
+    client = FakeClient([dict(record) for record in HANDLES])
+    return client, client.spreadsheet.worksheet("handles")
+
+
+def test_miss_reads_the_sheet_once(tmp_path):
+    client, worksheet = _worksheet()
+    cache = RosterCache(str(tmp_path / "rosters.sqlite"))
+    assert cache.load("table/handles", worksheet) == [["Ivanov", "Ivan", "ёжик"], ["Petrov", "Petr", "h1"],
+                                                      ["Guest", "", ""]]
+    assert client.stats.counts == {"sheets.worksheet": 1, "sheets.get_all_records": 1}
+    entry = cache.get("table/handles")
+    # The fingerprint taken from the records is the one a later col_values check computes.
+    assert entry.handle_column == 3
+    assert entry.fingerprint == column_fingerprint(worksheet.col_values(3))
+    cache.close()
+
+
+def test_hit_checks_only_the_handle_column(tmp_path):
+    client, worksheet = _worksheet()
+    cache = RosterCache(str(tmp_path / "rosters.sqlite"))
+    cache.load("table/handles", worksheet)
+    client.stats.counts.clear()
+
+    worksheet.records[1]["name"] = "Pyotr"
+    assert cache.load("table/handles", worksheet)[1] == ["Petrov", "Petr", "h1"]
+    assert client.stats.counts == {"sheets.col_values": 1}
+
+    worksheet.records[1]["cf_login"] = "h2"
+    assert cache.load("table/handles", worksheet)[1] == ["Petrov", "Pyotr", "h2"]
+    assert client.stats.counts == {"sheets.col_values": 2, "sheets.get_all_records": 1}
+    cache.close()
+
+
+def test_numeric_looking_handles_keep_their_text(tmp_path):
+    client = FakeClient([{"surname": "Bond", "name": "James", "cf_login": "007"},
+                         {"surname": "Big", "name": "", "cf_login": "1e5"}])
+    worksheet = client.spreadsheet.worksheet("handles")
+    cache = RosterCache(str(tmp_path / "rosters.sqlite"))
+    assert cache.load("table/handles", worksheet) == [["Bond", "James", "007"], ["Big", "", "1e5"]]
+    client.stats.counts.clear()
+    # The fingerprint of the full read matches the col_values check: no second full read.
+    assert cache.load("table/handles", worksheet) == [["Bond", "James", "007"], ["Big", "", "1e5"]]
+    assert client.stats.counts == {"sheets.col_values": 1}
+    cache.close()
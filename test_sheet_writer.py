@@ -0,0 +1,66 @@
+import json
+
+from fakes import FakeClient
+from sheet_writer import (MAX_PAYLOAD_BYTES, MAX_REQUESTS_PER_BATCH, VALUE_INPUT_RAW, VALUE_INPUT_USER_ENTERED,
+                          SheetWriter, _chunk, a1_to_grid_range)
+
+
+def _size(items):
+    return sum(len(json.dumps(item, ensure_ascii=False).encode("utf-8")) for item in items)
+
+
+def _writer(**kwargs):
+    client = FakeClient([])
+    spreadsheet = client.spreadsheet
+    worksheet = spreadsheet.add_worksheet("Results", rows=100, cols=26)
+    bodies = []
+    for name in ("values_batch_update", "batch_update"):
+        original = getattr(spreadsheet, name)
+        setattr(spreadsheet, name, lambda body, name=name, original=original: (bodies.append((name, body)),
+                                                                               original(body)))
+    return SheetWriter(worksheet, **kwargs), worksheet, bodies
+
+
+def test_chunk_respects_item_and_byte_limits():
+    items = [{"range": f"A{row}", "values": [["x" * 100]]} for row in range(10, 35)]
+    chunks = _chunk(items, max_items=10, max_bytes=_size(items[:4]))
+    assert [item for chunk in chunks for item in chunk] == items
+    assert all(len(chunk) <= 10 and _size(chunk) <= _size(items[:4]) for chunk in chunks)
+    assert len(chunks) == 7
+    # An item larger than the limit still goes, alone.
+    assert _chunk([{"big": "y" * 50}, {"a": 1}], max_items=10, max_bytes=10) == [[{"big": "y" * 50}], [{"a": 1}]]
+
+
+def test_default_limits():
+    assert MAX_REQUESTS_PER_BATCH == 1000 and MAX_PAYLOAD_BYTES == 2 * 1024 * 1024
+    items = [{"n": index} for index in range(2500)]
+    assert [len(chunk) for chunk in _chunk(items, MAX_REQUESTS_PER_BATCH, MAX_PAYLOAD_BYTES)] == [1000, 1000, 500]
+
+
+def test_flush_splits_batches_and_keeps_order():
+    writer, worksheet, bodies = _writer(max_requests_per_batch=3, max_payload_bytes=10 ** 6)
+    for row in range(1, 8):
+        writer.update(f"A{row}", [[row]])
+    writer.update("B1", [["=SUM(A1:A7)"]], value_input_option=VALUE_INPUT_USER_ENTERED)
+    writer.merge_cells("C1:D1")
+    assert bodies == [] and writer.pending == 9
+
+    assert writer.flush() == 5 and writer.requests_sent == 5 and writer.pending == 0
+    assert [(name, body.get("valueInputOption"), len(body.get("data", body.get("requests", []))))
+            for name, body in bodies] == [
+        ("values_batch_update", VALUE_INPUT_RAW, 3), ("values_batch_update", VALUE_INPUT_RAW, 3),
+        ("values_batch_update", VALUE_INPUT_RAW, 1), ("values_batch_update", VALUE_INPUT_USER_ENTERED, 1),
+        ("batch_update", None, 1)]
+    assert [row[0] for row in worksheet.get_all_values()] == list(range(1, 8))
+    assert bodies[-1][1]["requests"][0]["mergeCells"]["range"] == a1_to_grid_range(worksheet.id, "C1:D1")
+    assert writer.flush() == 0
+
+
+def test_flush_splits_by_payload_size():
+    writer, _, bodies = _writer(max_payload_bytes=4096)
+    for row in range(1, 11):
+        writer.update(f"A{row}", [["ё" * 500]])
+    sent = writer.flush()
+    assert sent == len(bodies) > 1
+    assert all(_size(body["data"]) <= 4096 for _, body in bodies)
+    assert sum(len(body["data"]) for _, body in bodies) == 10
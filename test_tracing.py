@@ -0,0 +1,151 @@
+import time
+
+from fakes import FakeClient
+from tracing import QuotaGuard, TracedClient, TracedCodeforcesClient, Tracer, caller_origin
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _guard(limit: int = 10):
+    clock = _Clock()
+    # headroom 0.5: blocks at 5 calls a minute.
+    return QuotaGuard("sheets_read", limit, headroom=0.5, clock=clock, sleep=clock.sleep), clock
+
+
+def test_guard_blocks_at_headroom_until_the_oldest_call_leaves_the_window():
+    guard, clock = _guard()
+    assert guard.limit == 5
+    for second in range(5):
+        clock.now = second
+        guard.acquire()
+    assert clock.sleeps == []
+
+    clock.now = 10
+    guard.acquire()
+    # The call made at 0 leaves the window at 60.
+    assert clock.sleeps == [50]
+    assert guard.waited_seconds == 50
+    assert clock.now == 60
+
+
+def test_guard_window_slides():
+    guard, clock = _guard()
+    for _ in range(5):
+        guard.acquire()
+    clock.now = 60
+    for _ in range(5):
+        guard.acquire()
+    assert clock.sleeps == []
+    assert guard.waited_seconds == 0
+
+
+def test_tracer_picks_the_guard_by_operation():
+    read, read_clock = _guard()
+    write, write_clock = _guard()
+    tracer = Tracer({"sheets_read": read, "sheets_write": write})
+    worksheet = TracedClient(FakeClient([]), tracer).open_by_key("table").worksheet("handles")
+    for _ in range(3):
+        worksheet.update([["x"]], "A1")
+        worksheet.col_values(1)
+    # open_by_key, worksheet and three col_values are reads; three updates are writes.
+    assert len(read._calls) == 5
+    assert len(write._calls) == 3
+
+
+def read_handles(worksheet):
+    return worksheet.col_values(3)
+
+
+def _read_in_helper(worksheet):
+    return read_handles(worksheet)
+
+
+def test_calls_are_attributed_to_the_public_function_that_made_them():
+    tracer = Tracer({})
+    worksheet = TracedClient(FakeClient([]), tracer).open_by_key("table").worksheet("handles")
+    tracer.spans.clear()
+
+    def nested():
+        return read_handles(worksheet)
+
+    _read_in_helper(worksheet)
+    nested()
+    worksheet.row_values(1)
+    assert [span.origin for span in tracer.spans] == ["test_tracing.read_handles", "test_tracing.read_handles",
+                                                      "test_tracing.test_calls_are_attributed_to_the_public_"
+                                                      "function_that_made_them"]
+    assert caller_origin() == "test_tracing.test_calls_are_attributed_to_the_public_function_that_made_them"
+
+
+class _SlowConsumerClient:
+    def stream(self, method, **params):
+        yield from range(3)
+
+
+def test_stream_span_does_not_include_the_consumer_time():
+    tracer = Tracer({})
+    client = TracedCodeforcesClient(_SlowConsumerClient(), tracer)
+    for _ in client.stream("contest.status", contestId=1):
+        time.sleep(0.05)
+    span, = tracer.spans
+    assert span.items == 3
+    assert span.consumer_seconds >= 0.15
+    assert span.seconds < 0.05
+
+
+def test_stream_items_can_make_their_own_calls():
+    tracer = Tracer({})
+    client = TracedCodeforcesClient(_SlowConsumerClient(), tracer)
+    worksheet = TracedClient(FakeClient([]), tracer).open_by_key("table").worksheet("handles")
+    tracer.spans.clear()
+    for _ in client.stream("contest.status", contestId=1):
+        worksheet.col_values(1)
+    assert [span.operation for span in tracer.spans] == ["col_values"] * 3 + ["contest.status"]
+
+
+def _samples(path):
+    samples = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_prometheus_textfile(tmp_path):
+    guard, clock = _guard(limit=2)
+    tracer = Tracer({"sheets_read": guard})
+    worksheet = TracedClient(FakeClient([]), tracer).open_by_key("table").worksheet("handles")
+    read_handles(worksheet)
+    try:
+        with tracer.span("codeforces", "contest.status"):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+    tracer.record_retry(TimeoutError(), 1)
+
+    path = tmp_path / "contest_result.prom"
+    tracer.write_prometheus(str(path))
+    text = path.read_text(encoding="utf-8")
+    assert "# TYPE contest_result_api_calls_total counter" in text
+    samples = _samples(path)
+    labels = 'api="sheets",operation="col_values",origin="test_tracing.read_handles"'
+    assert samples[f"contest_result_api_calls_total{{{labels}}}"] == 1
+    assert samples[f"contest_result_api_errors_total{{{labels}}}"] == 0
+    labels = 'api="codeforces",operation="contest.status",origin="test_tracing.test_prometheus_textfile"'
+    assert samples[f"contest_result_api_calls_total{{{labels}}}"] == 1
+    assert samples[f"contest_result_api_errors_total{{{labels}}}"] == 1
+    assert samples['contest_result_api_retries_total{origin="test_tracing.test_prometheus_textfile"}'] == 1
+    # The limit of one call a minute made the second and third reads wait.
+    assert samples['contest_result_quota_wait_seconds_total{quota="sheets_read"}'] == 120
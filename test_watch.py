@@ -0,0 +1,119 @@
+import pytest
+
+import config
+import watch
+from cfscript import CodeforcesServer
+from fakes import FakeClient, FakeCodeforcesClient
+from layout import header
+from ratelimit import TokenBucket
+from watch import ContestWatcher, read_block
+
+CONTEST_ID = 1600
+NIKNAMES = {"a": 0, "b": 1}
+
+
+def _submission(submission_id, handle, problem, verdict):
+    return {"id": submission_id, "contestId": CONTEST_ID, "creationTimeSeconds": 1700000000 + submission_id,
+            "relativeTimeSeconds": submission_id, "problem": {"contestId": CONTEST_ID, "index": problem},
+            "author": {"members": [{"handle": handle}], "participantType": "CONTESTANT"},
+            "programmingLanguage": "GNU C++17", "verdict": verdict}
+
+
+def _watcher(submissions, rebuild_every):
+    contests = {CONTEST_ID: {"contest": {"id": CONTEST_ID, "name": "Round", "phase": "CODING",
+                                         "durationSeconds": 7200},
+                             "problems": [{"index": "A"}, {"index": "B"}], "submissions": []}}
+
+    def publish():
+        contests[CONTEST_ID]["submissions"] = sorted(submissions, key=lambda row: row["id"], reverse=True)
+
+    publish()
+    server = CodeforcesServer(client=FakeCodeforcesClient(contests), limiter=TokenBucket(1000, 1000))
+    watcher = ContestWatcher(server, CONTEST_ID, NIKNAMES, ["A", "B"], rebuild_every=rebuild_every)
+    watcher.load()
+    return watcher, contests[CONTEST_ID], publish
+
+
+def test_poll_picks_up_new_and_tested_submissions():
+    submissions = [_submission(1, "a", "A", "WRONG_ANSWER"), _submission(2, "b", "B", "TESTING")]
+    watcher, _, publish = _watcher(submissions, rebuild_every=0)
+    assert watcher.result == [[0, -1], [-1, 0]]
+    submissions[1]["verdict"] = "OK"
+    submissions.append(_submission(3, "a", "A", "OK"))
+    publish()
+    assert sorted(watcher.poll()) == [(0, 0), (1, 1)]
+    assert watcher.result == [[1, -1], [-1, 1]]
+
+
+def test_rebuild_lowers_a_hacked_cell():
+    submissions = [_submission(1, "a", "A", "OK"), _submission(2, "b", "A", "WRONG_ANSWER"),
+                   _submission(3, "b", "B", "OK")]
+    watcher, _, publish = _watcher(submissions, rebuild_every=2)
+    assert watcher.result == [[1, -1], [0, 1]]
+    submissions[0]["verdict"] = "CHALLENGED"
+    submissions.append(_submission(4, "other", "A", "OK"))
+    publish()
+    assert watcher.poll() == [] and watcher.result[0][0] == 1
+    assert watcher.poll() == [(0, 0)]
+    assert watcher.result == [[0, -1], [0, 1]]
+
+
+def test_rebuild_when_the_contest_leaves_coding():
+    submissions = [_submission(1, "a", "A", "OK"), _submission(2, "a", "B", "OK")]
+    watcher, contest, publish = _watcher(submissions, rebuild_every=0)
+    submissions[1]["verdict"] = "WRONG_ANSWER"
+    contest["contest"]["phase"] = "SYSTEM_TEST"
+    publish()
+    assert watcher.poll() == [(0, 1)]
+    assert watcher.result == [[1, 0], [-1, -1]]
+    # The phase is read only until it leaves CODING.
+    assert watcher.poll() == [] and not watcher.coding
+
+
+def test_done_once_finished_and_nothing_is_testing():
+    submissions = [_submission(1, "a", "A", "OK"), _submission(2, "b", "B", "TESTING")]
+    watcher, contest, publish = _watcher(submissions, rebuild_every=0)
+    contest["contest"]["phase"] = "FINISHED"
+    publish()
+    assert watcher.poll() == [] and watcher.finished and not watcher.done
+    submissions[1]["verdict"] = "OK"
+    publish()
+    assert watcher.poll() == [(1, 1)] and watcher.done
+
+
+def _configure(monkeypatch, **settings):
+    settings = {"CONTEST_IDS": [CONTEST_ID], "TABLE_ID": "table", "WORKSHEET_NAME": "Results", "TARGETS": [],
+                "SUM_FORMULA_MODE": "range", "CF_CACHE_PATH": None, **settings}
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+
+
+def test_main_pushes_the_final_results_and_exits(monkeypatch):
+    _configure(monkeypatch)
+    submissions = [_submission(1, "a", "A", "OK")]
+    watcher, contest, publish = _watcher(submissions, rebuild_every=0)
+    client = FakeClient([{"surname": "A", "name": "A", "cf_login": "a"}, {"surname": "B", "name": "B", "cf_login": "b"}])
+    worksheet = client.spreadsheet.add_worksheet("Results", rows=10, cols=10)
+    monkeypatch.setattr(watch, "client_init_json", lambda: client)
+    monkeypatch.setattr(watch, "CodeforcesServer", lambda cache: watcher.server)
+    polls = []
+
+    def sleep(seconds):
+        # The contest ends after the first poll, with one more accepted submission.
+        polls.append(seconds)
+        submissions.append(_submission(2, "b", "B", "OK"))
+        contest["contest"]["phase"] = "FINISHED"
+        publish()
+
+    monkeypatch.setattr(watch.time, "sleep", sleep)
+    watch.main([str(CONTEST_ID), "--poll", "1", "--min-push-interval", "3600"])
+    assert polls == [1]
+    # The Σ column of the block comes first.
+    first_col = len(header[0]) + 2
+    assert read_block(worksheet, first_col, 2, 2) == [["1", ""], ["", "1"]]
+
+
+def test_main_rejects_targets(monkeypatch):
+    _configure(monkeypatch, TARGETS=[{"table_id": "t1", "worksheet_name": "A"}])
+    with pytest.raises(RuntimeError, match="TARGETS"):
+        watch.main([str(CONTEST_ID)])
@@ -0,0 +1,375 @@
+"""
+Tracing and quota accounting for every external call.
+
+Traced* proxies wrap the gspread Client/Spreadsheet/Worksheet objects and the
+Codeforces client, time every call, measure its payload, remember the
+originating function and wait for a QuotaGuard before quotas are exhausted.
+The collected data is exported as a JSON run report and a Prometheus textfile.
+"""
+import collections
+import contextlib
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+API_SHEETS = "sheets"
+API_CODEFORCES = "codeforces"
+
+# Google Sheets default per-user quotas.
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+QUOTA_HEADROOM = 0.9
+
+SHEETS_WRITE_METHODS = {
+    "values_batch_update", "batch_update", "update", "update_acell", "update_cell", "merge_cells",
+    "unmerge_cells", "format", "add_worksheet", "del_worksheet", "clear",
+}
+
+_SKIP_MODULES = {"tracing", "sheet_writer", "format_rules", "ratelimit", "cfapi", "contextlib", "threading",
+                 "concurrent.futures.thread"}
+_SKIP_FUNCTIONS = {"call_with_retries", "flush", "add_conditional_format_rule"}
+
+_local = threading.local()
+_active: Optional["Tracer"] = None
+
+
+def caller_origin(skip: int = 1) -> str:
+    """
+    Name of the innermost public, non-nested function of the project on the
+    call stack, e.g. "worksheets.insert_sum_formula".
+    """
+    frame = sys._getframe(skip)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module == "__main__" and "__file__" in frame.f_globals:
+            module = Path(frame.f_globals["__file__"]).stem
+        code = frame.f_code
+        if (module not in _SKIP_MODULES and not module.startswith(("gspread", "json", "urllib", "http"))
+                and not code.co_name.startswith("_") and code.co_name not in _SKIP_FUNCTIONS
+                and "<" not in getattr(code, "co_qualname", code.co_name)):
+            return f"{module}.{code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def active() -> Optional["Tracer"]:
+    return _active
+
+
+def start(tracer: "Tracer"):
+    """Makes the tracer active so that deferred writers remember where operations came from."""
+    global _active
+    _active = tracer
+
+
+@contextlib.contextmanager
+def batch_origins(origins: Dict[str, int]):
+    """Attributes the calls made inside the block to the functions that queued the batch."""
+    _local.batch_origins = origins
+    try:
+        yield
+    finally:
+        _local.batch_origins = None
+
+
+class QuotaGuard:
+    """
+    Sliding one-minute window that blocks before the quota is reached
+    (at headroom × limit), instead of waiting for a 429 afterwards.
+    """
+
+    def __init__(self, name: str, limit_per_minute: int, headroom: float = QUOTA_HEADROOM,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.limit = max(1, int(limit_per_minute * headroom))
+        self.window = 60.0
+        self.waited_seconds = 0.0
+        self._calls: Deque[float] = collections.deque()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                while self._calls and now - self._calls[0] >= self.window:
+                    self._calls.popleft()
+                if len(self._calls) < self.limit:
+                    self._calls.append(now)
+                    return
+                wait = self.window - (now - self._calls[0])
+                self.waited_seconds += wait
+            self._sleep(wait)
+
+
+@dataclass
+class Span:
+    api: str
+    operation: str
+    origin: str
+    seconds: float
+    payload_bytes: int
+    items: int = 0
+    error: Optional[str] = None
+    origins: Dict[str, int] = field(default_factory=dict)
+    # Time the caller spent on streamed items while the span was open; not part of seconds.
+    consumer_seconds: float = 0.0
+
+
+class Tracer:
+    def __init__(self, guards: Optional[Dict[str, QuotaGuard]] = None):
+        self.spans: List[Span] = []
+        self.retries: collections.Counter = collections.Counter()
+        self.guards = guards if guards is not None else {
+            "sheets_read": QuotaGuard("sheets_read", SHEETS_READS_PER_MINUTE),
+            "sheets_write": QuotaGuard("sheets_write", SHEETS_WRITES_PER_MINUTE),
+        }
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def guard(self, api: str, operation: str):
+        if api != API_SHEETS:
+            return
+        kind = "sheets_write" if operation in SHEETS_WRITE_METHODS else "sheets_read"
+        guard = self.guards.get(kind)
+        if guard is not None:
+            guard.acquire()
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def record_retry(self, error: Exception, attempt: int):
+        with self._lock:
+            self.retries[caller_origin()] += 1
+
+    @contextlib.contextmanager
+    def span(self, api: str, operation: str, payload_bytes: int = 0) -> Iterator[Span]:
+        origins = getattr(_local, "batch_origins", None) or {}
+        origin = max(origins, key=origins.get) if origins else caller_origin()
+        self.guard(api, operation)
+        span = Span(api=api, operation=operation, origin=origin, seconds=0.0, payload_bytes=payload_bytes,
+                    origins=dict(origins))
+        previous = getattr(_local, "span", None)
+        _local.span = span
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as error:
+            span.error = type(error).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started - span.consumer_seconds
+            _local.span = previous
+            self.record(span)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Spans aggregated by (api, operation, origin)."""
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            key = (span.api, span.operation, span.origin)
+            group = groups.setdefault(key, {"api": span.api, "operation": span.operation, "origin": span.origin,
+                                            "calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                            "consumer_seconds": 0.0, "payload_bytes": 0, "items": 0,
+                                            "errors": 0})
+            group["calls"] += 1
+            group["items"] += span.items
+            group["seconds"] += span.seconds
+            group["max_seconds"] = max(group["max_seconds"], span.seconds)
+            group["consumer_seconds"] += span.consumer_seconds
+            group["payload_bytes"] += span.payload_bytes
+            group["errors"] += span.error is not None
+        return sorted(groups.values(), key=lambda group: -group["seconds"])
+
+    def queued_operations(self) -> Dict[str, int]:
+        """Operations queued in deferred batches, by the function that queued them."""
+        counter: collections.Counter = collections.Counter()
+        for span in self.spans:
+            counter.update(span.origins)
+        return dict(counter)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "duration_seconds": time.time() - self.started,
+            "calls": self.summary(),
+            "queued_operations": self.queued_operations(),
+            "retries": dict(self.retries),
+            "quota_wait_seconds": {name: guard.waited_seconds for name, guard in self.guards.items()},
+            "spans": [asdict(span) for span in self.spans],
+        }
+
+    def write_json(self, path: str):
+        Path(path).write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def write_prometheus(self, path: str):
+        """Writes a node_exporter textfile collector file."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        summary = self.summary()
+        labels = [{"api": group["api"], "operation": group["operation"], "origin": group["origin"]}
+                  for group in summary]
+        metric("contest_result_api_calls_total", "counter", "External API calls.",
+               [(label, group["calls"]) for label, group in zip(labels, summary)])
+        metric("contest_result_api_call_seconds_total", "counter", "Time spent in external API calls.",
+               [(label, round(group["seconds"], 6)) for label, group in zip(labels, summary)])
+        metric("contest_result_api_consumer_seconds_total", "counter",
+               "Time spent processing streamed responses between reads.",
+               [(label, round(group["consumer_seconds"], 6)) for label, group in zip(labels, summary)])
+        metric("contest_result_api_payload_bytes_total", "counter", "Payload bytes of external API calls.",
+               [(label, group["payload_bytes"]) for label, group in zip(labels, summary)])
+        metric("contest_result_api_items_total", "counter", "Result items returned by external API calls.",
+               [(label, group["items"]) for label, group in zip(labels, summary)])
+        metric("contest_result_api_errors_total", "counter", "Failed external API calls.",
+               [(label, group["errors"]) for label, group in zip(labels, summary)])
+        metric("contest_result_api_retries_total", "counter", "Retried external API calls.",
+               [({"origin": origin}, count) for origin, count in self.retries.items()])
+        metric("contest_result_queued_operations_total", "counter", "Operations queued in deferred Sheets batches.",
+               [({"origin": origin}, count) for origin, count in self.queued_operations().items()])
+        metric("contest_result_quota_wait_seconds_total", "counter", "Time spent waiting for quota.",
+               [({"quota": name}, round(guard.waited_seconds, 6)) for name, guard in self.guards.items()])
+        Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@contextlib.contextmanager
+def _suspended(span: Span):
+    """Hands a streamed item to the caller: its time and its own calls are not counted in the span."""
+    current = getattr(_local, "span", None)
+    _local.span = None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        span.consumer_seconds += time.perf_counter() - started
+        _local.span = current
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _payload_size(args, kwargs) -> int:
+    if not args and not kwargs:
+        return 0
+    return len(json.dumps([args, kwargs], ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class _TracedProxy:
+    """Wraps an object and traces calls of the listed methods; everything else is passed through."""
+
+    _api = API_SHEETS
+
+    def __init__(self, target, tracer: Tracer):
+        self._target = target
+        self._tracer = tracer
+
+    def _wrap_result(self, result):
+        return result
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value) or name.startswith("_"):
+            return self._wrap_result(value)
+
+        def traced(*args, **kwargs):
+            with self._tracer.span(self._api, name, _payload_size(args, kwargs)):
+                result = value(*args, **kwargs)
+            return self._wrap_result(result)
+        return traced
+
+
+class TracedWorksheet(_TracedProxy):
+    def _wrap_result(self, result):
+        if type(result).__name__.endswith("Spreadsheet"):
+            return TracedSpreadsheet(result, self._tracer)
+        return result
+
+
+class TracedSpreadsheet(_TracedProxy):
+    def _wrap_result(self, result):
+        if type(result).__name__.endswith("Worksheet"):
+            return TracedWorksheet(result, self._tracer)
+        if isinstance(result, list) and result and type(result[0]).__name__.endswith("Worksheet"):
+            return [TracedWorksheet(worksheet, self._tracer) for worksheet in result]
+        return result
+
+    def del_worksheet(self, worksheet):
+        if isinstance(worksheet, TracedWorksheet):
+            worksheet = worksheet._target
+        with self._tracer.span(API_SHEETS, "del_worksheet"):
+            return self._target.del_worksheet(worksheet)
+
+
+class TracedClient(_TracedProxy):
+    def _wrap_result(self, result):
+        if type(result).__name__.endswith("Spreadsheet"):
+            return TracedSpreadsheet(result, self._tracer)
+        return result
+
+
+class _CountingResponse:
+    """Counts the bytes read from an HTTP response into the current span."""
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        span = getattr(_local, "span", None)
+        if span is not None:
+            span.payload_bytes += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._response.__exit__(*exc_info)
+
+
+class TracedCodeforcesClient:
+    """
+    Wraps CodeforcesClient (or a fake with the same call/stream interface).
+    Response bytes are counted when the client supports response_hook. A stream
+    span times only the download and parsing; the time the caller spends on the
+    items goes to consumer_seconds.
+    """
+
+    def __init__(self, client, tracer: Tracer):
+        self._client = client
+        self._tracer = tracer
+        if hasattr(client, "response_hook"):
+            client.response_hook = _CountingResponse
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def call(self, method: str, **params) -> Any:
+        with self._tracer.span(API_CODEFORCES, method) as span:
+            result = self._client.call(method, **params)
+            span.items = len(result) if isinstance(result, list) else 1
+        return result
+
+    def stream(self, method: str, **params) -> Iterator[Any]:
+        with self._tracer.span(API_CODEFORCES, method) as span:
+            for item in self._client.stream(method, **params):
+                span.items += 1
+                with _suspended(span):
+                    yield item
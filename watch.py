@@ -0,0 +1,240 @@
+"""
+Live watch mode: polls contest.status of a running contest and pushes only
+the verdict cells whose value changed.
+
+Polls only ever raise a cell, so every few polls (and once when the contest
+leaves the CODING phase) the roster's accepted submissions are fetched again
+and the matrix is rebuilt: a hacked or system-test-failed solution goes back
+from 1 to 0. Once the contest is FINISHED and no roster submission is still
+testing, the last changes are pushed and the watch ends.
+
+    python watch.py CONTEST_ID [--poll 20] [--debounce 10] [--min-push-interval 60] [--rebuild-every 15]
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import config
+from cf_cache import ResponseCache
+from cfscript import PENDING_VERDICTS, CodeforcesServer, ContestInfo, fold_submissions, is_finished
+from layout import header
+from incremental import RESULT_START_ROW, group_changes, plan_blocks
+from sheet_writer import SheetWriter
+from worksheets import SUM_MODE_VALUES, client_init_json, column_number_to_letter, extract_data_from_sheet, get_table_by_id
+
+
+class PushScheduler:
+    """
+    Decides when accumulated changes are pushed: after debounce seconds
+    without new changes (or max_wait seconds after the first pending one),
+    but never more often than min_interval.
+    """
+
+    def __init__(self, debounce: float, min_interval: float, max_wait: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_wait = max_wait if max_wait is not None else max(min_interval, debounce * 6)
+        self._clock = clock
+        self._first_change: Optional[float] = None
+        self._last_change: Optional[float] = None
+        self._last_push: Optional[float] = None
+
+    def note_change(self):
+        now = self._clock()
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+
+    def should_push(self) -> bool:
+        if self._first_change is None:
+            return False
+        now = self._clock()
+        if self._last_push is not None and now - self._last_push < self.min_interval:
+            return False
+        return now - self._last_change >= self.debounce or now - self._first_change >= self.max_wait
+
+    def pushed(self):
+        self._first_change = self._last_change = None
+        self._last_push = self._clock()
+
+
+class ContestWatcher:
+    """
+    Keeps the verdict matrix of one contest up to date with incremental polls.
+
+    :param rebuild_every: Every that many polls the matrix is rebuilt (see rebuild); 0 turns it off.
+    """
+
+    def __init__(self, server: CodeforcesServer, contest_id: int, niknames: Dict[str, int], tasks: List[str],
+                 rebuild_every: int = 0):
+        self.server = server
+        self.contest_id = contest_id
+        self.niknames = niknames
+        self.problems_dict = {problem: idx for idx, problem in enumerate(tasks)}
+        self.result = [[-1 for _ in tasks] for _ in niknames]
+        self.last_id = 0
+        # Roster submissions still in testing: their verdict is fetched again.
+        self.pending: Set[int] = set()
+        # Every roster submission seen so far by id, the matrix is rebuilt from them.
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.rebuild_every = rebuild_every
+        self.polls = 0
+        self.coding = True
+        self.finished = False
+
+    def _apply(self, rows: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        roster_rows = [row for row in rows if row["handle"] in self.niknames]
+        for row in roster_rows:
+            self.rows[row["id"]] = row
+            if row["verdict"] in PENDING_VERDICTS:
+                self.pending.add(row["id"])
+            else:
+                self.pending.discard(row["id"])
+        if rows:
+            self.last_id = max(self.last_id, max(row["id"] for row in rows))
+        return fold_submissions(self.result, roster_rows, self.niknames, self.problems_dict)
+
+    def load(self) -> List[Tuple[int, int]]:
+        """First full download (streamed, roster only)."""
+        rows = self.server.contest_submissions(self.contest_id, finished=False, handles=self.niknames)
+        return self._apply(rows)
+
+    def poll(self) -> List[Tuple[int, int]]:
+        """
+        Fetches submissions newer than the last seen one and returns the changed cells.
+        Until the contest is FINISHED, its phase is read too (contest.standings, cached
+        for CF_CACHE_PATH's running TTL).
+        """
+        self.polls += 1
+        rebuild = self.rebuild_every and self.polls % self.rebuild_every == 0
+        if not self.finished:
+            meta = self.server.contest_meta(self.contest_id)
+            if self.coding and meta["contest"].get("phase") != "CODING":
+                # Hacks and system tests are over or under way: verdicts of accepted solutions change.
+                self.coding = False
+                rebuild = True
+            if is_finished(meta):
+                # Final verdicts: the matrix is rebuilt once more.
+                self.finished = True
+                rebuild = True
+        if rebuild:
+            return self.rebuild()
+        boundary = min(self.pending) if self.pending else self.last_id + 1
+        return self._apply(self.server.submissions_since(self.contest_id, boundary))
+
+    def rebuild(self) -> List[Tuple[int, int]]:
+        """
+        Fetches again every submission from the first accepted (or still testing) roster
+        submission on and computes the matrix from scratch, so cells can also go down.
+
+        :return: Cells whose value changed.
+        """
+        unsettled = [row["id"] for row in self.rows.values() if row["verdict"] == "OK"] + list(self.pending)
+        boundary = min(unsettled) if unsettled else self.last_id + 1
+        # _apply folds the new rows into self.result, the changes are counted from the matrix before it.
+        before = [list(row) for row in self.result]
+        self._apply(self.server.submissions_since(self.contest_id, boundary))
+        result = [[-1 for _ in row] for row in self.result]
+        fold_submissions(result, [self.rows[submission_id] for submission_id in sorted(self.rows)],
+                         self.niknames, self.problems_dict)
+        changed = [(child, problem) for child, row in enumerate(result) for problem, value in enumerate(row)
+                   if before[child][problem] != value]
+        self.result = result
+        return changed
+
+    @property
+    def done(self) -> bool:
+        """The contest is FINISHED and no roster submission is still testing: nothing will change."""
+        return self.finished and not self.pending
+
+
+def _cell_value(value: int):
+    return "" if value == -1 else value
+
+
+def read_block(worksheet, first_col: int, num_tasks: int, num_children: int) -> List[List[str]]:
+    """Reads the verdict cells of a contest block as they are on the sheet."""
+    end_row = RESULT_START_ROW + num_children - 1
+    address = (f"{column_number_to_letter(first_col)}{RESULT_START_ROW}:"
+               f"{column_number_to_letter(first_col + num_tasks - 1)}{end_row}")
+    rows = worksheet.get(address)
+    return [[str(row[col]) if col < len(row) else "" for col in range(num_tasks)]
+            for row in rows + [[]] * (num_children - len(rows))]
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Keep a contest block up to date during a live contest.")
+    parser.add_argument("contest_id", type=int, help="contest from CONTEST_IDS to watch")
+    parser.add_argument("--poll", type=float, default=20, help="seconds between contest.status polls")
+    parser.add_argument("--debounce", type=float, default=10, help="quiet seconds before changes are pushed")
+    parser.add_argument("--min-push-interval", type=float, default=60, help="minimum seconds between pushes")
+    parser.add_argument("--rebuild-every", type=int, default=15,
+                        help="polls between rebuilds that catch hacked solutions (0: never)")
+    args = parser.parse_args(argv)
+
+    if args.contest_id not in config.CONTEST_IDS:
+        raise RuntimeError(f"Contest {args.contest_id} is not in CONTEST_IDS, its block position is unknown.")
+    if config.SUM_FORMULA_MODE == SUM_MODE_VALUES:
+        raise RuntimeError('Watch mode needs Σ formulas: SUM_FORMULA_MODE = "values" writes static totals.')
+    if config.TARGETS:
+        raise RuntimeError("Watch mode writes one worksheet (TABLE_ID / WORKSHEET_NAME), TARGETS is not supported.")
+
+    client = client_init_json()
+    table = get_table_by_id(client, config.TABLE_ID)
+    worksheet = table.worksheet(config.WORKSHEET_NAME)
+    children = extract_data_from_sheet(table=table, sheet_name="handles")
+    niknames = {child[2]: i for i, child in enumerate(children)}
+
+    server = CodeforcesServer(cache=ResponseCache(config.CF_CACHE_PATH) if config.CF_CACHE_PATH else None)
+    # Block positions depend only on the task lists, which contest.standings gives cheaply.
+    metas = {contest_id: server.contest_meta(contest_id) for contest_id in config.CONTEST_IDS}
+    layout = [ContestInfo(name=meta["contest"]["name"], Tasks=[problem["index"] for problem in meta["problems"]],
+                          Result=[]) for meta in metas.values()]
+    blocks = plan_blocks(layout, first_col=len(header[0]) + 1)
+    block = blocks[config.CONTEST_IDS.index(args.contest_id)]
+    tasks = block.contest.Tasks
+    first_col = block.start_col + 1
+
+    watcher = ContestWatcher(server, args.contest_id, niknames, tasks, rebuild_every=args.rebuild_every)
+    watcher.load()
+    on_sheet = read_block(worksheet, first_col, len(tasks), len(children))
+    dirty: Set[Tuple[int, int]] = {
+        (child, problem)
+        for child in range(len(children)) for problem in range(len(tasks))
+        if on_sheet[child][problem] != str(_cell_value(watcher.result[child][problem]))
+    }
+
+    scheduler = PushScheduler(debounce=args.debounce, min_interval=args.min_push_interval)
+    if dirty:
+        scheduler.note_change()
+    writer = SheetWriter(worksheet)
+
+    def push():
+        changes = {(RESULT_START_ROW + child, first_col + problem): _cell_value(watcher.result[child][problem])
+                   for child, problem in dirty}
+        for address, values, value_input_option in group_changes(changes):
+            writer.update(address, values, value_input_option=value_input_option)
+        writer.flush()
+        print(f"Pushed {len(dirty)} cells, Sheets requests sent: {writer.requests_sent}")
+        dirty.clear()
+        scheduler.pushed()
+
+    print(f"Watching contest {args.contest_id}, {len(dirty)} cells differ from the sheet")
+    while True:
+        changed = watcher.poll()
+        if changed:
+            dirty.update(changed)
+            scheduler.note_change()
+        if watcher.done:
+            if dirty:
+                push()
+            print(f"Contest {args.contest_id} is finished, final results are on the sheet")
+            return
+        if dirty and scheduler.should_push():
+            push()
+        time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
+from __future__ import annotations
+
 from cfscript import ContestInfo
-from gspread import Client, Spreadsheet, Worksheet, service_account
-from gspread_formatting import GridRange, GradientRule, InterpolationPoint, Color, ConditionalFormatRule, get_conditional_format_rules
-from typing import List, Dict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 import config
+from sheet_writer import SheetWriter, a1_to_grid_range
+
+# gspread импортируется лениво: он долго загружается, а нужен не каждой команде.
+if TYPE_CHECKING:
+    from gspread import Client, Spreadsheet, Worksheet
+
+SUM_MODE_PER_ROW = "per_row"
+SUM_MODE_RANGE = "range"
+SUM_MODE_ARRAY = "array"
+SUM_MODE_VALUES = "values"
+SUM_MODES = (SUM_MODE_PER_ROW, SUM_MODE_RANGE, SUM_MODE_ARRAY, SUM_MODE_VALUES)
 
 def client_init_json() -> Client:
     """Создание клиента для работы с Google Sheets."""
+    from gspread import service_account
+
     return service_account(filename=config.GOOGLE_SA_PATH)
 
 def get_table_by_id(client: Client, table_url):
@@ -22,9 +35,18 @@ def extract_data_from_sheet(table: Spreadsheet, sheet_name: str) -> List[List[st
     :param sheet_name: Название листа в таблице.
     :return: Список словарей, представляющих данные из таблицы.
     """
-    worksheet = table.worksheet(sheet_name)
-    rows = worksheet.get_all_records()
-    
+    return extract_rows(table.worksheet(sheet_name))
+
+
+def extract_rows(worksheet: Worksheet) -> List[List[str]]:
+    """
+    Строки (surname, name, cf_login) листа со списком учеников.
+    Значения читаются как текст: хэндл "007" не превращается в число 7.
+    """
+    return records_to_rows(worksheet.get_all_records(numericise_ignore=["all"]))
+
+def records_to_rows(rows: List[Dict[str, Any]]) -> List[List[str]]:
+    """Строки (surname, name, cf_login) из уже прочитанных get_all_records."""
     rows_to_insert = []
     for child in rows:
         row = [child.get("surname", ""), child.get("name", ""), child.get("cf_login", ""),]
@@ -100,30 +122,64 @@ def column_number_to_letter(col_num : int) -> str:
     return letters
 
 
-def insert_contest_info(worksheet: Worksheet, contest_info: ContestInfo, start_col: int = 1):
+def insert_contest_info(worksheet: Worksheet, contest_info: ContestInfo, start_col: int = 1, sum_mode: str = SUM_MODE_PER_ROW, totals=None):
     """    
     :param worksheet: Объект Worksheet из gspread.
     :param contest_info: Объект ContestInfo с данными о контесте.
     :param start_col: Номер стартовой колонки для вставки данных (по умолчанию — 1).
+    :param sum_mode: Способ записи формул Σ колонки (см. insert_sum_formula).
+    :param totals: Посчитанные локально суммы по строкам для SUM_MODE_VALUES.
+    """
+    insert_contest_header(worksheet=worksheet, name=contest_info.name, tasks=contest_info.Tasks, start_col=start_col,
+                          num_children=len(contest_info.Result), sum_mode=sum_mode, totals=totals)
+    insert_contest_results(worksheet=worksheet, contest_info=contest_info, start_col=start_col)
+
+
+def insert_contest_header(worksheet: Worksheet, name: str, tasks: List[str], start_col: int, num_children: int,
+                          sum_mode: str = SUM_MODE_PER_ROW, totals=None):
+    """
+    Всё, что не зависит от результатов: название, задачи, Σ колонка, форматирование.
+    Может быть записано до того, как результаты скачаны.
+
+    :param totals: Для SUM_MODE_VALUES; без них Σ колонка заполняется позже через insert_sum_values.
     """
-    len_task = len(contest_info.Tasks)
+    len_task = len(tasks)
     end_col = start_col + len_task
     start_letter = column_number_to_letter(start_col)
     end_letter = column_number_to_letter(end_col)
     result_start_row = 3  # Результаты начинаются с третьей строки
-    END_ROW = len(contest_info.Result) + result_start_row - 1
+    END_ROW = num_children + result_start_row - 1
 
     # Вставляем название контеста в первую строку (объединяем колонки)
-    worksheet.update(f"{start_letter}1", [[contest_info.name]])
-    insert_sum_formula(worksheet=worksheet, target_col=start_col, end_col=end_col, start_row=result_start_row, end_row=END_ROW)
+    worksheet.update(f"{start_letter}1", [[name]])
+    if sum_mode == SUM_MODE_VALUES and totals is None:
+        worksheet.update_acell(f"{start_letter}2", "Σ")
+    else:
+        insert_sum_formula(worksheet=worksheet, target_col=start_col, end_col=end_col, start_row=result_start_row, end_row=END_ROW, mode=sum_mode, totals=totals)
     apply_gradient_formatting(worksheet=worksheet, column_letter=start_letter, start_row=result_start_row, end_row=END_ROW, mid_value=1 * len_task//3)
     cur_col = start_col + 1
     cur_letter = column_number_to_letter(cur_col)
 
     # Вставляем заголовки задач во вторую строку
-    worksheet.update(f"{cur_letter}2:{end_letter}2", [contest_info.Tasks])
-     
-    # Вставляем результаты в последующие строки
+    worksheet.update(f"{cur_letter}2:{end_letter}2", [tasks])
+
+    titleAdress = f"{start_letter}{1}:{end_letter}{1}"
+    worksheet.merge_cells(titleAdress)  
+    style_cells(worksheet=worksheet, cell_range=titleAdress, font_size=10)
+    add_borders_to_range(worksheet, start_row=0, end_row=1, start_column=start_col - 1, end_column=end_col)
+    style_cells(worksheet=worksheet, cell_range=f"{start_letter}{2}:{end_letter}{2}", font_size=10)
+    add_borders_to_range(worksheet, start_row=1, end_row=2, start_column=start_col - 1, end_column=end_col, add_inner=True)
+
+    add_borders_to_range(worksheet, start_row=0, end_row=END_ROW, start_column=start_col - 1, end_column=end_col)
+    apply_gradient(worksheet=worksheet, column_letter=cur_letter, end_column=end_letter, start_row=result_start_row, end_row=END_ROW)
+    set_column_width(worksheet=worksheet, column_start = start_col - 1, column_end = end_col, width=40)
+
+
+def insert_contest_results(worksheet: Worksheet, contest_info: ContestInfo, start_col: int):
+    """Вставляет результаты контеста (-1 — пустая ячейка) под заголовками задач."""
+    result_start_row = 3
+    cur_letter = column_number_to_letter(start_col + 1)
+    end_letter = column_number_to_letter(start_col + len(contest_info.Tasks))
     filtered_result = [["" if cell == -1 else cell for cell in row] for row in contest_info.Result]
     adresses = f"{cur_letter}{result_start_row}:{end_letter}{result_start_row + len(contest_info.Result) - 1}"
     worksheet.update(
@@ -131,16 +187,45 @@ def insert_contest_info(worksheet: Worksheet, contest_info: ContestInfo, start_c
         filtered_result
     )
 
+def insert_metric_block(worksheet: Worksheet, name: str, tasks: List[str], start_col: int, values: List[List],
+                        totals=None):
+    """
+    Блок контеста на листе дополнительной метрики (см. metrics.py): как insert_contest_header
+    и insert_contest_results, но без формул и градиентов — значения метрик не «чем больше, тем лучше».
+
+    :param values: Матрица метрики, None — пустая ячейка.
+    :param totals: Суммы по строкам для суммируемых метрик; без них Σ колонка остаётся пустой.
+    """
+    len_task = len(tasks)
+    end_col = start_col + len_task
+    start_letter = column_number_to_letter(start_col)
+    end_letter = column_number_to_letter(end_col)
+    result_start_row = 3
+    END_ROW = len(values) + result_start_row - 1
+
+    worksheet.update(f"{start_letter}1", [[name]])
+    worksheet.update(f"{start_letter}2:{end_letter}2", [["Σ" if totals is not None else ""] + tasks])
+    if totals is not None:
+        insert_sum_values(worksheet, target_col=start_col, start_row=result_start_row, end_row=END_ROW, totals=totals)
+    if values:
+        worksheet.update(
+            f"{column_number_to_letter(start_col + 1)}{result_start_row}:{end_letter}{END_ROW}",
+            [["" if cell is None else cell for cell in row] for row in values]
+        )
+
     titleAdress = f"{start_letter}{1}:{end_letter}{1}"
-    worksheet.merge_cells(titleAdress)  
+    worksheet.merge_cells(titleAdress)
     style_cells(worksheet=worksheet, cell_range=titleAdress, font_size=10)
-    add_borders_to_range(worksheet, start_row=0, end_row=1, start_column=start_col - 1, end_column=end_col)
     style_cells(worksheet=worksheet, cell_range=f"{start_letter}{2}:{end_letter}{2}", font_size=10)
+    add_borders_to_range(worksheet, start_row=0, end_row=1, start_column=start_col - 1, end_column=end_col)
     add_borders_to_range(worksheet, start_row=1, end_row=2, start_column=start_col - 1, end_column=end_col, add_inner=True)
-
     add_borders_to_range(worksheet, start_row=0, end_row=END_ROW, start_column=start_col - 1, end_column=end_col)
-    apply_gradient(worksheet=worksheet, column_letter=cur_letter, end_column=end_letter, start_row=result_start_row, end_row=END_ROW)
-    set_column_width(worksheet=worksheet, column_start = start_col - 1, column_end = end_col, width=40)
+    if values:
+        worksheet.format(f"{start_letter}{result_start_row}:{end_letter}{END_ROW}", {
+            "horizontalAlignment": "CENTER",
+            "verticalAlignment": "MIDDLE"
+        })
+    set_column_width(worksheet=worksheet, column_start=start_col - 1, column_end=end_col, width=70)
 
 def style_cells(worksheet: Worksheet, cell_range: str, font_size: int = 12):
     """
@@ -177,7 +262,7 @@ def update_children_info(worksheet: Worksheet, header, children):
     worksheet.merge_cells("D1:D2")  
 
     worksheet.update(f"A3:C{children_count + 2}", children) 
-    style_cells(worksheet=worksheet, cell_range=f"{"A"}{1}:{"D"}{2}", font_size=13)
+    style_cells(worksheet=worksheet, cell_range="A1:D2", font_size=13)
 
     add_borders_to_range(worksheet, start_row=0, end_row=1, start_column=0, end_column=header_size)
     add_borders_to_range(worksheet, start_row=1, end_row=children_count + 2, start_column=0, end_column=header_size)
@@ -206,29 +291,87 @@ def update_children_info(worksheet: Worksheet, header, children):
     set_column_width(worksheet, 0, 1, 220)
 
 
-def insert_sum_formula(worksheet, target_col, end_col, start_row, end_row):
-    # Преобразуем номера столбцов в буквы
+def _value_cells(col, start_row, end_row, totals):
+    col_letter = column_number_to_letter(col)
+    return [(f"{col_letter}{start_row}:{col_letter}{end_row}", [[int(total)] for total in totals])]
+
+
+def sum_formula_cells(target_col, end_col, start_row, end_row, mode=SUM_MODE_PER_ROW, totals=None):
+    """
+    Строит формулы Σ колонки контеста.
+
+    :param totals: Посчитанные локально суммы по строкам, нужны для SUM_MODE_VALUES.
+    :return: Пары (A1 диапазон, значения) для записи на лист.
+    """
+    if mode == SUM_MODE_VALUES:
+        return _value_cells(target_col, start_row, end_row, totals)
     target_col_letter = column_number_to_letter(target_col)
     sum_start_letter = column_number_to_letter(target_col + 1)
     sum_end_letter = column_number_to_letter(end_col)
 
-    header_cell = f"{target_col_letter}2"
-    worksheet.update_acell(header_cell, "Σ")
-    # Формируем обновления для каждой строки
-    for row in range(start_row, end_row + 1):
-        target_cell = f"{target_col_letter}{row}"
-        sum_range = f"{sum_start_letter}{row}:{sum_end_letter}{row}"
-        formula = '=SUM(' + sum_range + ')'
-        worksheet.update_acell(target_cell, formula)
+    if mode == SUM_MODE_ARRAY:
+        # One formula spills the row sums for the whole block: rows × tasks · tasks × 1.
+        block = f"{sum_start_letter}{start_row}:{sum_end_letter}{end_row}"
+        width = end_col - target_col
+        formula = f'=ARRAYFORMULA(MMULT(IF({block}="",0,{block}),SEQUENCE({width},1,1,0)))'
+        return [(f"{target_col_letter}{start_row}", [[formula]])]
+
+    formulas = [[f"=SUM({sum_start_letter}{row}:{sum_end_letter}{row})"] for row in range(start_row, end_row + 1)]
+    if mode == SUM_MODE_RANGE:
+        return [(f"{target_col_letter}{start_row}:{target_col_letter}{end_row}", formulas)]
+    return [(f"{target_col_letter}{row}", [formula]) for row, formula in zip(range(start_row, end_row + 1), formulas)]
+
+
+def main_sum_formula_cells(sum_col, contest_sum_columns, start_row, end_row, mode=SUM_MODE_PER_ROW, totals=None):
+    """
+    Строит формулы главной Σ колонки: = E3 + I3 + M3 + ...
+
+    :param totals: Посчитанные локально суммы по строкам, нужны для SUM_MODE_VALUES.
+    :return: Пары (A1 диапазон, значения) для записи на лист.
+    """
+    if mode == SUM_MODE_VALUES:
+        return _value_cells(sum_col, start_row, end_row, totals)
+    sum_col_letter = column_number_to_letter(sum_col)
+    letters = [column_number_to_letter(col) for col in contest_sum_columns]
+
+    if mode == SUM_MODE_ARRAY:
+        ranges = " + ".join(f"{letter}{start_row}:{letter}{end_row}" for letter in letters)
+        return [(f"{sum_col_letter}{start_row}", [[f"=ARRAYFORMULA({ranges})"]])]
+
+    formulas = [["=" + " + ".join(f"{letter}{row}" for letter in letters)] for row in range(start_row, end_row + 1)]
+    if mode == SUM_MODE_RANGE:
+        return [(f"{sum_col_letter}{start_row}:{sum_col_letter}{end_row}", formulas)]
+    return [(f"{sum_col_letter}{row}", [formula]) for row, formula in zip(range(start_row, end_row + 1), formulas)]
+
+
+def _write_formulas(worksheet, cells):
+    for address, values in cells:
+        if len(values) == 1 and ":" not in address:
+            worksheet.update_acell(address, values[0][0])
+        else:
+            worksheet.update(address, values, value_input_option="USER_ENTERED")
+
+
+def insert_sum_formula(worksheet, target_col, end_col, start_row, end_row, mode=SUM_MODE_PER_ROW, totals=None):
+    """
+    Вставляет Σ колонку контеста.
+
+    :param mode: SUM_MODE_PER_ROW — update_acell на каждую строку,
+                 SUM_MODE_RANGE — одна запись диапазона со всеми формулами,
+                 SUM_MODE_ARRAY — одна ARRAYFORMULA на всю колонку,
+                 SUM_MODE_VALUES — готовые числа из totals, без формул.
+    """
+    target_col_letter = column_number_to_letter(target_col)
+    worksheet.update_acell(f"{target_col_letter}2", "Σ")
+    _write_formulas(worksheet, sum_formula_cells(target_col, end_col, start_row, end_row, mode, totals))
+
 
-    # apply_gradient_formatting(worksheet=worksheet, 
-                            #   column_letter=target_col_letter, 
-                            #   start_row=column_number_to_letter(start_row),
-                            #   end_row=column_number_to_letter(end_row),
-                            #   mid_value=15)
+def insert_sum_values(worksheet, target_col, start_row, end_row, totals):
+    """Записывает посчитанные локально суммы в Σ колонку (SUM_MODE_VALUES)."""
+    _write_formulas(worksheet, _value_cells(target_col, start_row, end_row, totals))
 
 
-def insert_main_sum_column(worksheet, sum_col, contest_sum_columns, start_row, end_row, num_contests):
+def insert_main_sum_column(worksheet, sum_col, contest_sum_columns, start_row, end_row, num_contests, mode=SUM_MODE_PER_ROW, totals=None):
     """
     Inserts SUM formula in the main Σ column (column D) that sums all contest Σ columns.
     Formula format: = E3 + I3 + M3 + ... where E, I, M are contest Σ columns.
@@ -240,18 +383,11 @@ def insert_main_sum_column(worksheet, sum_col, contest_sum_columns, start_row, e
     :param start_row: First row with data (3)
     :param end_row: Last row with data
     :param num_contests: Number of contests (for calculating midpoint)
+    :param mode: How the formulas are written, see insert_sum_formula
+    :param totals: Precomputed row totals for SUM_MODE_VALUES
     """
     sum_col_letter = column_number_to_letter(sum_col)
-    
-    # Build formula like = E3 + I3 + M3 + ...
-    for row in range(start_row, end_row + 1):
-        # Create list of cell references: E3, I3, M3, etc.
-        cell_refs = [f"{column_number_to_letter(col)}{row}" for col in contest_sum_columns]
-        # Join them with plus: E3 + I3 + M3
-        sum_cells = " + ".join(cell_refs)
-        formula = f'={sum_cells}'
-        target_cell = f"{sum_col_letter}{row}"
-        worksheet.update_acell(target_cell, formula)
+    _write_formulas(worksheet, main_sum_formula_cells(sum_col, contest_sum_columns, start_row, end_row, mode, totals))
     
     # Calculate midpoint for gradient (average tasks per contest * num contests / 3)
     # Estimate: assume ~5 tasks per contest on average
@@ -275,24 +411,53 @@ def insert_main_sum_column(worksheet, sum_col, contest_sum_columns, start_row, e
     )
 
 
+def add_conditional_format_rule(worksheet, rule: Dict[str, Any]):
+    """
+    Добавляет правило условного форматирования на лист.
+
+    :param rule: Правило в формате Sheets API (как ConditionalFormatRule.to_props()).
+
+    For a SheetWriter the rule is queued and sent on flush(); for a plain
+    Worksheet it is reconciled with the rules on the sheet (see format_rules.py)
+    and sent right away, without re-uploading the whole rule list.
+    """
+    if isinstance(worksheet, SheetWriter):
+        worksheet.add_conditional_format_rule(rule)
+        return
+    writer = SheetWriter(worksheet, reconcile_rules=True)
+    writer.add_conditional_format_rule(rule)
+    writer.flush()
+
+
+# Правила собираются сразу в формате API: gspread_formatting нужен был только для
+# этого, а его импорт (вместе с gspread) занимает заметную часть старта.
+def _color(red: float, green: float, blue: float) -> Dict[str, float]:
+    return {"red": red, "green": green, "blue": blue, "alpha": 1.0}
+
+
+def _point(color: Dict[str, float], type: str, value: Optional[str] = None) -> Dict[str, Any]:
+    point = {"color": color, "type": type}
+    if value is not None:
+        point["value"] = value
+    return point
+
+
 def apply_gradient(worksheet, column_letter, end_column, start_row, end_row):
     # Диапазон форматирования
     range_address = f"{column_letter}{start_row}:{end_column}{end_row}"
 
-    max_color = Color(87 / 256, 187 / 256, 138 / 256)  # Зеленый цвет
-    min_color = Color(255 / 256, 214 / 256, 102 / 256) # Оранжевый
+    max_color = _color(87 / 256, 187 / 256, 138 / 256)  # Зеленый цвет
+    min_color = _color(255 / 256, 214 / 256, 102 / 256) # Оранжевый
 
     # Правило цветового градиента
-    rule = ConditionalFormatRule(
-        ranges=[GridRange.from_a1_range(range_address, worksheet)],
-        gradientRule=GradientRule(
-            maxpoint=InterpolationPoint(color=max_color, type='MAX'),
-            minpoint=InterpolationPoint(color=min_color, type='MIN'),
-        )
-    )
-    rules = get_conditional_format_rules(worksheet)
-    rules.append(rule)
-    rules.save()
+    rule = {
+        "ranges": [a1_to_grid_range(worksheet.id, range_address)],
+        "gradientRule": {
+            "minpoint": _point(min_color, "MIN"),
+            "maxpoint": _point(max_color, "MAX"),
+        }
+    }
+    add_conditional_format_rule(worksheet, rule)
 
 
 def apply_gradient_formatting(worksheet, column_letter, start_row, end_row, mid_value, is_rgb = True):
@@ -307,26 +472,24 @@ def apply_gradient_formatting(worksheet, column_letter, start_row, end_row, mid_
     # Диапазон форматирования
     range_address = f"{column_letter}{start_row}:{column_letter}{end_row}"
    
-    max_color = Color(87 / 256, 187 / 256, 138 / 256)  # Green color
-    min_color = Color(230 / 256, 124 / 256, 115 / 256) # Red color
-    mid_color = Color(255 / 256, 214 / 256, 102 / 256)
+    max_color = _color(87 / 256, 187 / 256, 138 / 256)  # Green color
+    min_color = _color(230 / 256, 124 / 256, 115 / 256) # Red color
+    mid_color = _color(255 / 256, 214 / 256, 102 / 256)
     if not is_rgb:
-        max_color = Color(87/256, 187/256, 138/256)   # Green (#57BB8A)
-        min_color = Color(255/256, 255/256, 255/256)  # White
-        mid_color = Color(171/256, 221/256, 196/256)  # Light green midpoint (#ABDDC4)
+        max_color = _color(87/256, 187/256, 138/256)   # Green (#57BB8A)
+        min_color = _color(255/256, 255/256, 255/256)  # White
+        mid_color = _color(171/256, 221/256, 196/256)  # Light green midpoint (#ABDDC4)
 
     # Правило цветового градиента
-    rule = ConditionalFormatRule(
-        ranges=[GridRange.from_a1_range(range_address, worksheet)],
-        gradientRule=GradientRule(
-            maxpoint=InterpolationPoint(color=max_color, type='MAX'),
-            minpoint=InterpolationPoint(color=min_color, type='MIN'),
-            midpoint=InterpolationPoint(color=mid_color, type="NUMBER", value=f"{mid_value}")
-        )
-    )
-    rules = get_conditional_format_rules(worksheet)
-    rules.append(rule)
-    rules.save()
+    rule = {
+        "ranges": [a1_to_grid_range(worksheet.id, range_address)],
+        "gradientRule": {
+            "minpoint": _point(min_color, "MIN"),
+            "midpoint": _point(mid_color, "NUMBER", f"{mid_value}"),
+            "maxpoint": _point(max_color, "MAX"),
+        }
+    }
+    add_conditional_format_rule(worksheet, rule)
 
 
 if __name__ == "__main__":